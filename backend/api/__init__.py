@@ -1,16 +1,12 @@
-# This is the main FastAPI app instance for import in tests and production
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from .routes import router
+# The FastAPI app is built on first access (`from api import app`), so importing a
+# submodule such as api.services does not construct the whole application.
+__all__ = ["app", "create_app"]
 
-app = FastAPI()
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Adjust for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-app.include_router(router)
-
-__all__ = ["app"]
+def __getattr__(name):
+    if name == "app":
+        from .factory import get_app
+        return get_app()
+    if name == "create_app":
+        from .factory import create_app
+        return create_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,257 @@
+# Admission control for the expensive endpoints (upload, preview, forecast). Each has a
+# concurrency limit with a bounded wait queue: a burst waits briefly for a slot and is then
+# shed with a fast 503, so the requests already admitted (and cheap ones like /api/health)
+# keep their latency. Per-caller token buckets stop one caller from taking all the
+# capacity (429). Both rejections carry Retry-After.
+#
+# Limits are per worker process; quotas are split between the WEB_CONCURRENCY workers.
+# Quotas are keyed by the bearer token's verified user (via auth.get_current_user), else
+# the client address; never by anything the client merely claims, like a location id.
+# A request shed for capacity gets its token back.
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional, Tuple
+from fastapi.responses import JSONResponse
+from .concurrency import WEB_CONCURRENCY
+from . import metrics
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Longest a request waits in the queue before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+QUOTA_MAX_KEYS = int(os.getenv("QUOTA_MAX_KEYS", "10000"))
+
+def _limits(endpoint: str, concurrency: int, queue: int, per_minute: int) -> Tuple[int, int, float]:
+    prefix = f"ADMISSION_{endpoint.upper()}"
+    return (
+        max(int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))), 1),
+        max(int(os.getenv(f"{prefix}_QUEUE", str(queue))), 0),
+        float(os.getenv(f"{prefix}_PER_MINUTE", str(per_minute)))  # 0 disables the quota
+    )
+
+# Endpoint -> (concurrent requests, queued requests, requests per minute per caller)
+ENDPOINT_LIMITS = {
+    "upload": _limits("upload", 4, 16, 30),
+    "preview": _limits("preview", 8, 32, 60),
+    "forecast": _limits("forecast", 16, 64, 120),
+}
+# (method, path) -> endpoint
+ADMITTED_ROUTES = {
+    ("POST", "/api/upload"): "upload",
+    ("POST", "/api/preview"): "preview",
+    ("POST", "/api/forecast"): "forecast",
+    ("POST", "/api/forecast/batch"): "forecast",
+}
+
+class Rejected(Exception):
+    """A request shed by admission control."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+        self.detail = detail
+
+class ConcurrencyLimiter:
+    """At most max_concurrent holders, at most max_queue waiters in FIFO order."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: Optional[float] = None):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = ADMISSION_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        # Smoothed time a slot is held, for Retry-After estimates
+        self.avg_hold = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        return max(math.ceil(self.avg_hold * (len(self._waiters) + 1) / self.max_concurrent), 1)
+
+    def _reject(self, reason: str, detail: str) -> Rejected:
+        metrics.admission_rejections.inc(endpoint=self.name, reason=reason)
+        return Rejected(503, reason, self.retry_after(), detail)
+
+    def _gauges(self):
+        metrics.admission_in_flight.set(self.in_flight, endpoint=self.name)
+        metrics.admission_queue_depth.set(len(self._waiters), endpoint=self.name)
+
+    async def acquire(self):
+        """Take a slot, waiting up to queue_timeout; raises Rejected when shed."""
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self._gauges()
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full", f"Too many {self.name} requests in progress, try again later")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._gauges()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the timeout fired
+            if not (waiter.done() and not waiter.cancelled()):
+                raise self._reject("queue_timeout", f"Timed out waiting for a {self.name} slot, try again later")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._gauges()
+        metrics.admission_wait.observe(time.monotonic() - started, endpoint=self.name)
+
+    def release(self, held: Optional[float] = None):
+        """Give the slot to the next waiter, or free it."""
+        if held is not None:
+            self.avg_hold += 0.2 * (held - self.avg_hold)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes straight to the waiter; in_flight is unchanged
+                waiter.set_result(None)
+                self._gauges()
+                return
+        self.in_flight -= 1
+        self._gauges()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejections": {
+                reason: metrics.admission_rejections.value(endpoint=self.name, reason=reason)
+                for reason in ("queue_full", "queue_timeout", "quota")
+            }
+        }
+
+class TokenBuckets:
+    """Per-key token buckets: `per_minute` requests a minute, bursting up to that many."""
+
+    def __init__(self, name: str, per_minute: float, max_keys: int = QUOTA_MAX_KEYS):
+        self.name = name
+        self.per_minute = per_minute
+        self.rate = per_minute / 60
+        self.capacity = max(per_minute, 1)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """Spend a token for key; 0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key: str):
+        """Return a token spent by take, for a request that was shed before it ran."""
+        if key in self._buckets:
+            tokens, updated = self._buckets[key]
+            self._buckets[key] = (min(self.capacity, tokens + 1), updated)
+
+_limiters: Dict[str, ConcurrencyLimiter] = {}
+_quotas: Dict[str, TokenBuckets] = {}
+
+def get_limiter(endpoint: str) -> ConcurrencyLimiter:
+    """The process-wide limiter for an endpoint, created on first use."""
+    if endpoint not in _limiters:
+        concurrent, queued, _ = ENDPOINT_LIMITS[endpoint]
+        _limiters[endpoint] = ConcurrencyLimiter(endpoint, concurrent, queued)
+    return _limiters[endpoint]
+
+def get_quota(endpoint: str) -> Optional[TokenBuckets]:
+    """This worker's share of the endpoint's per-caller quota, or None when disabled."""
+    per_minute = ENDPOINT_LIMITS[endpoint][2]
+    if per_minute <= 0:
+        return None
+    if endpoint not in _quotas:
+        _quotas[endpoint] = TokenBuckets(endpoint, per_minute / WEB_CONCURRENCY)
+    return _quotas[endpoint]
+
+def admission_states() -> Dict[str, Dict[str, Any]]:
+    return {endpoint: get_limiter(endpoint).snapshot() for endpoint in ENDPOINT_LIMITS}
+
+async def quota_key(scope) -> str:
+    """Who a request counts against: its verified user, else its address."""
+    headers = dict(scope.get("headers") or [])
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        from fastapi import HTTPException
+        from fastapi.security import HTTPAuthorizationCredentials
+        from .auth import get_current_user
+        try:
+            user = await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+            return f"user:{user['user_id']}"
+        except HTTPException:
+            pass
+    client = scope.get("client")
+    return f"client:{client[0] if client else 'unknown'}"
+
+async def admit(endpoint: str, scope) -> ConcurrencyLimiter:
+    """Check the caller's quota, then wait for a slot. Raises Rejected when shed."""
+    quota = get_quota(endpoint)
+    key = None
+    if quota is not None:
+        key = await quota_key(scope)
+        wait = quota.take(key)
+        if wait:
+            metrics.admission_rejections.inc(endpoint=endpoint, reason="quota")
+            raise Rejected(429, "quota", max(math.ceil(wait), 1), f"Too many {endpoint} requests, try again later")
+    limiter = get_limiter(endpoint)
+    try:
+        await limiter.acquire()
+    except Rejected:
+        # Shed for capacity, not for this caller's rate: the request never ran
+        if key is not None:
+            quota.refund(key)
+        raise
+    return limiter
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to the routes in ADMITTED_ROUTES.
+
+    A slot is held until the response has been sent, streamed bodies included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        endpoint = ADMITTED_ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if endpoint is None or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        try:
+            limiter = await admit(endpoint, scope)
+        except Rejected as e:
+            logger.warning(f"⚠️ Shed {endpoint} request ({e.reason}), retry after {e.retry_after}s")
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.monotonic() - started)
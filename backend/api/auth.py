@@ -1,23 +1,145 @@
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
+from jose import jwt, jwk, JWTError
+from jose.backends.base import Key
 import os
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+import httpx
+from .cache import ResultCache
+
+# Configure logging
+logger = logging.getLogger(__name__)
 
-# Placeholder for Supabase JWT validation
-# In production, use jose/jwt to decode and validate the token
 security = HTTPBearer()
 SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE")
+# Asymmetric signing keys; defaults to the project's well-known JWKS endpoint
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL") or (
+    f"{os.getenv('SUPABASE_URL').rstrip('/')}/auth/v1/.well-known/jwks.json" if os.getenv("SUPABASE_URL") else None
+)
+JWKS_CACHE_TTL = float(os.getenv("JWKS_CACHE_TTL", "600"))
+# Unknown kids trigger a refetch (key rotation), but no more often than this
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+
+# Verified tokens are remembered until AUTH_CACHE_TTL or their exp, whichever is sooner
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+SYMMETRIC_ALGORITHMS = ("HS256",)
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+DEFAULT_JWK_ALGORITHMS = {"RSA": "RS256", "EC": "ES256"}
+
+token_cache = ResultCache("auth_tokens", ttl=AUTH_CACHE_TTL, max_bytes=16 * 1024 * 1024, max_entries=AUTH_CACHE_MAX_ENTRIES)
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+class JWKSCache:
+    """Signing keys from a JWKS endpoint, built once per fetch and refreshed on rotation."""
+
+    def __init__(self, url: str, ttl: float = JWKS_CACHE_TTL, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.url = url
+        self.ttl = ttl
+        self.transport = transport
+        self.keys: Dict[Optional[str], Key] = {}
+        self.fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self):
+        async with httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT, transport=self.transport) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        keys = {}
+        for data in response.json().get("keys", []):
+            alg = data.get("alg") or DEFAULT_JWK_ALGORITHMS.get(data.get("kty"))
+            if alg not in ASYMMETRIC_ALGORITHMS or data.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[data.get("kid")] = jwk.construct(data, alg)
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping unusable JWKS key {data.get('kid')}: {e}")
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+        logger.info(f"🔄 Loaded {len(keys)} signing key(s) from JWKS")
+
+    async def get_key(self, kid: Optional[str]) -> Key:
+        """Return the key for kid, refetching when stale or when kid is unknown."""
+        age = time.monotonic() - self.fetched_at
+        if kid in self.keys and age < self.ttl:
+            return self.keys[kid]
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            age = time.monotonic() - self.fetched_at
+            stale = age >= self.ttl
+            if stale or (kid not in self.keys and age >= JWKS_MIN_REFRESH_INTERVAL):
+                try:
+                    await self._fetch()
+                except (httpx.HTTPError, ValueError) as e:
+                    logger.error(f"❌ Failed to fetch JWKS: {e}")
+                    if not self.keys:
+                        raise HTTPException(status_code=503, detail="Signing keys unavailable")
+        if kid not in self.keys:
+            raise _unauthorized("Unknown signing key")
+        return self.keys[kid]
+
+_hmac_key: Optional[Key] = None
+_jwks: Optional[JWKSCache] = None
+
+def get_hmac_key() -> Key:
+    """The HS256 secret as a ready-built key object, so it is not re-parsed per request."""
+    global _hmac_key
+    if _hmac_key is None:
+        if not SUPABASE_JWT_SECRET:
+            raise _unauthorized("Symmetric tokens are not accepted")
+        _hmac_key = jwk.construct(SUPABASE_JWT_SECRET, "HS256")
+    return _hmac_key
+
+def get_jwks() -> JWKSCache:
+    global _jwks
+    if _jwks is None:
+        if not SUPABASE_JWKS_URL:
+            raise _unauthorized("Asymmetric tokens are not accepted")
+        _jwks = JWKSCache(SUPABASE_JWKS_URL)
+    return _jwks
+
+async def verify_token(token: str) -> Dict[str, Any]:
+    """Verify a Supabase JWT and return its claims, using the verification cache."""
+    digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = await token_cache.get(digest)
+    if cached is not None and (cached.get("exp") is None or cached["exp"] > time.time()):
+        return cached
+
+    try:
+        header = jwt.get_unverified_header(token)
+        alg = header.get("alg")
+        if alg in SYMMETRIC_ALGORITHMS:
+            key = get_hmac_key()
+        elif alg in ASYMMETRIC_ALGORITHMS:
+            key = await get_jwks().get_key(header.get("kid"))
+        else:
+            raise _unauthorized("Unsupported token algorithm")
+        payload = jwt.decode(token, key, algorithms=[alg], audience=SUPABASE_JWT_AUDIENCE)
+    except JWTError:
+        raise _unauthorized("Invalid token")
+
+    exp = payload.get("exp")
+    ttl = AUTH_CACHE_TTL if exp is None else min(AUTH_CACHE_TTL, float(exp) - time.time())
+    if ttl > 0:
+        await token_cache.set(digest, payload, ttl=ttl)
+    return payload
 
 # Validate Supabase JWT and extract user_id
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
     if not token:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing token")
-    try:
-        payload = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User ID not found in token")
-        return {"user_id": user_id, "token": token}
-    except JWTError as e:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") 
\ No newline at end of file
+        raise _unauthorized("Invalid or missing token")
+    payload = await verify_token(token)
+    user_id = payload.get("sub")
+    if not user_id:
+        raise _unauthorized("User ID not found in token")
+    return {"user_id": user_id, "token": token}
@@ -0,0 +1,120 @@
+# In-process baseline forecasting: seasonal naive, moving average and simple exponential
+# smoothing, computed for every menu item at once on an (items x days) matrix.
+# Used directly as a model_type and as the fallback when the ML service is unavailable.
+# The heavy work runs in a worker process (see concurrency.run_cpu).
+import os
+import io
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BASELINE_SEASON = int(os.getenv("BASELINE_SEASON", "7"))
+BASELINE_WINDOW = int(os.getenv("BASELINE_WINDOW", "28"))
+BASELINE_ALPHA = float(os.getenv("BASELINE_ALPHA", "0.3"))
+
+class UnusableData(ValueError):
+    """The request has no row with both a parseable date and a menu item."""
+
+def _to_frame(
+    options: Dict[str, Any],
+    records: Optional[List[Dict[str, Any]]] = None,
+    content_type: Optional[str] = None,
+    body: Optional[bytes] = None
+) -> pd.DataFrame:
+    """The date, menu and target columns of a forecast request as a DataFrame."""
+    columns = [options["date_col"], options["menu_col"], options["target_col"]]
+    if records is not None:
+        return pd.DataFrame.from_records(records, columns=columns)
+    if content_type == "application/vnd.kivo.columnar+json":
+        doc = json.loads(body)
+        data = {}
+        for name in columns:
+            values = doc["columns"][name]
+            dictionary = (doc.get("dictionaries") or {}).get(name)
+            data[name] = np.asarray(dictionary, dtype=object)[np.asarray(values, dtype=np.int64)] if dictionary is not None else values
+        return pd.DataFrame(data)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if content_type == "application/vnd.apache.parquet":
+        table = pq.read_table(io.BytesIO(body), columns=columns)
+    else:
+        table = pa.ipc.open_stream(body).read_all().select(columns)
+    return table.to_pandas()
+
+def series_matrix(dates, menus, values) -> Tuple[np.ndarray, np.datetime64, np.ndarray]:
+    """Pivot long rows into a dense (items x days) matrix; missing days count as zero.
+
+    Rows without a menu item or a parseable date are skipped; UnusableData if none are left.
+    """
+    # Parse each distinct date once; long data repeats every date once per item
+    date_codes, unique_dates = pd.factorize(pd.Series(dates))
+    parsed = pd.to_datetime(pd.Series(unique_dates, dtype=object), format="mixed", errors="coerce")
+    # Null dates get code -1; index with 0 and mask them out below
+    days = parsed.to_numpy().astype("datetime64[D]")[np.maximum(date_codes, 0)] if len(parsed) else np.array([], dtype="datetime64[D]")
+    codes, items = pd.factorize(pd.Series(menus), sort=True)
+    amounts = pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    valid = (codes >= 0) & (date_codes >= 0) & ~np.isnat(days)
+    if not valid.any():
+        raise UnusableData("No rows with both a valid date and a menu item")
+    start = days[valid].min()
+    offsets = (days[valid] - start).astype(np.int64)
+    n_items, n_days = len(items), int(offsets.max()) + 1
+    flat = codes[valid].astype(np.int64) * n_days + offsets
+    matrix = np.bincount(flat, weights=amounts[valid], minlength=n_items * n_days).reshape(n_items, n_days)
+    return np.asarray(items, dtype=object), start, matrix
+
+def forecast_matrix(matrix: np.ndarray, method: str, horizon: int) -> np.ndarray:
+    """Forecast every row of matrix `horizon` steps ahead; returns (items x horizon)."""
+    n_items, n_days = matrix.shape
+    if method == "seasonal_naive":
+        season = min(BASELINE_SEASON, n_days)
+        return matrix[:, -season:][:, np.arange(horizon) % season]
+    if method == "moving_average":
+        level = matrix[:, -min(BASELINE_WINDOW, n_days):].mean(axis=1)
+    elif method == "exp_smoothing":
+        # Closed form of l_t = a*y_t + (1-a)*l_{t-1} with l_0 = y_0, as one matrix-vector product
+        decay = (1 - BASELINE_ALPHA) ** np.arange(n_days - 1, -1, -1, dtype=np.float64)
+        weights = BASELINE_ALPHA * decay
+        weights[0] = decay[0]
+        level = matrix @ weights
+    else:
+        raise ValueError(f"Unknown baseline model: {method}")
+    return np.repeat(level[:, None], horizon, axis=1)
+
+def baseline_forecast(
+    options: Dict[str, Any],
+    records: Optional[List[Dict[str, Any]]] = None,
+    content_type: Optional[str] = None,
+    body: Optional[bytes] = None,
+    method: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run a baseline model over a forecast request. Blocking and picklable: run it via run_cpu."""
+    method = method or options["model_type"]
+    horizon = int(options["forecast_horizon"])
+    df = _to_frame(options, records, content_type, body)
+    if df.empty or horizon < 1:
+        return {"model_type": method, "engine": "baseline", "forecast_data": [], "metrics": {}}
+
+    items, start, matrix = series_matrix(df[options["date_col"]], df[options["menu_col"]], df[options["target_col"]])
+    predicted = np.clip(forecast_matrix(matrix, method, horizon), 0, None)
+
+    # Backtest on the last `horizon` days for a cheap accuracy estimate
+    metrics = {}
+    if matrix.shape[1] > horizon * 2:
+        errors = forecast_matrix(matrix[:, :-horizon], method, horizon) - matrix[:, -horizon:]
+        metrics = {"mae": float(np.abs(errors).mean()), "rmse": float(np.sqrt((errors ** 2).mean()))}
+
+    first_day = start + np.timedelta64(matrix.shape[1], "D")
+    dates = np.datetime_as_string(first_day + np.arange(horizon).astype("timedelta64[D]")).tolist()
+    rows = zip(np.tile(dates, len(items)).tolist(), np.repeat(items, horizon).tolist(), np.round(predicted, 3).ravel().tolist())
+    return {
+        "model_type": method,
+        "engine": "baseline",
+        "forecast_data": [{"date": d, "menu": m, "predicted": p} for d, m, p in rows],
+        "metrics": metrics
+    }
@@ -0,0 +1,219 @@
+# In-process caches: an LRU with TTL and a byte-size cap, an optional on-disk tier
+# that survives restarts, an optional tier shared with the other worker processes
+# (see shared_state), and coalescing of concurrent computations for the same key.
+import os
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from .concurrency import run_blocking
+from .shared_state import SHARED_STATE_LOCAL_TTL
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def fingerprint(payload: Any) -> str:
+    """SHA-256 of the canonical JSON form of payload (sorted keys, no whitespace)."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class DiskTier:
+    """One JSON file per key under a directory; entries carry their own expiry."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at = float(f.readline())
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if expires_at < time.time():
+            self.delete(key)
+            return None
+        return data, expires_at
+
+    def set(self, key: str, data: bytes, expires_at: float):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(f"{expires_at}\n".encode("ascii"))
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                self.delete(name[:-len(".json")])
+
+class ResultCache:
+    """LRU cache of JSON-serializable values with TTL, byte cap and request coalescing."""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_bytes: int,
+        max_entries: int = 10_000,
+        disk_dir: Optional[str] = None,
+        shared=None
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.disk = DiskTier(disk_dir) if disk_dir else None
+        # With a shared tier, memory entries only live SHARED_STATE_LOCAL_TTL so writes and
+        # invalidations made by other workers are seen quickly
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "shared_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}
+
+    def _drop(self, key: str):
+        data, _ = self._entries.pop(key)
+        self._bytes -= len(data)
+
+    def _store(self, key: str, data: bytes, expires_at: float):
+        if key in self._entries:
+            self._drop(key)
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = (data, expires_at)
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    def _local_expiry(self, expires_at: float) -> float:
+        if self.shared is None:
+            return expires_at
+        return min(expires_at, time.time() + SHARED_STATE_LOCAL_TTL)
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if expires_at < time.time():
+            self._drop(key)
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, checking memory, the shared tier, then disk."""
+        data = self._get_memory(key)
+        if data is not None:
+            self.stats["hits"] += 1
+            return json.loads(data)
+        if self.shared is not None:
+            try:
+                entry = await run_blocking(self.shared.get, key)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to read {self.name} cache entry from shared state: {e}")
+                entry = None
+            if entry is not None:
+                data, expires_at = entry
+                self._store(key, data, self._local_expiry(expires_at))
+                self.stats["shared_hits"] += 1
+                return json.loads(data)
+        if self.disk is not None:
+            entry = await run_blocking(self.disk.get, key)
+            if entry is not None:
+                data, expires_at = entry
+                self._store(key, data, expires_at)
+                self.stats["disk_hits"] += 1
+                return json.loads(data)
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Cache a JSON-serializable value in memory and, if configured, in the shared tier and on disk."""
+        data = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._store(key, data, self._local_expiry(expires_at))
+        if self.shared is not None:
+            try:
+                await run_blocking(self.shared.set, key, data, expires_at)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to write {self.name} cache entry to shared state: {e}")
+        if self.disk is not None:
+            try:
+                await run_blocking(self.disk.set, key, data, expires_at)
+            except OSError as e:
+                logger.warning(f"⚠️ Failed to write {self.name} cache entry to disk: {e}")
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value or compute it once, sharing the result with concurrent callers."""
+        value = await self.get(key)
+        if value is not None:
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            # The computation runs as its own task, so a caller that is cancelled (a client
+            # disconnecting) does not cancel it for the others waiting on the same key
+            task = asyncio.ensure_future(self._compute(key, compute))
+            # Mark the exception as retrieved when nobody is left waiting on it
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            await self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate(self, key: Optional[str] = None):
+        """Drop one key, or every entry when key is None."""
+        if key is None:
+            self._entries.clear()
+            self._bytes = 0
+            if self.shared is not None:
+                await run_blocking(self.shared.clear)
+            if self.disk is not None:
+                await run_blocking(self.disk.clear)
+            return
+        if key in self._entries:
+            self._drop(key)
+        if self.shared is not None:
+            await run_blocking(self.shared.delete, key)
+        if self.disk is not None:
+            await run_blocking(self.disk.delete, key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and current size, for monitoring endpoints."""
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "disk_tier": self.disk is not None,
+            "shared_tier": self.shared is not None,
+            **self.stats
+        }
@@ -0,0 +1,59 @@
+import os
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Size of the thread pool used for blocking Supabase/boto3 calls
+BLOCKING_IO_THREADS = max(int(os.getenv("BLOCKING_IO_THREADS", "32")), 1)
+
+# Worker processes for CPU-bound work (local forecasting); 0 runs it on the thread pool.
+# Each server worker has its own pool, so the default splits the cores between them.
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+CPU_PROCESSES = max(int(os.getenv("CPU_PROCESSES", str(max(min((os.cpu_count() or 1) // WEB_CONCURRENCY, 4), 1)))), 0)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the bounded pool for blocking I/O, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+    return _executor
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a synchronous call on the blocking I/O pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the CPU worker pool, or None when CPU_PROCESSES is 0."""
+    global _process_pool
+    if _process_pool is None and CPU_PROCESSES > 0:
+        _process_pool = ProcessPoolExecutor(max_workers=CPU_PROCESSES)
+    return _process_pool
+
+async def run_cpu(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a picklable CPU-bound call in a worker process so it cannot hold the GIL of the server."""
+    pool = get_process_pool()
+    if pool is None:
+        return await run_blocking(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+def shutdown_executor():
+    """Wait for in-flight blocking calls and release the pools' threads and processes."""
+    global _executor, _process_pool
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=True)
+        _process_pool = None
@@ -0,0 +1,333 @@
+# Async data-access helpers for Supabase.
+# supabase-py is synchronous, so every execute() runs on the bounded blocking I/O pool.
+import os
+import re
+import time
+import asyncio
+import uuid
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from .cache import ResultCache, fingerprint
+from .concurrency import run_blocking
+from .metrics import timed
+from .shared_state import get_tier, shared_tier
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Columns returned by file listings; ml_result is only included on request
+FILE_LIST_COLUMNS = "id,filename,s3_path,clean_path,upload_time,file_size,file_type,status,location_id,row_count,error"
+FILE_LIST_MAX_LIMIT = 500
+FILE_LIST_CACHE_TTL = float(os.getenv("FILE_LIST_CACHE_TTL", "5"))
+# How long an upload may hold its (location, content hash) claim before another can take it
+UPLOAD_CLAIM_TTL = float(os.getenv("UPLOAD_CLAIM_TTL", "300"))
+# How long one upload may hold a location's ingestion lock (see history.py)
+INGEST_LOCK_TTL = float(os.getenv("INGEST_LOCK_TTL", "600"))
+INGEST_LOCK_POLL_INTERVAL = float(os.getenv("INGEST_LOCK_POLL_INTERVAL", "0.5"))
+
+# Short-lived cache of listing pages, cleared whenever file_upload_tracker is written
+file_list_cache = ResultCache("file_list", ttl=FILE_LIST_CACHE_TTL, max_bytes=8 * 1024 * 1024, shared=shared_tier("file_list"))
+
+# File rows with their forecast results embedded through the file_id foreign key
+FILE_WITH_RESULTS_COLUMNS = "*,forecast_results(*)"
+
+# Location id -> name; locations are edited from the dashboard, so keep the TTL modest
+LOCATION_CACHE_TTL = float(os.getenv("LOCATION_CACHE_TTL", "300"))
+location_cache = ResultCache("locations", ttl=LOCATION_CACHE_TTL, max_bytes=1024 * 1024, shared=shared_tier("locations"))
+
+def get_supabase():
+    """Return the configured Supabase client or raise 503 if it is missing."""
+    from . import services
+    services._check_supabase()
+    return services.get_supabase_client()
+
+async def execute(query):
+    """Execute a built PostgREST query off the event loop."""
+    return await run_blocking(query.execute)
+
+@timed("db.fetch_location_name")
+async def _fetch_location_name(location_id: str) -> Optional[str]:
+    result = await execute(get_supabase().table("locations").select("name").eq("id", location_id).limit(1))
+    return result.data[0]["name"] if result.data else None
+
+async def get_location_name(location_id: str) -> Optional[str]:
+    """Location name via the TTL cache; unknown ids are not cached."""
+    return await location_cache.get_or_compute(str(location_id), lambda: _fetch_location_name(location_id))
+
+async def invalidate_location(location_id: Optional[str] = None):
+    """Forget one cached location name, or all of them when location_id is None."""
+    await location_cache.invalidate(None if location_id is None else str(location_id))
+
+@timed("db.update_location")
+async def update_location(location_id: str, fields: Dict[str, Any]):
+    await execute(get_supabase().table("locations").update(fields).eq("id", location_id))
+    await invalidate_location(location_id)
+
+@timed("db.insert_file")
+async def insert_file(file_metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    result = await execute(get_supabase().table("file_upload_tracker").insert(file_metadata))
+    await file_list_cache.invalidate()
+    return result.data[0] if result.data else None
+
+@timed("db.update_file")
+async def update_file(file_id: str, fields: Dict[str, Any]):
+    await execute(get_supabase().table("file_upload_tracker").update(fields).eq("id", file_id))
+    await file_list_cache.invalidate()
+
+@timed("db.fail_file")
+async def fail_file(file_id: str, error: str, keep_statuses=()):
+    """Mark an upload processing_failed, leaving rows already in one of keep_statuses as they are."""
+    query = get_supabase().table("file_upload_tracker").update({"status": "processing_failed", "error": error}).eq("id", file_id)
+    if keep_statuses:
+        query = query.not_.in_("status", list(keep_statuses))
+    await execute(query)
+    await file_list_cache.invalidate()
+
+def split_results(row: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    file_data = dict(row)
+    return file_data, file_data.pop("forecast_results", None) or []
+
+@timed("db.find_file_by_hash")
+async def find_file_by_hash(location_id: str, content_hash: str, exclude_statuses=()) -> Optional[Dict[str, Any]]:
+    """Most recent upload of identical content for a location (index on location_id, content_hash).
+
+    The row carries its results under "forecast_results".
+    """
+    query = get_supabase().table("file_upload_tracker").select(FILE_WITH_RESULTS_COLUMNS).eq("location_id", location_id).eq("content_hash", content_hash)
+    if exclude_statuses:
+        query = query.not_.in_("status", list(exclude_statuses))
+    result = await execute(query.order("upload_time", desc=True).limit(1))
+    return result.data[0] if result.data else None
+
+def claim_upload(location_id: str, content_hash: str) -> bool:
+    """Reserve a (location, content hash) pair while its upload is processed, across workers.
+
+    False when an identical upload is already in progress. Blocking; use run_blocking.
+    """
+    return get_tier("upload_claims").add(f"{location_id}:{content_hash}", b"1", time.time() + UPLOAD_CLAIM_TTL)
+
+def release_upload(location_id: str, content_hash: str):
+    """Drop a claim taken by claim_upload. Blocking; use run_blocking."""
+    get_tier("upload_claims").delete(f"{location_id}:{content_hash}")
+
+def claim_location_ingest(location_id: str) -> bool:
+    """Serialize ingestion per location, across workers, so history segments are appended in order.
+
+    False when another upload for the location is being ingested. Blocking; use run_blocking.
+    """
+    return get_tier("ingest_locks").add(str(location_id), b"1", time.time() + INGEST_LOCK_TTL)
+
+def release_location_ingest(location_id: str):
+    """Drop a lock taken by claim_location_ingest. Blocking; use run_blocking."""
+    get_tier("ingest_locks").delete(str(location_id))
+
+async def wait_location_ingest(location_id: str, timeout: float = INGEST_LOCK_TTL) -> bool:
+    """claim_location_ingest, polling while another upload holds the lock.
+
+    False if it is still held after timeout seconds; the default outlives a lock whose
+    holder died without releasing it.
+    """
+    deadline = time.monotonic() + timeout
+    while not await run_blocking(claim_location_ingest, location_id):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(INGEST_LOCK_POLL_INTERVAL, remaining))
+    return True
+
+@timed("db.get_location_history")
+async def get_location_history(location_id: str) -> Optional[Dict[str, Any]]:
+    result = await execute(get_supabase().table("location_history").select("*").eq("location_id", location_id).limit(1))
+    return result.data[0] if result.data else None
+
+@timed("db.save_location_history")
+async def save_location_history(location_id: str, fields: Dict[str, Any], exists: bool):
+    table = get_supabase().table("location_history")
+    if exists:
+        await execute(table.update(fields).eq("location_id", location_id))
+    else:
+        await execute(table.insert({"location_id": location_id, **fields}))
+
+@timed("db.get_location_summary")
+async def get_location_summary(location_id: str) -> Optional[Dict[str, Any]]:
+    result = await execute(get_supabase().table("location_summaries").select("*").eq("location_id", location_id).limit(1))
+    return result.data[0] if result.data else None
+
+@timed("db.upsert_location_summary")
+async def upsert_location_summary(location_id: str, fields: Dict[str, Any]):
+    """Insert the summary row or update the given columns of it, atomically (unique location_id)."""
+    await execute(get_supabase().table("location_summaries").upsert({"location_id": location_id, **fields}, on_conflict="location_id"))
+
+@timed("db.latest_completed_file")
+async def latest_completed_file(location_id: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """(file, results) of the location's most recent completed upload, or None."""
+    result = await execute(
+        get_supabase().table("file_upload_tracker").select(FILE_WITH_RESULTS_COLUMNS)
+        .eq("location_id", location_id).eq("status", "completed").order("upload_time", desc=True).limit(1)
+    )
+    return split_results(result.data[0]) if result.data else None
+
+@timed("db.get_file")
+async def get_file(file_id: str) -> Optional[Dict[str, Any]]:
+    result = await execute(get_supabase().table("file_upload_tracker").select("*").eq("id", file_id).single())
+    return result.data
+
+@timed("db.get_file_with_results")
+async def get_file_with_results(file_id: str) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """(file, results) for one upload in a single round-trip, or None if it does not exist."""
+    result = await execute(
+        get_supabase().table("file_upload_tracker").select(FILE_WITH_RESULTS_COLUMNS).eq("id", file_id).limit(1)
+    )
+    return split_results(result.data[0]) if result.data else None
+
+@timed("db.get_files_with_results")
+async def get_files_with_results(file_ids: List[str]) -> Dict[str, Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """(file, results) keyed by id for many uploads in a single round-trip; unknown ids are absent."""
+    if not file_ids:
+        return {}
+    result = await execute(
+        get_supabase().table("file_upload_tracker").select(FILE_WITH_RESULTS_COLUMNS).in_("id", list(file_ids))
+    )
+    return {str(row["id"]): split_results(row) for row in result.data or []}
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing just past row."""
+    raw = json.dumps([row.get("upload_time"), row.get("id")]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+# Characters an upload_time may contain; cursor values are pasted into a raw PostgREST filter
+_UPLOAD_TIME_CHARS = re.compile(r"^[0-9T:_+\-. Z]+$")
+
+def _valid_upload_time(value: str) -> bool:
+    if not _UPLOAD_TIME_CHARS.match(value):
+        return False
+    for parse in (datetime.fromisoformat, lambda text: datetime.strptime(text, "%Y%m%d_%H%M%S")):
+        try:
+            parse(value)
+            return True
+        except ValueError:
+            pass
+    return False
+
+def _valid_file_id(value: str) -> bool:
+    if value.isdigit():
+        return True
+    try:
+        return str(uuid.UUID(value)) == value.lower()
+    except ValueError:
+        return False
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors.
+
+    upload_time must be an ISO timestamp (or the upload's own %Y%m%d_%H%M%S form) and
+    id a UUID or integer, since both end up in a raw filter.
+    """
+    try:
+        upload_time, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    upload_time, file_id = str(upload_time), str(file_id)
+    if not _valid_upload_time(upload_time) or not _valid_file_id(file_id):
+        raise ValueError("Invalid cursor")
+    return upload_time, file_id
+
+def _keyset(query, cursor: Optional[str]):
+    # postgrest-py 0.10 has no or_() and emits one "order" param per order() call,
+    # so the composite sort and keyset predicate are added as raw PostgREST params
+    query.params = query.params.add("order", "upload_time.desc,id.desc")
+    if cursor:
+        upload_time, file_id = decode_cursor(cursor)
+        query.params = query.params.add(
+            "or", f'(upload_time.lt."{upload_time}",and(upload_time.eq."{upload_time}",id.lt."{file_id}"))'
+        )
+    return query
+
+@timed("db.list_files_page")
+async def _list_files_page(limit, cursor, location_id, status, include_results):
+    columns = FILE_LIST_COLUMNS + (",ml_result" if include_results else "")
+    query = get_supabase().table("file_upload_tracker").select(columns)
+    if location_id:
+        query = query.eq("location_id", location_id)
+    if status:
+        query = query.eq("status", status)
+    # One extra row tells us whether another page exists
+    result = await execute(_keyset(query, cursor).limit(limit + 1))
+    rows = result.data or []
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"files": rows[:limit], "next_cursor": next_cursor}
+
+async def list_files(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    location_id: Optional[str] = None,
+    status: Optional[str] = None,
+    include_results: bool = False
+) -> Dict[str, Any]:
+    """One keyset page of uploads, newest first: {"files": [...], "next_cursor": str | None}."""
+    limit = max(1, min(limit, FILE_LIST_MAX_LIMIT))
+    if cursor:
+        decode_cursor(cursor)
+    args = (limit, cursor, location_id, status, include_results)
+    return await file_list_cache.get_or_compute(fingerprint(args), lambda: _list_files_page(*args))
+
+@timed("db.insert_result")
+async def insert_result(result_data: Dict[str, Any]):
+    await execute(get_supabase().table("forecast_results").insert(result_data))
+
+@timed("db.insert_result_chunks")
+async def insert_result_chunks(chunks: List[Dict[str, Any]]):
+    await execute(get_supabase().table("forecast_result_chunks").insert(chunks))
+
+@timed("db.delete_result_chunks")
+async def delete_result_chunks(job_id: str):
+    await execute(get_supabase().table("forecast_result_chunks").delete().eq("job_id", job_id))
+
+@timed("db.update_result")
+async def update_result(job_id: str, fields: Dict[str, Any]):
+    await execute(get_supabase().table("forecast_results").update(fields).eq("job_id", job_id))
+
+@timed("db.list_results_page")
+async def list_results_page(after_id: Optional[Any], limit: int) -> List[Dict[str, Any]]:
+    """forecast_results rows ordered by id, starting after after_id (for batch jobs)."""
+    query = get_supabase().table("forecast_results").select("id,job_id,file_id,results").order("id")
+    if after_id is not None:
+        query = query.gt("id", after_id)
+    result = await execute(query.limit(limit))
+    return result.data or []
+
+@timed("db.list_result_chunks")
+async def list_result_chunks(job_id: str) -> List[Dict[str, Any]]:
+    """Chunk metadata (no data) for a job's stored series, in row order."""
+    result = await execute(
+        get_supabase().table("forecast_result_chunks")
+        .select("chunk_index,row_offset,row_count,menus")
+        .eq("job_id", job_id)
+        .order("chunk_index")
+    )
+    return result.data or []
+
+@timed("db.get_result_chunk_data")
+async def get_result_chunk_data(job_id: str, chunk_index: int) -> Dict[str, List[Any]]:
+    result = await execute(
+        get_supabase().table("forecast_result_chunks").select("data").eq("job_id", job_id).eq("chunk_index", chunk_index).limit(1)
+    )
+    return result.data[0]["data"] if result.data else {}
+
+@timed("db.list_results_for_file")
+async def list_results_for_file(file_id: str) -> List[Dict[str, Any]]:
+    result = await execute(get_supabase().table("forecast_results").select("*").eq("file_id", file_id))
+    return result.data
+
+@timed("db.get_result_by_job")
+async def get_result_by_job(job_id: str) -> Optional[Dict[str, Any]]:
+    result = await execute(get_supabase().table("forecast_results").select("*").eq("job_id", job_id).single())
+    return result.data
+
+@timed("db.get_job")
+async def get_job(job_id: str, columns: str = "*") -> Optional[Dict[str, Any]]:
+    result = await execute(get_supabase().table("forecast_jobs").select(columns).eq("id", job_id).single())
+    return result.data
@@ -0,0 +1,331 @@
+# Resumable direct-to-S3 uploads. The browser asks for a multipart upload, PUTs the parts
+# straight to S3 through presigned URLs (in parallel, retrying or resuming as it likes) and
+# then calls complete; the backend never carries the file bytes. Validation and the ML
+# call run afterwards as a background job, reading the object back from S3.
+#
+# The bucket needs a CORS rule allowing PUT from the dashboard origin (exposing the ETag
+# header) and a lifecycle rule that aborts incomplete multipart uploads.
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException
+from .storage import (
+    S3_UPLOAD_CHUNK_SIZE, direct_part_size, presign_parts, list_uploaded_parts,
+    complete_direct_upload, download_object, part_writer, delete_keys
+)
+from .concurrency import run_blocking
+from .shared_state import get_tier
+from .jobs import get_job_queue, PermanentJobError
+from .history import load_history, record_segment, segment_of, coverage, ml_fields
+from .endpoints import FAILED_UPLOAD_STATUSES, duplicate_upload_response, process_upload_job, fail_upload_job
+from .models import DirectUploadRequest
+from . import db, services, metrics
+from .metrics import span
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DIRECT_UPLOAD_PART_SIZE = int(os.getenv("DIRECT_UPLOAD_PART_SIZE", str(S3_UPLOAD_CHUNK_SIZE)))
+# Lifetime of each presigned part URL; a resume hands out fresh ones
+DIRECT_UPLOAD_URL_TTL = int(os.getenv("DIRECT_UPLOAD_URL_TTL", "3600"))
+# How long an unfinished upload can be resumed
+DIRECT_UPLOAD_TTL = int(os.getenv("DIRECT_UPLOAD_TTL", str(24 * 3600)))
+DIRECT_UPLOAD_MAX_BYTES = int(os.getenv("DIRECT_UPLOAD_MAX_BYTES", str(5 * 1024 ** 3)))
+# How long a complete call waits for a concurrent one on the same upload before answering 409
+DIRECT_UPLOAD_COMPLETE_WAIT = float(os.getenv("DIRECT_UPLOAD_COMPLETE_WAIT", "30"))
+# Upper bound on one complete call (S3 assembling the parts); its claim expires after this
+DIRECT_UPLOAD_COMPLETE_TTL = float(os.getenv("DIRECT_UPLOAD_COMPLETE_TTL", "900"))
+# How long the direct upload job waits for another upload of the same location to finish
+# ingesting; longer than the lock TTL, so a lock left by a dead worker expires first
+DIRECT_INGEST_LOCK_WAIT = float(os.getenv("DIRECT_INGEST_LOCK_WAIT", str(db.INGEST_LOCK_TTL + 30)))
+ALLOWED_EXTENSIONS = (".csv", ".xlsx", ".xls")
+
+DIRECT_UPLOAD_JOB = "direct_upload"
+
+router = APIRouter()
+
+# Upload sessions, keyed by S3 UploadId; shared so any worker can resume or complete one
+def _sessions():
+    return get_tier("direct_uploads")
+
+def _load_session(upload_id: str) -> Optional[Dict[str, Any]]:
+    entry = _sessions().get(upload_id)
+    return json.loads(entry[0]) if entry else None
+
+def _save_session(session: Dict[str, Any]):
+    _sessions().set(session["upload_id"], json.dumps(session).encode(), session["expires_at"])
+
+# Held by the complete call that is assembling an upload, so a concurrent one waits for it
+def _claim_completion(upload_id: str) -> bool:
+    return get_tier("direct_upload_completions").add(upload_id, b"1", time.time() + DIRECT_UPLOAD_COMPLETE_TTL)
+
+def _completion_claimed(upload_id: str) -> bool:
+    return get_tier("direct_upload_completions").get(upload_id) is not None
+
+def _release_completion(upload_id: str):
+    get_tier("direct_upload_completions").delete(upload_id)
+
+async def _session_or_404(upload_id: str) -> Dict[str, Any]:
+    session = await run_blocking(_load_session, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    return session
+
+def _s3_or_503():
+    s3_client = services.get_s3_client()
+    if not s3_client or not services.get_supabase_client():
+        raise HTTPException(status_code=503, detail="Storage service unavailable")
+    return s3_client
+
+@router.post("/uploads")
+async def create_direct_upload(request: DirectUploadRequest):
+    """Start a multipart upload and return presigned PUT URLs for every part."""
+    s3_client = _s3_or_503()
+    if not request.filename.lower().endswith(ALLOWED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=f"Unsupported file type; expected one of {', '.join(ALLOWED_EXTENSIONS)}")
+    if request.size > DIRECT_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {DIRECT_UPLOAD_MAX_BYTES} bytes")
+    location_name = await db.get_location_name(request.location_id)
+    if not location_name:
+        raise HTTPException(status_code=404, detail=f"Location with id {request.location_id} not found")
+
+    if request.content_hash and not request.force_reprocess:
+        existing = await db.find_file_by_hash(request.location_id, request.content_hash, exclude_statuses=FAILED_UPLOAD_STATUSES)
+        if existing:
+            logger.info(f"♻️ Direct upload of file {existing['id']} skipped, content already uploaded")
+            return duplicate_upload_response(existing, request.location_id)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{timestamp}_{request.filename}"
+    key = f"raw/{location_name}/{filename}"
+    part_size = direct_part_size(request.size, DIRECT_UPLOAD_PART_SIZE)
+    part_count = max(-(-request.size // part_size), 1)
+    created = await run_blocking(
+        s3_client.create_multipart_upload,
+        Bucket=services.S3_BUCKET, Key=key, ContentType=request.content_type or "application/octet-stream"
+    )
+    upload_id = created["UploadId"]
+    session = {
+        **request.dict(),
+        "upload_id": upload_id,
+        "key": key,
+        "location_name": location_name,
+        "stored_filename": filename,
+        "timestamp": timestamp,
+        "part_size": part_size,
+        "part_count": part_count,
+        "expires_at": time.time() + DIRECT_UPLOAD_TTL
+    }
+    await run_blocking(_save_session, session)
+    parts = await run_blocking(presign_parts, s3_client, services.S3_BUCKET, key, upload_id, range(1, part_count + 1), DIRECT_UPLOAD_URL_TTL)
+    logger.info(f"✅ Direct upload {upload_id} started for {key} ({request.size} bytes in {part_count} parts)")
+    return {
+        "upload_id": upload_id,
+        "key": key,
+        "part_size": part_size,
+        "part_count": part_count,
+        "parts": parts,
+        "expires_in": DIRECT_UPLOAD_URL_TTL,
+        "duplicate": False
+    }
+
+@router.get("/uploads/{upload_id}")
+async def resume_direct_upload(upload_id: str):
+    """Parts S3 already has, plus fresh presigned URLs for the ones still missing."""
+    s3_client = _s3_or_503()
+    session = await _session_or_404(upload_id)
+    if session.get("completed"):
+        return {**session["completed"], "upload_id": upload_id, "part_count": session["part_count"], "parts": []}
+    uploaded = await run_blocking(list_uploaded_parts, s3_client, services.S3_BUCKET, session["key"], upload_id)
+    done = {part["PartNumber"] for part in uploaded}
+    missing = [number for number in range(1, session["part_count"] + 1) if number not in done]
+    parts = await run_blocking(presign_parts, s3_client, services.S3_BUCKET, session["key"], upload_id, missing, DIRECT_UPLOAD_URL_TTL)
+    return {
+        "upload_id": upload_id,
+        "key": session["key"],
+        "part_size": session["part_size"],
+        "part_count": session["part_count"],
+        "uploaded_parts": [{"part_number": part["PartNumber"], "size": part["Size"]} for part in uploaded],
+        "parts": parts,
+        "expires_in": DIRECT_UPLOAD_URL_TTL,
+        "status": "uploading"
+    }
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """Assemble the uploaded parts, record the file and queue validation and ML processing.
+
+    Safe to retry, also concurrently: every call for a completed upload returns the
+    response of the one that completed it.
+    """
+    s3_client = _s3_or_503()
+    session = await _session_or_404(upload_id)
+    if session.get("completed"):
+        return session["completed"]
+    if not await run_blocking(_claim_completion, upload_id):
+        return await _await_completion(upload_id)
+    try:
+        # A call that finished between our read and the claim already saved its response
+        session = await _session_or_404(upload_id)
+        if session.get("completed"):
+            return session["completed"]
+        return await _complete(s3_client, session)
+    finally:
+        await run_blocking(_release_completion, upload_id)
+
+async def _await_completion(upload_id: str) -> Dict[str, Any]:
+    """Replay the response of the concurrent complete call once it has saved it."""
+    deadline = time.monotonic() + DIRECT_UPLOAD_COMPLETE_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+        session = await _session_or_404(upload_id)
+        if session.get("completed"):
+            return session["completed"]
+        if not await run_blocking(_completion_claimed, upload_id):
+            break
+    raise HTTPException(status_code=409, detail="Upload is being completed by another request; retry shortly")
+
+async def _complete(s3_client, session: Dict[str, Any]) -> Dict[str, Any]:
+    upload_id = session["upload_id"]
+    try:
+        with span("upload.s3_complete"):
+            stored = await run_blocking(complete_direct_upload, s3_client, services.S3_BUCKET, session["key"], upload_id, session["part_count"])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    metrics.upload_bytes.inc(stored.size)
+    logger.info(f"✅ Direct upload {upload_id} assembled at {stored.url} ({stored.size} bytes)")
+
+    inserted = await db.insert_file({
+        "filename": session["stored_filename"],
+        "s3_path": stored.url,
+        "upload_time": session["timestamp"],
+        "file_size": stored.size,
+        "file_type": session.get("content_type"),
+        "status": "queued",
+        "location_id": session["location_id"]
+    })
+    if not inserted:
+        raise HTTPException(status_code=500, detail="Failed to store file metadata")
+    file_id = inserted["id"]
+    job_id = await get_job_queue().submit(
+        DIRECT_UPLOAD_JOB,
+        {
+            "file_path": stored.url,
+            "key": session["key"],
+            "filename": session["stored_filename"],
+            "date_col": session["date_col"],
+            "menu_col": session["menu_col"],
+            "target_col": session["target_col"],
+            "file_id": file_id,
+            "location_id": session["location_id"],
+            # Location names may contain "/", so the job does not parse it back out of the key
+            "location_name": session.get("location_name"),
+            "timestamp": session["timestamp"],
+            "force_reprocess": bool(session.get("force_reprocess"))
+        },
+        upload_id=file_id
+    )
+    logger.info(f"✅ Validation and ML processing queued as job {job_id}")
+    response = {
+        "message": "File uploaded, processing queued",
+        "file_id": file_id,
+        "job_id": job_id,
+        "s3_url": stored.url,
+        "location_id": session["location_id"],
+        "status": "queued",
+        "duplicate": False
+    }
+    await run_blocking(_save_session, {**session, "completed": response})
+    return response
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Abort an unfinished upload; S3 drops the parts already sent."""
+    s3_client = _s3_or_503()
+    session = await _session_or_404(upload_id)
+    if session.get("completed"):
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    await run_blocking(s3_client.abort_multipart_upload, Bucket=services.S3_BUCKET, Key=session["key"], UploadId=upload_id)
+    await run_blocking(_sessions().delete, upload_id)
+    logger.info(f"🔄 Direct upload {upload_id} aborted")
+    return {"upload_id": upload_id, "status": "aborted"}
+
+async def _ingest(s3_client, payload: Dict[str, Any], prior: Optional[Dict[str, Any]]) -> Tuple[bool, Optional[str]]:
+    """Validate the object into a clean delta and append it to the location's history.
+
+    Returns (whether to run the ML job, clean path). Like /api/upload, an upload with no
+    new rows or repeating earlier content is skipped unless force_reprocess is set. The
+    browser does not send a content hash, so the duplicate check happens here, on the
+    hash of the bytes read back from S3.
+    """
+    from .validation import validate_and_normalize, FileValidationError
+    file_id = payload["file_id"]
+    # Jobs queued before location_name was carried in the payload look it up
+    location_name = payload.get("location_name") or await db.get_location_name(payload["location_id"])
+    clean_prefix = f"clean/{location_name}/{os.path.splitext(payload['filename'])[0]}/"
+
+    await db.update_file(file_id, {"status": "validating"})
+    source, content_hash = await run_blocking(download_object, s3_client, services.S3_BUCKET, payload["key"])
+    if not payload.get("force_reprocess"):
+        existing = await db.find_file_by_hash(payload["location_id"], content_hash, exclude_statuses=FAILED_UPLOAD_STATUSES)
+        if existing and str(existing["id"]) != str(file_id):
+            source.close()
+            # No content_hash on this row, so later lookups keep finding the original
+            await db.update_file(file_id, {"status": "duplicate", "ml_result": existing.get("ml_result")})
+            logger.info(f"♻️ Direct upload of file {file_id} repeats file {existing['id']}, skipping processing")
+            return False, None
+    try:
+        with span("upload.validate"):
+            report = await run_blocking(
+                validate_and_normalize,
+                source, payload["filename"], payload["date_col"], payload["menu_col"], payload["target_col"],
+                part_writer(s3_client, services.S3_BUCKET, clean_prefix),
+                covered=coverage(prior)
+            )
+    except FileValidationError as e:
+        if e.report and e.report.parts:
+            await run_blocking(delete_keys, s3_client, services.S3_BUCKET, e.report.parts)
+        await db.update_file(file_id, {"status": "upload_failed", "error": str(e)})
+        raise PermanentJobError(str(e))
+    finally:
+        source.close()
+
+    clean_path = f"s3://{services.S3_BUCKET}/{clean_prefix}" if report.new_rows else None
+    logger.info(f"✅ Validated {report.valid_rows}/{report.total_rows} rows, {report.new_rows} new, clean copy at {clean_path}")
+    fields = {"clean_path": clean_path, "row_count": report.valid_rows, "content_hash": content_hash}
+    if not report.new_rows:
+        if not payload.get("force_reprocess"):
+            await db.update_file(file_id, {**fields, "status": "up_to_date"})
+            logger.info(f"♻️ No new rows for location {payload['location_id']}, skipping processing")
+            return False, None
+        await db.update_file(file_id, fields)
+        return True, None
+    await db.update_file(file_id, fields)
+    await record_segment(payload["location_id"], prior, file_id, clean_path, report)
+    return True, clean_path
+
+async def process_direct_upload_job(job_id: str, payload: Dict[str, Any]):
+    """Background job: validate a directly uploaded file from S3, then run the ML upload job."""
+    location_id = payload["location_id"]
+    # Wait out another upload of the same location; the 503 is only for a lock that outlives the wait
+    if not await db.wait_location_ingest(location_id, DIRECT_INGEST_LOCK_WAIT):
+        raise HTTPException(status_code=503, detail="Another upload for this location is being ingested")
+    try:
+        prior = await load_history(location_id)
+        ingested = segment_of(prior, payload["file_id"])
+        if ingested:
+            # A retry after ingestion succeeded: only the ML call is left
+            prior, segment = ingested
+            process, clean_path = True, segment["path"]
+        else:
+            process, clean_path = await _ingest(services.get_s3_client(), payload, prior)
+    finally:
+        await run_blocking(db.release_location_ingest, location_id)
+    if process:
+        await process_upload_job(job_id, {**payload, "clean_path": clean_path, **ml_fields(prior, clean_path)})
+
+get_job_queue().register(DIRECT_UPLOAD_JOB, process_direct_upload_job, on_failure=fail_upload_job)
@@ -0,0 +1,453 @@
+# Dashboard-facing endpoints, mounted under /api by the app factory (see api.factory).
+# Heavy modules (pandas via validation and preview) are imported inside the handlers
+# that need them, so they are not paid for at startup.
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Query
+from fastapi.responses import Response, StreamingResponse
+from dotenv import load_dotenv
+from .http_client import get_ml_client, ML_SERVICE, ML_PROCESS_DEADLINE
+from .resilience import resilient_call
+from .storage import stream_upload, part_writer, delete_keys, sha256_file
+from .concurrency import run_blocking
+from . import db, services
+from .jobs import get_job_queue
+from .results import result_reference, full_result
+from . import summaries
+from .history import load_history, record_segment, rollback_segment, coverage, ml_fields
+from .wire import parse_forecast_body, OPENAPI_REQUEST_BODY
+from .responses import json_with_etag
+from .auth import get_current_user
+from .forecasting import run_forecast, forecast_cache, run_forecast_batch, stream_batch, batch_media_type
+from .models import FileDetailsRequest, BatchForecastRequest
+from . import metrics
+from .metrics import span
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ML API configuration
+ML_API_URL = os.getenv("ML_API_URL", "http://host.docker.internal:8001")
+
+router = APIRouter()
+# Routes served outside the /api prefix
+root_router = APIRouter()
+
+# --- Forecasting Endpoints ---
+@router.post("/forecast", openapi_extra=OPENAPI_REQUEST_BODY)
+async def create_forecast(request: Request):
+    """Forecast from JSON records, columnar JSON, Arrow IPC or Parquet (chosen by Content-Type)."""
+    forecast = parse_forecast_body(request.headers.get("content-type"), await request.body(), request.query_params)
+    return await run_forecast(ML_API_URL, forecast)
+
+@router.post("/forecast/batch")
+async def create_forecast_batch(batch: BatchForecastRequest, request: Request):
+    """Forecast many jobs concurrently, streaming each result as NDJSON (or SSE) when it is ready."""
+    media_type = batch_media_type(request.headers.get("accept"))
+    return StreamingResponse(
+        stream_batch(run_forecast_batch(ML_API_URL, batch.items), media_type),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/forecast/cache")
+async def forecast_cache_stats():
+    """Hit/miss/eviction counters for the forecast result cache."""
+    return forecast_cache.snapshot()
+
+@router.delete("/forecast/cache")
+async def invalidate_forecast_cache(key: Optional[str] = None, user=Depends(get_current_user)):
+    """Drop one cached forecast by key, or the whole cache when no key is given."""
+    await forecast_cache.invalidate(key)
+    return {"invalidated": key or "all"}
+
+ML_UPLOAD_JOB = "ml_upload"
+
+async def process_upload_job(job_id: str, payload: Dict[str, Any]):
+    """Background job: send an uploaded file to the ML service and store its results."""
+    file_id = payload["file_id"]
+    client = get_ml_client()
+    data = {key: payload.get(key) for key in ("file_path", "clean_path", "filename", "date_col", "menu_col", "target_col", "file_id", "location_id")}
+    # Incremental uploads also name the delta and the location's earlier history segments
+    data.update({key: payload[key] for key in ("mode", "delta_path", "history_segments", "watermark") if key in payload})
+    logger.info(f"🔄 Job {job_id}: sending S3 URL to ML service: {ML_API_URL}/api/v1/upload")
+    await db.update_file(file_id, {"status": "processing"})
+    try:
+        # Not idempotent on the ML side, so no retries here; the job queue retries the whole job
+        with span("upload.ml_call"):
+            response = await resilient_call(
+                ML_SERVICE,
+                lambda timeout: client.post(f"{ML_API_URL}/api/v1/upload", json=data, timeout=timeout),
+                timeout=ML_PROCESS_DEADLINE
+            )
+    except HTTPException as e:
+        # The job queue may retry; fail_upload_job marks the upload failed once it gives up
+        logger.error(f"❌ ML service error: {e}")
+        raise
+    ml_response = response.json()
+    logger.info("✅ ML service response received")
+    
+    # Store results under our job id, then mark the file completed with the result summary
+    with span("upload.result_write"):
+        summary = await services.store_job_result(job_id, file_id, ml_response, payload["timestamp"])
+        await db.update_file(file_id, {
+            "status": "completed",
+            "ml_result": result_reference(job_id, summary)
+        })
+    logger.info("✅ Status updated in Supabase: completed")
+    await _record_run(payload, job_id, "completed", ml_result=ml_response)
+
+async def _record_run(payload: Dict[str, Any], job_id: str, status: str, **kwargs):
+    """Update the location's dashboard summary; a failure here must not fail the job."""
+    if not payload.get("location_id"):
+        return
+    try:
+        await summaries.record_run(payload["location_id"], job_id, payload.get("file_id"), status, **kwargs)
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to update summary of location {payload['location_id']}: {e}")
+
+# Uploads in these states are not reused by content-hash deduplication
+FAILED_UPLOAD_STATUSES = ("upload_failed", "processing_failed")
+
+async def fail_upload_job(job_id: str, payload: Dict[str, Any], error: Exception):
+    """A job that failed for good marks its upload failed and records the failed run.
+
+    The rows it added to the location's history are rolled back, so uploading the file
+    again processes them instead of finding them already ingested.
+    """
+    await db.fail_file(payload["file_id"], str(error), keep_statuses=FAILED_UPLOAD_STATUSES)
+    logger.error(f"❌ Job {job_id} gave up on file {payload['file_id']}: {error}")
+    await _record_run(payload, job_id, "processing_failed", error=str(error))
+    if payload.get("location_id"):
+        await rollback_segment(payload["location_id"], payload["file_id"])
+
+get_job_queue().register(ML_UPLOAD_JOB, process_upload_job, on_failure=fail_upload_job)
+
+def duplicate_upload_response(existing: Dict[str, Any], location_id: str) -> Dict[str, Any]:
+    """Response for an upload whose content was already processed for the location."""
+    existing, results = db.split_results(existing)
+    return {
+        "message": "File already uploaded, returning existing results",
+        "file_id": existing["id"],
+        "job_id": results[0]["job_id"] if results else None,
+        "s3_url": existing.get("s3_path"),
+        "location_id": location_id,
+        "status": existing.get("status"),
+        "duplicate": True,
+        "results": results
+    }
+
+# Fixed upload endpoint to handle FormData properly
+@router.post("/upload")
+async def upload_data(
+    file: UploadFile = File(...),
+    date_col: str = Form(...),
+    menu_col: str = Form(...),
+    target_col: str = Form(...),
+    location_id: str = Form(...),
+    force_reprocess: bool = Form(False)
+):
+    file_id = None
+    claimed_hash = None
+    ingest_locked = False
+    segment_recorded = False
+    try:
+        logger.info(f"Received file upload: {file.filename}")
+        
+        # Step 1: Look up location name from location_id
+        supabase, s3_client = services.get_supabase_client(), services.get_s3_client()
+        if not supabase:
+            raise Exception("Supabase not available")
+        with span("upload.location_lookup"):
+            location_name = await db.get_location_name(location_id)
+        if not location_name:
+            raise Exception(f"Location with id {location_id} not found")
+        
+        # Step 2: Skip everything if this exact file was already uploaded for the location
+        with span("upload.read"):
+            content_hash = await run_blocking(sha256_file, file.file)
+        if not force_reprocess:
+            existing = await db.find_file_by_hash(location_id, content_hash, exclude_statuses=FAILED_UPLOAD_STATUSES)
+            if existing:
+                logger.info(f"♻️ Duplicate upload of file {existing['id']} (sha256 {content_hash}), skipping processing")
+                return duplicate_upload_response(existing, location_id)
+            # Workers share the claim, so two concurrent copies of a file are not both processed
+            if not await run_blocking(db.claim_upload, location_id, content_hash):
+                raise HTTPException(status_code=409, detail="An identical upload is already being processed")
+            claimed_hash = content_hash
+        
+        # Step 3: Validate the mapped columns chunk by chunk and write a typed Parquet copy
+        # under clean/{location_name}/, so malformed files fail here instead of in the ML service.
+        # Only rows on dates the location's history lacks for their menu item are kept: the
+        # clean copy is the delta
+        if not await run_blocking(db.claim_location_ingest, location_id):
+            raise HTTPException(status_code=409, detail="Another upload for this location is being ingested")
+        ingest_locked = True
+        prior = await load_history(location_id)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{timestamp}_{file.filename}"
+        clean_prefix = f"clean/{location_name}/{os.path.splitext(filename)[0]}/"
+        from .validation import validate_and_normalize, FileValidationError
+        try:
+            with span("upload.validate"):
+                report = await run_blocking(
+                    validate_and_normalize,
+                    file.file, file.filename, date_col, menu_col, target_col,
+                    part_writer(s3_client, services.S3_BUCKET, clean_prefix),
+                    covered=coverage(prior)
+                )
+        except FileValidationError as e:
+            if e.report and e.report.parts:
+                await run_blocking(delete_keys, s3_client, services.S3_BUCKET, e.report.parts)
+            raise HTTPException(
+                status_code=422,
+                detail={"message": str(e), "validation": e.report.dict() if e.report else None}
+            )
+        clean_path = f"s3://{services.S3_BUCKET}/{clean_prefix}" if report.new_rows else None
+        logger.info(f"✅ Validated {report.valid_rows}/{report.total_rows} rows, {report.new_rows} new, clean copy at {clean_path}")
+        
+        # Step 4: Save the raw file to S3 under raw/{location_name}/...
+        await file.seek(0)
+        s3_key = f"raw/{location_name}/{filename}"
+        with span("upload.s3_put"):
+            stored = await stream_upload(s3_client, file, services.S3_BUCKET, s3_key)
+        metrics.upload_bytes.inc(stored.size)
+        s3_url = stored.url
+        logger.info(f"✅ File uploaded to S3: {s3_url} ({stored.size} bytes, sha256 {stored.sha256})")
+        
+        # Step 5: Store file metadata in Supabase
+        file_metadata = {
+            "filename": filename,
+            "s3_path": s3_url,
+            "clean_path": clean_path,
+            "row_count": report.valid_rows,
+            "content_hash": content_hash,
+            "upload_time": timestamp,
+            "file_size": stored.size,
+            "file_type": file.content_type,
+            "status": "uploaded",
+            "location_id": location_id
+        }
+        with span("upload.metadata_insert"):
+            inserted = await db.insert_file(file_metadata)
+        if inserted:
+            file_id = inserted["id"]
+            logger.info(f"✅ Metadata stored in Supabase with file_id: {file_id}")
+        else:
+            raise Exception("Failed to store file metadata")
+        if report.new_rows:
+            await record_segment(location_id, prior, file_id, clean_path, report)
+            segment_recorded = True
+        elif not force_reprocess:
+            # No new rows: the location's history and forecasts are current
+            await db.update_file(file_id, {"status": "up_to_date"})
+            logger.info(f"♻️ No new rows for location {location_id}, skipping processing")
+            return {
+                "message": "No new rows since the last upload",
+                "file_id": file_id,
+                "job_id": None,
+                "s3_url": s3_url,
+                "location_id": location_id,
+                "status": "up_to_date",
+                "duplicate": False,
+                "validation": report.dict()
+            }
+        
+        # Step 6: Hand the ML call to the background job queue and return right away
+        await db.update_file(file_id, {"status": "queued"})
+        job_id = await get_job_queue().submit(
+            ML_UPLOAD_JOB,
+            {
+                "file_path": s3_url,
+                "clean_path": clean_path,
+                "filename": filename,
+                "date_col": date_col,
+                "menu_col": menu_col,
+                "target_col": target_col,
+                "file_id": file_id,
+                "location_id": location_id,
+                "timestamp": timestamp,
+                **ml_fields(prior, clean_path)
+            },
+            upload_id=file_id
+        )
+        logger.info(f"✅ ML processing queued as job {job_id}")
+        
+        return {
+            "message": "File uploaded, processing queued",
+            "file_id": file_id,
+            "job_id": job_id,
+            "s3_url": s3_url,
+            "location_id": location_id,
+            "status": "queued",
+            "duplicate": False,
+            "validation": report.dict()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Upload error: {e}")
+        if file_id:
+            try:
+                await db.update_file(file_id, {
+                    "status": "upload_failed",
+                    "error": str(e)
+                })
+            except Exception as update_error:
+                logger.warning(f"⚠️ Failed to update error status: {update_error}")
+        if segment_recorded:
+            # Never queued, so nothing will process these rows; let a re-upload ingest them
+            try:
+                await rollback_segment(location_id, file_id, locked=True)
+            except Exception as rollback_error:
+                logger.warning(f"⚠️ Failed to roll back history of location {location_id}: {rollback_error}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Upload failed: {str(e)}"
+        )
+    finally:
+        # The file row now answers duplicate lookups (or the upload failed), so let go of the claim
+        if claimed_hash:
+            await run_blocking(db.release_upload, location_id, claimed_hash)
+        if ingest_locked:
+            await run_blocking(db.release_location_ingest, location_id)
+
+@router.get("/health")
+async def health_check():
+    return {"status": "healthy", "ml_service_url": ML_API_URL}
+
+@router.get("/files")
+async def get_uploaded_files(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    location_id: Optional[str] = None,
+    status: Optional[str] = None,
+    include_results: bool = False
+):
+    """Get one page of uploaded files with their status and metadata.
+
+    Pass next_cursor back as cursor for the following page; count is the number of files
+    on this page, not overall. ml_result is only included with include_results=true.
+    Supports If-None-Match.
+    """
+    try:
+        page = await services.list_uploaded_files(limit, cursor, location_id, status, include_results)
+        return json_with_etag(request, {
+            "files": page["files"],
+            "count": len(page["files"]),
+            "next_cursor": page["next_cursor"]
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get uploaded files: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to retrieve uploaded files"
+        )
+
+@router.post("/files/details")
+async def get_files_details(request: FileDetailsRequest):
+    """Get metadata and results for many uploaded files in one call."""
+    try:
+        file_ids = list(dict.fromkeys(request.file_ids))
+        found = await db.get_files_with_results(file_ids)
+        return {
+            "files": [{"file": found[fid][0], "results": found[fid][1]} for fid in file_ids if fid in found],
+            "missing": [fid for fid in file_ids if fid not in found]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get file details: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to retrieve file details"
+        )
+
+@router.get("/files/{file_id}")
+async def get_file_details(file_id: str, full: bool = False):
+    """Get detailed information about a specific uploaded file.
+
+    Results carry their stored summary; full=true fetches the complete ML output.
+    """
+    try:
+        if not services.get_supabase_client():
+            raise HTTPException(status_code=503, detail="Database service unavailable")
+        
+        # File metadata and its results in one embedded query
+        found = await db.get_file_with_results(file_id)
+        if not found:
+            raise HTTPException(status_code=404, detail="File not found")
+        file_data, results = found
+        if full:
+            results = [{**row, "results": await full_result(row.get("job_id"), row.get("results"))} for row in results]
+        
+        return {
+            "file": file_data,
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get file details: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to retrieve file details"
+        )
+
+@router.delete("/locations/cache")
+async def clear_location_cache(location_id: Optional[str] = None, user=Depends(get_current_user)):
+    """Drop cached location names after a location is renamed outside this API."""
+    await db.invalidate_location(location_id)
+    return {"status": "cleared", "location_id": location_id}
+
+@router.get("/locations/{location_id}/summary")
+async def location_summary(location_id: str, request: Request, user=Depends(get_current_user)):
+    """Dashboard overview of a location: forecast totals per menu item, latest run and accuracy.
+
+    Precomputed as upload jobs finish; supports If-None-Match.
+    """
+    summary = await summaries.get_summary(location_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No completed forecasts for this location yet")
+    return json_with_etag(request, summary, max_age=int(summaries.LOCATION_SUMMARY_CACHE_TTL))
+
+@router.post("/preview")
+async def preview_file(file: UploadFile = File(...)):
+    """Preview the first few rows of an uploaded file to help with column mapping."""
+    if not file.filename.lower().endswith(('.csv', '.xlsx', '.xls')):
+        raise HTTPException(status_code=400, detail="Unsupported file format")
+    try:
+        # Only a bounded sample is parsed, off the event loop
+        from .preview import preview_file as build_preview, PreviewError
+        return await run_blocking(build_preview, file.file, file.filename)
+    except PreviewError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Preview error: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to preview file: {str(e)}"
+        )
+
+# Health check for services
+@router.get("/services/health")
+async def services_health():
+    return services.get_service_status()
+
+@root_router.get("/")
+async def root():
+    return {"message": "Forecasting API is running"}
+
+@root_router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
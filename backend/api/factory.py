@@ -0,0 +1,81 @@
+# The one FastAPI application, used by uvicorn (main:app) and by the tests alike.
+# Startup stays cheap: external clients are created lazily (warmed in the background
+# once the app is up) and heavy libraries are imported by the handlers that need them.
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from .http_client import start_ml_client, close_ml_client
+from .concurrency import run_blocking, shutdown_executor
+from .jobs import get_job_queue
+from .metrics import MetricsMiddleware
+from .resilience import DeadlineMiddleware
+from .admission import AdmissionMiddleware
+from . import services
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",") if origin.strip()]
+# Create the Supabase/S3 clients in the background right after startup instead of on the first request
+WARM_CLIENTS = os.getenv("WARM_CLIENTS", "true").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled ML-service client for the lifetime of the app
+    await start_ml_client()
+    warm = asyncio.create_task(run_blocking(services.init_clients)) if WARM_CLIENTS else None
+    await get_job_queue().start()
+    yield
+    await get_job_queue().stop()
+    if warm is not None and not warm.done():
+        warm.cancel()
+    await close_ml_client()
+    shutdown_executor()
+
+def create_app() -> FastAPI:
+    """Build the application: middleware, then the /api routers and the root routes."""
+    from .endpoints import router as endpoints_router, root_router
+    from .routes import router as authenticated_router
+    from .direct_uploads import router as direct_upload_router
+
+    logging.basicConfig(level=logging.INFO)
+    app = FastAPI(
+        title="Forecasting Web App API",
+        description="API for the forecasting web application",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Concurrency limits, wait queues and quotas for upload/preview/forecast; added first so
+    # it runs innermost and its 429/503 responses still get CORS headers
+    app.add_middleware(AdmissionMiddleware)
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Downstream calls share the budget sent in X-Request-Timeout-Ms
+    app.add_middleware(DeadlineMiddleware)
+    # Per-route latency, in-flight and payload-size metrics (see /metrics)
+    app.add_middleware(MetricsMiddleware)
+
+    app.include_router(endpoints_router, prefix="/api")
+    app.include_router(direct_upload_router, prefix="/api")
+    app.include_router(authenticated_router, prefix="/api")
+    app.include_router(root_router)
+    return app
+
+_app = None
+
+def get_app() -> FastAPI:
+    """The process-wide application instance, built on first use."""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
@@ -0,0 +1,166 @@
+# Shared forecast call path used by both /api/forecast handlers.
+import os
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List
+from fastapi import HTTPException
+from .cache import ResultCache, fingerprint
+from .http_client import get_ml_client, ML_FORECAST_DEADLINE, ML_SERVICE
+from .wire import BINARY_FORMATS, EncodedForecast, ForecastInput
+from .metrics import timed
+from .models import BASELINE_MODELS, BatchForecastItem, ForecastRequest
+from .concurrency import run_cpu
+from .resilience import get_breaker, resilient_call
+from .shared_state import shared_tier
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Forecast result cache configuration
+FORECAST_CACHE_ENABLED = os.getenv("FORECAST_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", "900"))
+FORECAST_CACHE_MAX_BYTES = int(os.getenv("FORECAST_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "1024"))
+FORECAST_CACHE_DIR = os.getenv("FORECAST_CACHE_DIR")
+# Serve a local baseline forecast when the ML service fails or its circuit is open
+FORECAST_FALLBACK_ENABLED = os.getenv("FORECAST_FALLBACK_ENABLED", "true").lower() in ("1", "true", "yes")
+FORECAST_FALLBACK_MODEL = os.getenv("FORECAST_FALLBACK_MODEL", "exp_smoothing")
+
+# Concurrent ML calls per /forecast/batch request
+FORECAST_BATCH_CONCURRENCY = max(int(os.getenv("FORECAST_BATCH_CONCURRENCY", "8")), 1)
+
+NDJSON = "application/x-ndjson"
+EVENT_STREAM = "text/event-stream"
+
+forecast_cache = ResultCache(
+    "forecast",
+    ttl=FORECAST_CACHE_TTL,
+    max_bytes=FORECAST_CACHE_MAX_BYTES,
+    max_entries=FORECAST_CACHE_MAX_ENTRIES,
+    disk_dir=FORECAST_CACHE_DIR,
+    shared=shared_tier("forecast")
+)
+
+def forecast_cache_key(request: ForecastInput) -> str:
+    """Content address of a forecast request: same data and options give the same key."""
+    if isinstance(request, EncodedForecast):
+        return fingerprint(request.cache_key_payload())
+    return fingerprint(request.dict())
+
+@timed("ml.forecast")
+async def call_forecast_service(ml_url: str, request: ForecastInput) -> Any:
+    """POST a forecast to the ML service, mapping failures to HTTPException.
+
+    Columnar and binary encodings are forwarded as-is with their own Content-Type.
+    Forecasts are pure functions of their input, so the call is retried and may be hedged.
+    """
+    client = get_ml_client()
+    if isinstance(request, EncodedForecast):
+        kwargs = {
+            "content": request.body,
+            "headers": {"Content-Type": request.content_type},
+            "params": request.query_params() if request.content_type in BINARY_FORMATS else None
+        }
+    else:
+        kwargs = {"json": request.dict()}
+    response = await resilient_call(
+        ML_SERVICE,
+        lambda timeout: client.post(f"{ml_url}/forecast", timeout=timeout, **kwargs),
+        timeout=ML_FORECAST_DEADLINE,
+        idempotent=True
+    )
+    return response.json()
+
+def _options(request: ForecastInput):
+    return request.options if isinstance(request, EncodedForecast) else request
+
+async def run_baseline(request: ForecastInput, method: str = None) -> Dict[str, Any]:
+    """Forecast with the local baseline engine in a worker process; 422 when no row is usable."""
+    # numpy/pandas are only loaded once a baseline forecast is actually needed
+    from .baseline import baseline_forecast, UnusableData
+    options = _options(request)
+    try:
+        if isinstance(request, EncodedForecast):
+            return await run_cpu(baseline_forecast, options.dict(), content_type=request.content_type, body=request.body, method=method)
+        return await run_cpu(baseline_forecast, options.dict(exclude={"data"}), records=request.data, method=method)
+    except UnusableData as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def _fallback(request: ForecastInput, reason: str) -> Dict[str, Any]:
+    logger.warning(f"⚠️ Serving {FORECAST_FALLBACK_MODEL} baseline forecast: {reason}")
+    result = await run_baseline(request, FORECAST_FALLBACK_MODEL)
+    result["fallback"] = {"reason": reason, "model": FORECAST_FALLBACK_MODEL}
+    return result
+
+async def _cached_forecast(ml_url: str, request: ForecastInput) -> Any:
+    if not FORECAST_CACHE_ENABLED:
+        return await call_forecast_service(ml_url, request)
+    return await forecast_cache.get_or_compute(
+        forecast_cache_key(request),
+        lambda: call_forecast_service(ml_url, request)
+    )
+
+async def run_forecast(ml_url: str, request: ForecastInput) -> Any:
+    """Return the forecast for request, served from cache when an identical request was seen.
+
+    Baseline model types run locally. When the ML service errors out or its circuit is
+    open, a baseline forecast (marked with "fallback") is returned instead of an error.
+    """
+    if _options(request).model_type in BASELINE_MODELS:
+        return await run_baseline(request)
+    if FORECAST_FALLBACK_ENABLED and get_breaker(ML_SERVICE).is_open():
+        cached = await forecast_cache.get(forecast_cache_key(request)) if FORECAST_CACHE_ENABLED else None
+        return cached if cached is not None else await _fallback(request, "ML service circuit open")
+    try:
+        return await _cached_forecast(ml_url, request)
+    except HTTPException as e:
+        if not FORECAST_FALLBACK_ENABLED or (e.status_code < 500 and e.status_code != 429):
+            raise
+        return await _fallback(request, f"ML service error {e.status_code}")
+
+async def _run_batch_item(ml_url: str, index: int, item: BatchForecastItem, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    header = {"index": index, "id": item.id if item.id is not None else str(index), "location_id": item.location_id}
+    request = ForecastRequest(**item.dict(exclude={"id", "location_id"}))
+    try:
+        async with semaphore:
+            result = await run_forecast(ml_url, request)
+        return {**header, "status": "ok", "result": result}
+    except HTTPException as e:
+        return {**header, "status": "error", "status_code": e.status_code, "error": e.detail}
+    except Exception as e:
+        logger.error(f"❌ Batch forecast item {header['id']} failed: {e}")
+        return {**header, "status": "error", "status_code": 500, "error": str(e)}
+
+async def run_forecast_batch(
+    ml_url: str,
+    items: List[BatchForecastItem],
+    concurrency: int = FORECAST_BATCH_CONCURRENCY
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run forecasts concurrently and yield each outcome as soon as it finishes.
+
+    A failed item yields an error entry instead of aborting the batch. Closing the
+    generator (client disconnect) cancels whatever is still running.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.ensure_future(_run_batch_item(ml_url, i, item, semaphore)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_batch(events: AsyncIterator[Dict[str, Any]], media_type: str) -> AsyncIterator[bytes]:
+    """Frame batch outcomes as NDJSON lines or server-sent events, ending with a summary."""
+    counts = {"ok": 0, "error": 0}
+    async for event in events:
+        counts[event["status"]] += 1
+        data = json.dumps(event, separators=(",", ":"), default=str)
+        yield f"event: result\ndata: {data}\n\n".encode() if media_type == EVENT_STREAM else f"{data}\n".encode()
+    summary = json.dumps({"status": "done", **counts})
+    yield f"event: done\ndata: {summary}\n\n".encode() if media_type == EVENT_STREAM else f"{summary}\n".encode()
+
+def batch_media_type(accept: str) -> str:
+    """SSE when the client asks for text/event-stream, NDJSON otherwise."""
+    return EVENT_STREAM if EVENT_STREAM in (accept or "") else NDJSON
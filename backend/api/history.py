@@ -0,0 +1,118 @@
+# Incremental ingestion per location. Each location keeps a columnar history: the clean
+# Parquet copies of its uploads, in order, each recording the dates it added per menu item.
+# An upload only keeps rows on dates its menu item does not have yet (a menu item never
+# seen before is kept whole), so its clean copy is just the delta, and the ML service is
+# sent that delta plus the earlier segments instead of reprocessing a whole export that
+# mostly repeats what it has seen. A segment whose processing fails for good is rolled
+# back, so uploading the file again ingests those rows again.
+#
+# Stored in the location_history table: location_id (unique), watermark (latest ISO date),
+# row_count, segments (JSON list of {path, file_id, min_date, max_date, rows, menus}, where
+# menus maps each menu item to the [first, last] date it added), updated_at.
+import os
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from . import db
+from .concurrency import run_blocking
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+INCREMENTAL_INGEST = os.getenv("INCREMENTAL_INGEST", "true").lower() in ("1", "true", "yes")
+
+async def load_history(location_id: str) -> Optional[Dict[str, Any]]:
+    """The location's ingestion history, or None before its first incremental upload."""
+    if not INCREMENTAL_INGEST:
+        return None
+    return await db.get_location_history(location_id)
+
+def watermark(history: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Latest date any segment of the history holds."""
+    return max((segment["max_date"] for segment in (history or {}).get("segments") or [] if segment.get("max_date")), default=None)
+
+def coverage(history: Optional[Dict[str, Any]]) -> Dict[str, List[List[str]]]:
+    """Per menu item, the merged [first, last] date ranges the history already holds."""
+    spans: Dict[str, List[List[str]]] = {}
+    for segment in (history or {}).get("segments") or []:
+        for menu, (first, last) in (segment.get("menus") or {}).items():
+            spans.setdefault(menu, []).append([first, last])
+    merged = {}
+    for menu, ranges in spans.items():
+        ranges.sort()
+        merged[menu] = [ranges[0]]
+        for first, last in ranges[1:]:
+            current = merged[menu][-1]
+            if date.fromisoformat(first) <= date.fromisoformat(current[1]) + timedelta(days=1):
+                current[1] = max(current[1], last)
+            else:
+                merged[menu].append([first, last])
+    return merged
+
+async def _save(location_id: str, history: Optional[Dict[str, Any]], segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    fields = {
+        "watermark": watermark({"segments": segments}),
+        "row_count": sum(segment.get("rows") or 0 for segment in segments),
+        "segments": segments,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.save_location_history(location_id, fields, exists=history is not None)
+    return {**(history or {"location_id": location_id}), **fields}
+
+async def record_segment(location_id: str, history: Optional[Dict[str, Any]], file_id: str, clean_path: str, report) -> Dict[str, Any]:
+    """Append an upload's clean delta to the history. The caller holds the ingest lock."""
+    segments = list((history or {}).get("segments") or [])
+    segments.append({
+        "path": clean_path,
+        "file_id": file_id,
+        "min_date": report.min_date,
+        "max_date": report.max_date,
+        "rows": report.new_rows,
+        "menus": report.menu_ranges
+    })
+    saved = await _save(location_id, history, segments)
+    logger.info(f"✅ Location {location_id} history +{report.new_rows} rows in {len(report.menu_ranges)} menu items, up to {saved['watermark']}")
+    return saved
+
+async def rollback_segment(location_id: str, file_id: str, locked: bool = False):
+    """Drop an upload's segment so its rows count as new again.
+
+    Takes the location's ingest lock unless the caller already holds it.
+    """
+    if not INCREMENTAL_INGEST:
+        return
+    if not locked and not await db.wait_location_ingest(location_id):
+        logger.warning(f"⚠️ Could not lock location {location_id} to roll back the segment of file {file_id}")
+        return
+    try:
+        history = await load_history(location_id)
+        segments = (history or {}).get("segments") or []
+        kept = [segment for segment in segments if segment.get("file_id") != file_id]
+        if len(kept) != len(segments):
+            await _save(location_id, history, kept)
+            logger.info(f"🔄 Rolled back the segment of file {file_id} from location {location_id}")
+    finally:
+        if not locked:
+            await run_blocking(db.release_location_ingest, location_id)
+
+def segment_of(history: Optional[Dict[str, Any]], file_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """For an upload already in the history: (the history as it was before it, its segment)."""
+    segments = (history or {}).get("segments") or []
+    for index, segment in enumerate(segments):
+        if segment.get("file_id") == file_id:
+            earlier = segments[:index]
+            before = {**history, "segments": earlier, "watermark": watermark({"segments": earlier})}
+            return before, segment
+    return None
+
+def ml_fields(history: Optional[Dict[str, Any]], clean_path: Optional[str]) -> Dict[str, Any]:
+    """Fields added to the ML upload request: the delta and the segments ingested before it."""
+    if not INCREMENTAL_INGEST:
+        return {}
+    segments = [segment["path"] for segment in (history or {}).get("segments") or []]
+    return {
+        "mode": "incremental" if segments else "full",
+        "delta_path": clean_path,
+        "history_segments": segments,
+        "watermark": watermark(history)
+    }
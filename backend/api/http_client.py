@@ -0,0 +1,61 @@
+import os
+import logging
+from typing import Optional
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration for calls to the ML service
+ML_HTTP_MAX_CONNECTIONS = int(os.getenv("ML_HTTP_MAX_CONNECTIONS", "100"))
+ML_HTTP_MAX_KEEPALIVE = int(os.getenv("ML_HTTP_MAX_KEEPALIVE", "20"))
+ML_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ML_HTTP_KEEPALIVE_EXPIRY", "30"))
+ML_HTTP_TIMEOUT = float(os.getenv("ML_HTTP_TIMEOUT", "60"))
+ML_HTTP_CONNECT_TIMEOUT = float(os.getenv("ML_HTTP_CONNECT_TIMEOUT", "5"))
+ML_HTTP_POOL_TIMEOUT = float(os.getenv("ML_HTTP_POOL_TIMEOUT", "10"))
+# Per-endpoint deadlines for ML calls, further capped by the inbound request's budget
+ML_FORECAST_DEADLINE = float(os.getenv("ML_FORECAST_DEADLINE", "30"))
+ML_PROCESS_DEADLINE = float(os.getenv("ML_PROCESS_DEADLINE", "120"))
+ML_SERVICE = "ml_service"
+ML_HTTP2 = os.getenv("ML_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+
+def _build_client() -> httpx.AsyncClient:
+    """Create the pooled client used for every ML-service call."""
+    limits = httpx.Limits(
+        max_connections=ML_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=ML_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=ML_HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(
+        ML_HTTP_TIMEOUT,
+        connect=ML_HTTP_CONNECT_TIMEOUT,
+        pool=ML_HTTP_POOL_TIMEOUT
+    )
+    if ML_HTTP2:
+        try:
+            client = httpx.AsyncClient(limits=limits, timeout=timeout, http2=True)
+            logger.info("✅ ML HTTP client initialized with HTTP/2")
+            return client
+        except ImportError:
+            logger.warning("⚠️  HTTP/2 requested but 'h2' is not installed - falling back to HTTP/1.1")
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+def get_ml_client() -> httpx.AsyncClient:
+    """Return the shared ML-service client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+async def start_ml_client():
+    """Create the shared client at application startup."""
+    get_ml_client()
+
+async def close_ml_client():
+    """Close the shared client and release pooled connections at shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,376 @@
+# In-process background job queue for upload -> ML processing.
+# Job state is persisted through a pluggable JobStore so status survives restarts
+# and another backend (Redis, SQLite) can be swapped in without touching the queue.
+# Every attempt is claimed in the store before it runs, so with several worker
+# processes a job recovered by more than one of them still runs once.
+import os
+import json
+import time
+import asyncio
+import logging
+import random
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+from fastapi import HTTPException
+from . import db
+from .concurrency import run_blocking
+from .shared_state import get_tier
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job queue configuration
+JOB_WORKERS = max(int(os.getenv("JOB_WORKERS", "4")), 1)
+JOB_MAX_ATTEMPTS = max(int(os.getenv("JOB_MAX_ATTEMPTS", "3")), 1)
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "1.0"))
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "30.0"))
+JOB_STORE = os.getenv("JOB_STORE", "supabase")  # supabase | shared | memory
+# Jobs left running for longer than this are taken over at startup. With one worker any
+# running job is orphaned; with several, a younger one may belong to a live sibling.
+JOB_STALE_AFTER = float(os.getenv(
+    "JOB_STALE_AFTER",
+    "0" if int(os.getenv("WEB_CONCURRENCY", "1")) <= 1 else os.getenv("ML_PROCESS_DEADLINE", "120")
+))
+# Retention of job state kept in the shared state backend
+JOB_STATE_TTL = float(os.getenv("JOB_STATE_TTL", str(7 * 24 * 3600)))
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+COMPLETED = "completed"
+FAILED = "failed"
+PENDING_STATES = (QUEUED, RUNNING, RETRYING)
+
+JobHandler = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+# Called with (job_id, payload, error) once a job has failed for good
+FailureHandler = Callable[[str, Dict[str, Any], Exception], Awaitable[Any]]
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot succeed."""
+
+def is_retryable(error: Exception) -> bool:
+    """Transport errors, 429 and 5xx are worth retrying; other client errors are not."""
+    if isinstance(error, PermanentJobError):
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        code = error.response.status_code
+        return code == 429 or code >= 500
+    if isinstance(error, HTTPException):
+        return error.status_code == 429 or error.status_code >= 500
+    return True
+
+def _recoverable(job: Dict[str, Any]) -> bool:
+    if job.get("status") != RUNNING or JOB_STALE_AFTER <= 0:
+        return True
+    try:
+        updated = datetime.fromisoformat(job.get("updated_at") or job.get("created_at"))
+    except (TypeError, ValueError):
+        return True
+    return (datetime.now(timezone.utc) - updated).total_seconds() >= JOB_STALE_AFTER
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given (1-based) attempt."""
+    ceiling = min(JOB_RETRY_MAX_DELAY, JOB_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+class JobStore(ABC):
+    """Persistence interface for job state."""
+
+    @abstractmethod
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, fields: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def list_pending(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def claim(self, job_id: str, attempt: int) -> bool:
+        """Atomically mark the job running as `attempt`; False if that attempt is already taken."""
+
+class SupabaseJobStore(JobStore):
+    """Keeps job state in the forecast_jobs table."""
+
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        result = await db.execute(db.get_supabase().table("forecast_jobs").insert(job))
+        if not result.data:
+            raise HTTPException(status_code=500, detail="Failed to create job")
+        return result.data[0]
+
+    async def update(self, job_id: str, fields: Dict[str, Any]):
+        await db.execute(db.get_supabase().table("forecast_jobs").update(fields).eq("id", job_id))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await db.get_job(job_id)
+
+    async def list_pending(self) -> List[Dict[str, Any]]:
+        result = await db.execute(
+            db.get_supabase().table("forecast_jobs").select("*").in_("status", list(PENDING_STATES))
+        )
+        return result.data or []
+
+    async def claim(self, job_id: str, attempt: int) -> bool:
+        # Conditional update on the previous attempt count: only one worker's update matches
+        result = await db.execute(
+            db.get_supabase().table("forecast_jobs")
+            .update({"status": RUNNING, "attempts": attempt, "updated_at": _now()})
+            .eq("id", job_id).eq("attempts", attempt - 1).in_("status", list(PENDING_STATES))
+        )
+        return bool(result.data)
+
+class MemoryJobStore(JobStore):
+    """Process-local job state, for tests and single-process development."""
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        row = {"id": str(uuid.uuid4()), **job}
+        self.jobs[row["id"]] = row
+        return dict(row)
+
+    async def update(self, job_id: str, fields: Dict[str, Any]):
+        if job_id in self.jobs:
+            self.jobs[job_id].update(fields)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def list_pending(self) -> List[Dict[str, Any]]:
+        return [dict(job) for job in self.jobs.values() if job.get("status") in PENDING_STATES]
+
+    async def claim(self, job_id: str, attempt: int) -> bool:
+        job = self.jobs.get(job_id)
+        if not job or job.get("status") not in PENDING_STATES or (job.get("attempts") or 0) != attempt - 1:
+            return False
+        job.update({"status": RUNNING, "attempts": attempt, "updated_at": _now()})
+        return True
+
+class SharedJobStore(JobStore):
+    """Job state in the shared state backend (SQLite or Redis), visible to every worker.
+
+    After creation a job is only written by the worker holding its current claim, so
+    updates are a plain read-modify-write.
+    """
+
+    def __init__(self, jobs=None, claims=None):
+        self.jobs = jobs or get_tier("jobs")
+        self.claims = claims or get_tier("job_claims")
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        entry = self.jobs.get(job_id)
+        return json.loads(entry[0]) if entry else None
+
+    def _write(self, job: Dict[str, Any]):
+        self.jobs.set(job["id"], json.dumps(job, default=str).encode("utf-8"), time.time() + JOB_STATE_TTL)
+
+    def _update(self, job_id: str, fields: Dict[str, Any]):
+        job = self._read(job_id)
+        if job is not None:
+            job.update(fields)
+            self._write(job)
+
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        row = {"id": str(uuid.uuid4()), **job}
+        await run_blocking(self._write, row)
+        return row
+
+    async def update(self, job_id: str, fields: Dict[str, Any]):
+        await run_blocking(self._update, job_id, fields)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await run_blocking(self._read, job_id)
+
+    async def list_pending(self) -> List[Dict[str, Any]]:
+        jobs = await run_blocking(lambda: [json.loads(data) for _, data in self.jobs.items()])
+        return [job for job in jobs if job.get("status") in PENDING_STATES]
+
+    async def claim(self, job_id: str, attempt: int) -> bool:
+        claimed = await run_blocking(self.claims.add, f"{job_id}:{attempt}", b"1", time.time() + JOB_STATE_TTL)
+        if claimed:
+            await self.update(job_id, {"status": RUNNING, "attempts": attempt, "updated_at": _now()})
+        return claimed
+
+def create_job_store(kind: str = JOB_STORE) -> JobStore:
+    """Build the job store named by JOB_STORE."""
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "supabase":
+        return SupabaseJobStore()
+    if kind == "shared":
+        return SharedJobStore()
+    raise ValueError(f"Unknown job store: {kind}")
+
+class JobQueue:
+    """Bounded pool of asyncio workers that run registered job handlers with retries."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, JobHandler] = {}
+        self.failure_handlers: Dict[str, FailureHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register(self, kind: str, handler: JobHandler, on_failure: Optional[FailureHandler] = None):
+        """Register the coroutine that runs jobs of the given kind.
+
+        on_failure runs once a job has failed for good, so handlers can release what
+        their earlier attempts left behind (status rows, locks, partial state).
+        """
+        self.handlers[kind] = handler
+        if on_failure is not None:
+            self.failure_handlers[kind] = on_failure
+        else:
+            self.failure_handlers.pop(kind, None)
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def start(self, recover: bool = True):
+        """Start the workers and re-enqueue jobs left pending by a previous process."""
+        self._ensure_started()
+        if not recover:
+            return
+        try:
+            for job in await self.store.list_pending():
+                if _recoverable(job):
+                    self._queue.put_nowait((job["id"], job.get("attempts") or 0))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not recover pending jobs: {e}")
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs stay pending in the store."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    async def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        upload_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> str:
+        """Persist a new job and hand it to the workers. Returns the job id."""
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = await self.store.create({
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "config": {"kind": kind, "payload": payload},
+            "status": QUEUED,
+            "attempts": 0,
+            "created_at": _now()
+        })
+        self._ensure_started()
+        self._queue.put_nowait((job["id"], 0))
+        return job["id"]
+
+    async def _worker(self, index: int):
+        while True:
+            job_id, attempts = await self._queue.get()
+            try:
+                await self._run(job_id, attempts)
+            except Exception as e:
+                logger.error(f"❌ Job worker {index} failed on job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, attempts: int):
+        job = await self.store.get(job_id)
+        if not job or job.get("status") in (COMPLETED, FAILED):
+            return
+        config = job.get("config") or {}
+        handler = self.handlers.get(config.get("kind"))
+        if handler is None:
+            await self.store.update(job_id, {"status": FAILED, "error": f"Unknown job kind {config.get('kind')}"})
+            return
+
+        attempts += 1
+        if not await self.store.claim(job_id, attempts):
+            # Another worker process already took this attempt
+            return
+        try:
+            await handler(job_id, config.get("payload") or {})
+        except Exception as e:
+            if attempts < self.max_attempts and is_retryable(e):
+                delay = backoff_delay(attempts)
+                logger.warning(f"⚠️ Job {job_id} attempt {attempts} failed, retrying in {delay:.1f}s: {e}")
+                await self.store.update(job_id, {"status": RETRYING, "error": str(e), "updated_at": _now()})
+                asyncio.get_running_loop().call_later(delay, self._requeue, job_id, attempts)
+            else:
+                logger.error(f"❌ Job {job_id} failed after {attempts} attempt(s): {e}")
+                await self.store.update(job_id, {
+                    "status": FAILED,
+                    "error": str(e),
+                    "updated_at": _now(),
+                    "completed_at": _now()
+                })
+                await self._on_failure(job_id, config, e)
+            return
+        await self.store.update(job_id, {
+            "status": COMPLETED,
+            "error": None,
+            "updated_at": _now(),
+            "completed_at": _now()
+        })
+        logger.info(f"✅ Job {job_id} completed")
+
+    async def _on_failure(self, job_id: str, config: Dict[str, Any], error: Exception):
+        on_failure = self.failure_handlers.get(config.get("kind"))
+        if on_failure is None:
+            return
+        try:
+            await on_failure(job_id, config.get("payload") or {}, error)
+        except Exception as e:
+            logger.error(f"❌ Failure handler for job {job_id} raised: {e}")
+
+    def _requeue(self, job_id: str, attempts: int):
+        if self._queue is not None:
+            self._queue.put_nowait((job_id, attempts))
+
+    async def join(self):
+        """Wait until every queued job (including pending retries already requeued) is processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+_job_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> JobQueue:
+    """Return the application-wide job queue."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(create_job_store())
+    return _job_queue
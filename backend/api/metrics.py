@@ -0,0 +1,253 @@
+# Lightweight in-process metrics with Prometheus text exposition.
+# Counters, gauges and fixed-bucket histograms are plain Python objects guarded by a lock,
+# so recording a sample costs about a microsecond and is safe to leave on in production.
+# Spans time named stages of a request; with METRICS_SERVER_TIMING=true they are also
+# reported back to the caller in a Server-Timing header.
+import os
+import time
+import bisect
+import threading
+import contextvars
+import functools
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Cap on spans kept per request for Server-Timing
+MAX_REQUEST_SPANS = 32
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {repr(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+REGISTRY: List[_Metric] = []
+
+# HTTP layer
+http_requests_total = Counter("kivo_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_duration = Histogram("kivo_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = Gauge("kivo_http_requests_in_flight", "HTTP requests currently being served", ("method",))
+http_request_bytes = Counter("kivo_http_request_bytes_total", "Declared request body bytes", ("method", "route"))
+http_response_bytes = Counter("kivo_http_response_bytes_total", "Response body bytes sent", ("method", "route"))
+
+# Named stages (uploads, ML calls, Supabase helpers)
+span_duration = Histogram("kivo_span_duration_seconds", "Duration of named stages", ("span",))
+span_errors = Counter("kivo_span_errors_total", "Named stages that raised", ("span",))
+spans_in_flight = Gauge("kivo_spans_in_flight", "Named stages currently running", ("span",))
+upload_bytes = Counter("kivo_upload_bytes_total", "Raw upload bytes written to object storage")
+
+# Admission control (see admission.py)
+admission_in_flight = Gauge("kivo_admission_in_flight", "Admitted requests being served", ("endpoint",))
+admission_queue_depth = Gauge("kivo_admission_queue_depth", "Requests waiting for an admission slot", ("endpoint",))
+admission_wait = Histogram("kivo_admission_wait_seconds", "Time spent queued before admission", ("endpoint",))
+admission_rejections = Counter("kivo_admission_rejections_total", "Requests shed by admission control", ("endpoint", "reason"))
+
+_request_spans: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_spans", default=None)
+
+class span:
+    """Time a stage; works in sync and async code (`with span("s3.put"): ...`)."""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        spans_in_flight.inc(span=self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        spans_in_flight.dec(span=self.name)
+        span_duration.observe(elapsed, span=self.name)
+        if exc_type is not None:
+            span_errors.inc(span=self.name)
+        collected = _request_spans.get()
+        if collected is not None and len(collected) < MAX_REQUEST_SPANS:
+            collected.append((self.name, elapsed))
+        return False
+
+def timed(name: str):
+    """Decorator form of span() for coroutine functions."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    entries = [f"{name.replace('.', '-')};dur={elapsed * 1000:.1f}" for name, elapsed in spans]
+    entries.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+def render() -> str:
+    """All registered metrics in Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def _content_length(scope) -> int:
+    """The request's Content-Length; 0 when absent or malformed (the request fails on its own)."""
+    for name, value in scope.get("headers", []):
+        if name == b"content-length":
+            try:
+                return max(int(value), 0)
+            except ValueError:
+                return 0
+    return 0
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, in-flight requests and payload sizes.
+
+    Routes are labelled by their path template (e.g. /api/files/{file_id}) so label
+    cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app, server_timing_header: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.server_timing_header = server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start = time.perf_counter()
+        collected: list = []
+        token = _request_spans.set(collected)
+        state = {"status": 500, "route": None}
+        http_in_flight.inc(method=method)
+
+        def route_label() -> str:
+            if state["route"] is None:
+                route = scope.get("route")
+                state["route"] = getattr(route, "path", None) or "unmatched"
+            return state["route"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if self.server_timing_header:
+                    headers = list(message.get("headers", []))
+                    value = server_timing(collected, time.perf_counter() - start)
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                http_response_bytes.inc(len(message.get("body", b"")), method=method, route=route_label())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_spans.reset(token)
+            route = route_label()
+            http_in_flight.dec(method=method)
+            http_requests_total.inc(method=method, route=route, status=str(state["status"]))
+            http_request_duration.observe(time.perf_counter() - start, method=method, route=route)
+            http_request_bytes.inc(_content_length(scope), method=method, route=route)
@@ -0,0 +1,86 @@
+"""One-off migration of stored ML results into compressed blobs in object storage.
+
+forecast_results rows written before result blobs hold their series inline or in
+forecast_result_chunks rows, and file_upload_tracker.ml_result repeats the summary.
+For each such row this writes the full result to results/{job_id}.json.zst, replaces
+the row's results with the compact summary and pointer, deletes its chunk rows and
+shrinks the file's ml_result to a reference. Rows that already point at a blob are
+skipped, so the migration can be stopped and re-run.
+
+Usage (from backend/):
+    python -m api.migrate_results --dry-run
+    python -m api.migrate_results --batch 200 --limit 10000
+"""
+import argparse
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+async def migrate_row(row: Dict[str, Any], dry_run: bool = False) -> Optional[Dict[str, int]]:
+    """Move one forecast_results row's payload to a blob; None when there is nothing to do."""
+    from . import db, services
+    from .results import full_result, write_blob, compact_summary, result_reference
+    summary = row.get("results")
+    if not isinstance(summary, dict) or summary.get("storage"):
+        return None
+    job_id = row["job_id"]
+    full = await full_result(job_id, summary)
+    before = len(json.dumps(full, separators=(",", ":"), default=str))
+    if dry_run:
+        compact = compact_summary(full, {})
+    else:
+        compact = await write_blob(services.get_s3_client(), job_id, full)
+        await db.update_result(job_id, {"results": compact})
+        if (summary.get("series") or {}).get("chunks"):
+            await db.delete_result_chunks(job_id)
+        if row.get("file_id"):
+            await db.update_file(row["file_id"], {"ml_result": result_reference(job_id, compact)})
+    return {"bytes_before": before, "bytes_after": len(json.dumps(compact, separators=(",", ":"), default=str))}
+
+async def migrate(batch: int = 100, limit: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Walk forecast_results in id order and migrate every row still holding its payload."""
+    from . import db, services
+    services._check_supabase()
+    services._check_s3()
+    report = {"scanned": 0, "migrated": 0, "skipped": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+    after = None
+    while limit is None or report["scanned"] < limit:
+        rows = await db.list_results_page(after, batch if limit is None else min(batch, limit - report["scanned"]))
+        if not rows:
+            break
+        for row in rows:
+            report["scanned"] += 1
+            try:
+                moved = await migrate_row(row, dry_run)
+            except Exception as e:
+                logger.error(f"❌ Failed to migrate result of job {row.get('job_id')}: {e}")
+                report["failed"] += 1
+                continue
+            if moved is None:
+                report["skipped"] += 1
+            else:
+                report["migrated"] += 1
+                report["bytes_before"] += moved["bytes_before"]
+                report["bytes_after"] += moved["bytes_after"]
+        after = rows[-1]["id"]
+        logger.info(f"🔄 {report['scanned']} scanned, {report['migrated']} migrated, {report['failed']} failed")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=100, help="rows fetched per query")
+    parser.add_argument("--limit", type=int, help="stop after scanning this many rows")
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without writing")
+    args = parser.parse_args()
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    report = asyncio.run(migrate(args.batch, args.limit, args.dry_run))
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,39 @@
 # Pydantic models for response validation and test scaffolding
-from pydantic import BaseModel
-from typing import Optional, Any, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Dict, List
+
+# model_type values computed in-process by api.baseline instead of the ML service
+BASELINE_MODELS = ("seasonal_naive", "moving_average", "exp_smoothing")
+
+class ForecastOptions(BaseModel):
+    model_type: str
+    forecast_horizon: int
+    feature_groups: List[str]
+    target_col: str
+    date_col: str
+    menu_col: str
+
+class ForecastRequest(ForecastOptions):
+    data: List[Dict[str, Any]]
+
+class BatchForecastItem(ForecastRequest):
+    id: Optional[str] = None
+    location_id: Optional[str] = None
+
+class DirectUploadRequest(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+    content_type: Optional[str] = None
+    location_id: str
+    date_col: str
+    menu_col: str
+    target_col: str
+    # SHA-256 of the file, when the client computed it: lets duplicates skip the upload
+    content_hash: Optional[str] = None
+    force_reprocess: bool = False
+
+class BatchForecastRequest(BaseModel):
+    items: List[BatchForecastItem] = Field(..., min_items=1, max_items=200)
 
 class UploadedFile(BaseModel):
     id: str
@@ -12,6 +45,9 @@ class UploadedFile(BaseModel):
     status: str
     ml_result: Optional[Any] = None
 
+class FileDetailsRequest(BaseModel):
+    file_ids: List[str] = Field(..., min_items=1, max_items=200)
+
 class ForecastJob(BaseModel):
     id: str
     upload_id: str
@@ -20,6 +56,9 @@ class ForecastJob(BaseModel):
     status: str
     created_at: str
     completed_at: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    updated_at: Optional[str] = None
 
 class ForecastResult(BaseModel):
     id: str
@@ -29,4 +68,4 @@ class ForecastResult(BaseModel):
     model_info: Dict[str, Any]
     created_at: str
 
-__all__ = ["UploadedFile", "ForecastJob", "ForecastResult"]
+__all__ = ["BASELINE_MODELS", "ForecastOptions", "ForecastRequest", "BatchForecastItem", "BatchForecastRequest", "DirectUploadRequest", "UploadedFile", "FileDetailsRequest", "ForecastJob", "ForecastResult"]
@@ -0,0 +1,174 @@
+# Bounded-cost file preview and schema sniffing for /api/preview.
+# CSVs are sampled from the first PREVIEW_SAMPLE_BYTES only and .xlsx files are read with
+# openpyxl in read-only (streaming) mode, so cost does not grow with file size.
+import os
+import io
+import re
+import logging
+import zipfile
+from typing import Any, BinaryIO, Dict, List
+import pandas as pd
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PREVIEW_SAMPLE_BYTES = int(os.getenv("PREVIEW_SAMPLE_BYTES", str(64 * 1024)))
+PREVIEW_SAMPLE_ROWS = int(os.getenv("PREVIEW_SAMPLE_ROWS", "200"))
+# The sample is extended to the end of a header line up to this long
+PREVIEW_MAX_LINE_BYTES = int(os.getenv("PREVIEW_MAX_LINE_BYTES", str(1024 * 1024)))
+PREVIEW_ROWS = 3
+
+# Column-name hints used to rank mapping suggestions
+DATE_HINTS = ("date", "day", "time", "ds", "period")
+MENU_HINTS = ("menu", "item", "product", "sku", "name", "category")
+TARGET_HINTS = ("sales", "qty", "quantity", "units", "sold", "revenue", "amount", "count", "target")
+ID_HINTS = ("id", "code", "zip", "phone")
+
+class PreviewError(ValueError):
+    """The file cannot be previewed (empty, or not readable as the format it claims)."""
+
+def _file_size(file: BinaryIO) -> int:
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+def _sample_csv(file: BinaryIO, size: int):
+    """Parse the leading rows of a CSV and estimate its row count from byte offsets."""
+    sample = file.read(PREVIEW_SAMPLE_BYTES)
+    # A header wider than the window: keep reading to the end of the first line
+    while b"\n" not in sample and len(sample) < min(size, PREVIEW_MAX_LINE_BYTES):
+        more = file.read(PREVIEW_SAMPLE_BYTES)
+        if not more:
+            break
+        sample += more
+    complete = len(sample) >= size
+    if not complete:
+        if b"\n" not in sample:
+            raise PreviewError(f"The first line is longer than {PREVIEW_MAX_LINE_BYTES} bytes; is this a CSV file?")
+        # Drop the trailing partial line
+        sample = sample[:sample.rfind(b"\n") + 1]
+    try:
+        df = pd.read_csv(io.BytesIO(sample), nrows=PREVIEW_SAMPLE_ROWS)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise PreviewError(f"Could not read CSV: {e}")
+    if complete:
+        lines = sum(1 for line in sample.splitlines() if line.strip())
+        return df, max(lines - 1, len(df)), False
+
+    header_bytes = sample.find(b"\n") + 1
+    rows_bytes = len(sample) - header_bytes
+    lines = max(sample.count(b"\n") - 1, 1)
+    estimate = int(round((size - header_bytes) / (rows_bytes / lines))) if rows_bytes > 0 else len(df)
+    return df, max(estimate, len(df)), True
+
+def _unique_names(names: List[str]) -> List[str]:
+    """Column names made unique the way pandas does for CSVs: a repeated "x" becomes "x.1"."""
+    seen = set()
+    unique = []
+    for name in names:
+        candidate, suffix = name, 0
+        while candidate in seen:
+            suffix += 1
+            candidate = f"{name}.{suffix}"
+        seen.add(candidate)
+        unique.append(candidate)
+    return unique
+
+def _sample_xlsx(file: BinaryIO):
+    """Stream the first rows of the active sheet; the row count comes from the sheet dimensions."""
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise PreviewError(f"Could not read workbook: {e}")
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(max_row=PREVIEW_SAMPLE_ROWS + 1, values_only=True)
+        header = next(rows, None) or ()
+        columns = _unique_names([str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(header)])
+        df = pd.DataFrame([list(row)[:len(columns)] for row in rows], columns=columns)
+        max_row = sheet.max_row
+    finally:
+        workbook.close()
+    if max_row is None:
+        return df, len(df), True
+    return df, max(max_row - 1, len(df)), max_row - 1 > len(df)
+
+def _sample_xls(file: BinaryIO):
+    """Legacy .xls has no streaming reader; fall back to pandas limited to the sample rows."""
+    df = pd.read_excel(file, nrows=PREVIEW_SAMPLE_ROWS)
+    return df, len(df), len(df) >= PREVIEW_SAMPLE_ROWS
+
+def _column_type(series: pd.Series) -> str:
+    values = series.dropna()
+    if values.empty:
+        return "empty"
+    if pd.api.types.is_bool_dtype(values):
+        return "boolean"
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return "date"
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.notna().mean() >= 0.9:
+        return "integer" if (numeric.dropna() % 1 == 0).all() else "number"
+    dates = pd.to_datetime(values.astype(str), errors="coerce", format="mixed")
+    if dates.notna().mean() >= 0.9:
+        return "date"
+    return "string"
+
+def _hint_rank(name: str, hints) -> int:
+    lowered = name.lower()
+    for rank, hint in enumerate(hints):
+        if hint in lowered:
+            return rank
+    return len(hints)
+
+def suggest_columns(df: pd.DataFrame, types: Dict[str, str]) -> Dict[str, List[str]]:
+    """Rank candidate date, menu and target columns from the sampled rows."""
+    names = [str(col) for col in df.columns]
+    is_id = lambda name: any(token in ID_HINTS for token in re.split(r"[^a-z0-9]+", name.lower()))
+
+    date_cols = [name for name in names if types[name] == "date"]
+    target_cols = [name for name in names if types[name] in ("integer", "number") and not is_id(name)]
+
+    def menu_score(name):
+        values = df[name].dropna().astype(str)
+        cardinality = values.nunique() / len(values) if len(values) else 1.0
+        return (_hint_rank(name, MENU_HINTS), cardinality)
+
+    menu_cols = [name for name in names if types[name] == "string"]
+    return {
+        "date_col": sorted(date_cols, key=lambda name: _hint_rank(name, DATE_HINTS)),
+        "menu_col": sorted(menu_cols, key=menu_score),
+        "target_col": sorted(target_cols, key=lambda name: _hint_rank(name, TARGET_HINTS))
+    }
+
+def preview_file(file: BinaryIO, filename: str) -> Dict[str, Any]:
+    """Sample a CSV/Excel file and describe its columns. Blocking: run it off the event loop."""
+    lowered = filename.lower()
+    size = _file_size(file)
+    file.seek(0)
+    if lowered.endswith(".csv"):
+        df, total_rows, estimated = _sample_csv(file, size)
+    elif lowered.endswith(".xlsx"):
+        df, total_rows, estimated = _sample_xlsx(file)
+    elif lowered.endswith(".xls"):
+        df, total_rows, estimated = _sample_xls(file)
+    else:
+        raise ValueError("Unsupported file format")
+
+    df.columns = _unique_names([str(col) for col in df.columns])
+    types = {name: _column_type(df[name]) for name in df.columns}
+    head = df.head(PREVIEW_ROWS).astype(object)
+    preview = head.where(head.notna(), None).to_dict("records")
+    return {
+        "columns": list(df.columns),
+        "preview": preview,
+        "total_rows": total_rows,
+        "total_rows_estimated": estimated,
+        "file_size": size,
+        "column_types": types,
+        "suggestions": suggest_columns(df, types)
+    }
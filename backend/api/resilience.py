@@ -0,0 +1,228 @@
+# Failure handling for calls to remote services: deadlines derived from the inbound
+# request's budget, bounded retries with jitter for idempotent calls, optional hedged
+# requests, and per-service circuit breakers that fail fast while a service is down.
+import os
+import time
+import random
+import asyncio
+import logging
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Optional
+import httpx
+from fastapi import HTTPException
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+RETRY_MAX_ATTEMPTS = max(int(os.getenv("RETRY_MAX_ATTEMPTS", "3")), 1)
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2.0"))
+# Send a second copy of an idempotent call if the first has not answered after this many
+# seconds (roughly the service's p95); unset disables hedging
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY")) if os.getenv("HEDGE_DELAY") else None
+# Inbound header carrying the caller's remaining budget in milliseconds
+DEADLINE_HEADER = "x-request-timeout-ms"
+# Time kept back from the budget to build and send our own response
+DEADLINE_MARGIN = float(os.getenv("DEADLINE_MARGIN", "0.05"))
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Stops calling a failing service for a cool-down period after repeated failures.
+
+    After `failure_threshold` consecutive failures the breaker opens; once `reset_timeout`
+    has passed one trial call is let through (half-open) and its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = BREAKER_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go to the service right now."""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._trial_started = None
+        # One trial at a time; a trial that never reported back is replaced after reset_timeout
+        if self.state == HALF_OPEN and (self._trial_started is None or now - self._trial_started >= self.reset_timeout):
+            self._trial_started = now
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        """True while failing fast, without using up a half-open trial call."""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"✅ Circuit {self.name} closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_started = None
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"⚠️ Circuit {self.name} opened after {self.failures} failure(s)")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+        return {"name": self.name, "state": self.state, "consecutive_failures": self.failures, "retry_in_seconds": retry_in}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for a downstream service, created on first use."""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+# Deadlines
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+def set_deadline(budget_seconds: Optional[float]):
+    """Start a deadline budget for the current request (None clears it)."""
+    return _deadline.set(None if budget_seconds is None else time.monotonic() + budget_seconds)
+
+def remaining_time(default: float) -> float:
+    """Seconds left for a downstream call: the endpoint default capped by the inbound budget."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline - time.monotonic() - DEADLINE_MARGIN)
+
+class DeadlineMiddleware:
+    """ASGI middleware that turns an X-Request-Timeout-Ms header into the request's deadline."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = None
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER.encode():
+                try:
+                    budget = float(value) / 1000
+                except ValueError:
+                    pass
+                break
+        token = set_deadline(budget)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+# Resilient calls
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+def _to_http_exception(name: str, error: Exception) -> HTTPException:
+    if isinstance(error, httpx.HTTPStatusError):
+        return HTTPException(status_code=error.response.status_code, detail=str(error))
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return HTTPException(status_code=504, detail=f"{name} timed out")
+    return HTTPException(status_code=503, detail=f"{name} unavailable: {error}")
+
+async def _attempt(send: Callable[[float], Awaitable[httpx.Response]], timeout: float) -> httpx.Response:
+    response = await asyncio.wait_for(send(timeout), timeout)
+    response.raise_for_status()
+    return response
+
+async def _hedged(send, timeout: float, hedge_delay: float) -> httpx.Response:
+    """Run send, starting a second copy after hedge_delay; the first success wins."""
+    started = time.monotonic()
+    tasks = [asyncio.ensure_future(_attempt(send, timeout))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            hedge_timeout = timeout - (time.monotonic() - started)
+            if hedge_timeout > 0:
+                tasks.append(asyncio.ensure_future(_attempt(send, hedge_timeout)))
+        error = None
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                return await next_done
+            except Exception as e:
+                error = e
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def resilient_call(
+    name: str,
+    send: Callable[[float], Awaitable[httpx.Response]],
+    timeout: float,
+    idempotent: bool = False,
+    max_attempts: int = None,
+    hedge_delay: Optional[float] = None
+) -> httpx.Response:
+    """Call a downstream service through its breaker, within the request deadline.
+
+    send(timeout) performs one attempt. Idempotent calls are retried with full jitter on
+    transport errors, timeouts, 429 and 5xx, and may be hedged. Failures surface as
+    HTTPException: the service's own status, 504 on timeout, 503 when unreachable or
+    while the breaker is open.
+    """
+    breaker = get_breaker(name)
+    attempts = (max_attempts or RETRY_MAX_ATTEMPTS) if idempotent else 1
+    hedge_delay = (hedge_delay if hedge_delay is not None else HEDGE_DELAY) if idempotent else None
+    for attempt in range(1, attempts + 1):
+        budget = remaining_time(timeout)
+        if budget <= 0:
+            raise HTTPException(status_code=504, detail=f"Deadline exceeded before calling {name}")
+        if not breaker.allow():
+            retry_in = breaker.snapshot()["retry_in_seconds"] or 1
+            raise HTTPException(status_code=503, detail=f"{name} circuit open", headers={"Retry-After": str(max(int(retry_in), 1))})
+        try:
+            response = await (_hedged(send, budget, hedge_delay) if hedge_delay else _attempt(send, budget))
+        except Exception as e:
+            retryable = _is_retryable(e)
+            if retryable:
+                breaker.record_failure()
+            elif isinstance(e, httpx.HTTPStatusError):
+                # The service answered; a 4xx is the caller's problem, not an outage
+                breaker.record_success()
+            if not retryable or attempt == attempts:
+                raise _to_http_exception(name, e)
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+            if remaining_time(timeout) - delay <= 0:
+                raise _to_http_exception(name, e)
+            logger.warning(f"⚠️ {name} attempt {attempt} failed, retrying in {delay:.2f}s: {e}")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return response
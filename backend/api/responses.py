@@ -0,0 +1,22 @@
+# Conditional JSON responses: strong ETags over the serialized body and 304s for
+# clients that already hold the current representation.
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+def json_with_etag(
+    request: Request,
+    content: Any,
+    max_age: int = 0,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Serialize content once, tag it, and answer 304 if If-None-Match already matches."""
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    response_headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}", **(headers or {})}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=response_headers)
+    return Response(content=body, media_type="application/json", headers=response_headers)
@@ -0,0 +1,290 @@
+# Storage of ML results and row streaming for large results.
+# Each result is written once, to object storage, as a zstd-compressed columnar JSON blob
+# (results/{job_id}.json.zst); the forecast_results row keeps only a compact summary
+# (metrics, series shape) with a pointer and size. Full results are fetched lazily and
+# kept decompressed in a local LRU. With RESULT_STORE=supabase (or no S3) the series is
+# instead split into forecast_result_chunks rows of RESULT_CHUNK_ROWS rows each, stored
+# column-wise with the menu items they contain so menu filters can skip whole chunks.
+import os
+import gzip
+import json
+import zlib
+import logging
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from . import db
+from .cache import ResultCache
+from .concurrency import run_blocking
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+RESULT_CHUNK_ROWS = int(os.getenv("RESULT_CHUNK_ROWS", "5000"))
+# Keys under which the ML service returns the forecast series, in order of preference
+SERIES_KEYS = ("forecast_data", "forecast", "predictions")
+MENU_KEYS = ("menu", "menu_item", "item")
+
+RESULT_STORE = os.getenv("RESULT_STORE", "s3").lower()  # s3 | supabase
+RESULT_BLOB_PREFIX = os.getenv("RESULT_BLOB_PREFIX", "results/")
+RESULT_BLOB_ZSTD_LEVEL = int(os.getenv("RESULT_BLOB_ZSTD_LEVEL", "9"))
+# Result fields larger than this (as JSON) stay in the blob only, out of the summary
+RESULT_SUMMARY_FIELD_MAX_BYTES = int(os.getenv("RESULT_SUMMARY_FIELD_MAX_BYTES", "2048"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Decompressed blobs by object key; blobs never change, so only size limits this
+blob_cache = ResultCache("result_blobs", ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_BYTES)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def find_series(ml_result: Any) -> Optional[str]:
+    """Key of the row-record series in an ML result, if it has one."""
+    if not isinstance(ml_result, dict):
+        return None
+    for key in SERIES_KEYS:
+        value = ml_result.get(key)
+        if isinstance(value, list) and value and all(isinstance(row, dict) for row in value[:10]):
+            return key
+    return None
+
+def _menu_column(columns: Sequence[str]) -> Optional[str]:
+    return next((key for key in MENU_KEYS if key in columns), None)
+
+def split_result(ml_result: Dict[str, Any], chunk_rows: Optional[int] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Split an ML result into (summary without the series, columnar chunks)."""
+    chunk_rows = chunk_rows or RESULT_CHUNK_ROWS
+    key = find_series(ml_result)
+    if key is None:
+        return ml_result, []
+    rows = ml_result[key]
+    columns = list(dict.fromkeys(name for row in rows[:100] for name in row))
+    menu_col = _menu_column(columns)
+    chunks = []
+    for index, offset in enumerate(range(0, len(rows), chunk_rows)):
+        part = rows[offset:offset + chunk_rows]
+        chunks.append({
+            "chunk_index": index,
+            "row_offset": offset,
+            "row_count": len(part),
+            "menus": sorted({str(row.get(menu_col)) for row in part}) if menu_col else [],
+            "data": {name: [row.get(name) for row in part] for name in columns}
+        })
+    summary = {k: v for k, v in ml_result.items() if k != key}
+    summary["series"] = {"key": key, "row_count": len(rows), "columns": columns, "menu_column": menu_col, "chunks": len(chunks)}
+    return summary, chunks
+
+# Object-storage blobs
+def encode_blob(ml_result: Dict[str, Any]) -> Tuple[bytes, str, int]:
+    """An ML result as a compressed columnar document: (blob, codec, uncompressed size)."""
+    key = find_series(ml_result)
+    doc = {"format": 1, "result": {k: v for k, v in ml_result.items() if k != key}, "series": None}
+    if key:
+        rows = ml_result[key]
+        columns = list(dict.fromkeys(name for row in rows for name in row))
+        doc["series"] = {"key": key, "columns": {name: [row.get(name) for row in rows] for name in columns}}
+    raw = json.dumps(doc, separators=(",", ":"), default=str).encode("utf-8")
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=RESULT_BLOB_ZSTD_LEVEL).compress(raw), "zstd", len(raw)
+    return gzip.compress(raw, 6), "gzip", len(raw)
+
+def decode_blob(blob: bytes, codec: str) -> Dict[str, Any]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd result blobs requires the 'zstandard' package")
+        return json.loads(zstandard.ZstdDecompressor().decompress(blob))
+    return json.loads(gzip.decompress(blob))
+
+def compact_summary(ml_result: Dict[str, Any], storage: Dict[str, Any]) -> Dict[str, Any]:
+    """What the forecast_results row keeps: small fields, the series shape and the blob pointer."""
+    key = find_series(ml_result)
+    summary = {}
+    omitted = []
+    for name, value in ml_result.items():
+        if name == key:
+            continue
+        if isinstance(value, (dict, list)) and len(json.dumps(value, default=str)) > RESULT_SUMMARY_FIELD_MAX_BYTES:
+            omitted.append(name)
+        else:
+            summary[name] = value
+    if key:
+        rows = ml_result[key]
+        columns = list(dict.fromkeys(name for row in rows[:100] for name in row))
+        summary["series"] = {"key": key, "row_count": len(rows), "columns": columns, "menu_column": _menu_column(columns), "chunks": 0}
+    if omitted:
+        summary["omitted"] = omitted
+    summary["storage"] = storage
+    return summary
+
+def _put_blob(s3_client, bucket: str, job_id: str, ml_result: Dict[str, Any]) -> Dict[str, Any]:
+    blob, codec, raw_size = encode_blob(ml_result)
+    key = f"{RESULT_BLOB_PREFIX}{job_id}.json.{'zst' if codec == 'zstd' else 'gz'}"
+    s3_client.put_object(Bucket=bucket, Key=key, Body=blob, ContentType="application/json", ContentEncoding=codec)
+    return {"bucket": bucket, "key": key, "size": len(blob), "raw_size": raw_size, "codec": codec}
+
+async def write_blob(s3_client, job_id: str, ml_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Write a result blob to object storage; returns the compact summary pointing at it."""
+    from . import services
+    storage = await run_blocking(_put_blob, s3_client, services.S3_BUCKET, job_id, ml_result)
+    logger.info(f"✅ Stored result of job {job_id} as {storage['key']} ({storage['raw_size']} -> {storage['size']} bytes, {storage['codec']})")
+    return compact_summary(ml_result, storage)
+
+def _fetch_blob(storage: Dict[str, Any]) -> Dict[str, Any]:
+    from . import services
+    body = services.get_s3_client().get_object(Bucket=storage["bucket"], Key=storage["key"])["Body"]
+    return decode_blob(body.read(), storage["codec"])
+
+async def load_blob(storage: Dict[str, Any]) -> Dict[str, Any]:
+    """The decompressed columnar document behind a summary's storage pointer (LRU cached)."""
+    return await blob_cache.get_or_compute(storage["key"], lambda: run_blocking(_fetch_blob, storage))
+
+def result_reference(job_id: str, summary: Any) -> Dict[str, Any]:
+    """The small copy kept on the file_upload_tracker row; the result itself is in forecast_results."""
+    summary = summary if isinstance(summary, dict) else {}
+    return {"job_id": job_id, "metrics": summary.get("metrics"), "row_count": (summary.get("series") or {}).get("row_count")}
+
+async def store_result(job_id: str, file_id: Optional[str], ml_result: Any, fields: Dict[str, Any]) -> Any:
+    """Store a job's result once and insert its forecast_results row (summary only). Returns the summary.
+
+    The blob is written before the row, so a row never points at a missing blob.
+    """
+    if isinstance(ml_result, dict) and RESULT_STORE == "s3":
+        from . import services
+        s3_client = services.get_s3_client()
+        if s3_client is not None:
+            summary = await write_blob(s3_client, job_id, ml_result)
+            await db.insert_result({"file_id": file_id, "job_id": job_id, "results": summary, **fields})
+            return summary
+    summary, chunks = split_result(ml_result) if isinstance(ml_result, dict) else (ml_result, [])
+    if chunks:
+        await db.insert_result_chunks([{"job_id": job_id, **chunk} for chunk in chunks])
+    await db.insert_result({"file_id": file_id, "job_id": job_id, "results": summary, **fields})
+    return summary
+
+def _rows_from_columns(data: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+    names = list(data)
+    return (dict(zip(names, values)) for values in zip(*(data[name] for name in names)))
+
+async def _stored_chunks(job_id: str) -> AsyncIterator[Tuple[Dict[str, Any], Any]]:
+    """(chunk metadata, loader) pairs; data is only fetched when the loader is awaited."""
+    for meta in await db.list_result_chunks(job_id):
+        yield meta, (lambda index=meta["chunk_index"]: db.get_result_chunk_data(job_id, index))
+
+async def _blob_chunks(storage: Dict[str, Any]) -> AsyncIterator[Tuple[Dict[str, Any], Any]]:
+    """Chunks over the series in a result blob."""
+    series = (await load_blob(storage)).get("series") or {}
+    columns = series.get("columns") or {}
+    total = len(next(iter(columns.values()), []))
+    for offset in range(0, total, RESULT_CHUNK_ROWS):
+        part = {name: values[offset:offset + RESULT_CHUNK_ROWS] for name, values in columns.items()}
+
+        async def load(part=part):
+            return part
+        yield {"row_offset": offset, "row_count": min(RESULT_CHUNK_ROWS, total - offset), "menus": None}, load
+
+async def _inline_chunks(series: List[Dict[str, Any]]) -> AsyncIterator[Tuple[Dict[str, Any], Any]]:
+    """Chunks over a series still stored inline (results written before chunking existed)."""
+    for offset in range(0, len(series), RESULT_CHUNK_ROWS):
+        part = series[offset:offset + RESULT_CHUNK_ROWS]
+
+        async def load(part=part):
+            columns = list(dict.fromkeys(name for row in part for name in row))
+            return {name: [row.get(name) for row in part] for name in columns}
+        yield {"row_offset": offset, "row_count": len(part), "menus": None}, load
+
+async def iter_rows(
+    job_id: str,
+    summary: Dict[str, Any],
+    start: int = 0,
+    stop: Optional[int] = None,
+    menus: Optional[Iterable[str]] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield batches of series rows in [start, stop) whose menu is in menus (all if None)."""
+    wanted = set(menus) if menus else None
+    series = summary.get("series") or {}
+    menu_col = series.get("menu_column")
+    inline_key = find_series(summary)
+    if summary.get("storage"):
+        chunks = _blob_chunks(summary["storage"])
+    elif inline_key:
+        menu_col = _menu_column(list(summary[inline_key][0]))
+        chunks = _inline_chunks(summary[inline_key])
+    elif series.get("chunks"):
+        chunks = _stored_chunks(job_id)
+    else:
+        return
+
+    async for meta, load in chunks:
+        offset, count = meta["row_offset"], meta["row_count"]
+        if offset + count <= start:
+            continue
+        if stop is not None and offset >= stop:
+            break
+        if wanted is not None and meta.get("menus") is not None and not wanted.intersection(meta["menus"]):
+            continue
+        rows = []
+        for position, row in enumerate(_rows_from_columns(await load()), start=offset):
+            if position < start or (stop is not None and position >= stop):
+                continue
+            if wanted is not None and str(row.get(menu_col)) not in wanted:
+                continue
+            rows.append(row)
+        if rows:
+            yield rows
+
+async def full_result(job_id: str, summary: Any) -> Any:
+    """The complete ML result behind a stored summary, series included, wherever it lives."""
+    if not isinstance(summary, dict):
+        return summary
+    if summary.get("storage"):
+        doc = await load_blob(summary["storage"])
+        result = dict(doc["result"])
+        if doc.get("series"):
+            result[doc["series"]["key"]] = list(_rows_from_columns(doc["series"]["columns"]))
+        return result
+    series = summary.get("series") or {}
+    if series.get("chunks"):
+        result = {k: v for k, v in summary.items() if k != "series"}
+        result[series["key"]] = [row async for batch in iter_rows(job_id, summary) for row in batch]
+        return result
+    return summary
+
+def summary_without_series(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """The summary as sent ahead of streamed rows (inline legacy series removed)."""
+    key = find_series(summary)
+    return {k: v for k, v in summary.items() if k != key} if key else summary
+
+async def ndjson_rows(header: Dict[str, Any], batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """A header line, then one JSON row per line; each chunk is flushed as one piece."""
+    yield json.dumps(header, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+    async for rows in batches:
+        yield "".join(json.dumps(row, separators=(",", ":"), default=str) + "\n" for row in rows).encode("utf-8")
+
+# Response compression for streamed bodies
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick zstd (when installed) over gzip from an Accept-Encoding header."""
+    offered = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if "zstd" in offered and zstandard is not None:
+        return "zstd"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """Compress a byte stream incrementally, flushing after every piece so rows arrive early."""
+    if encoding is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        flush_block = lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        flush_block = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + flush_block()
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,11 +1,16 @@
 from dotenv import load_dotenv
 load_dotenv()
 import os
-from datetime import datetime
 import logging
+import threading
 from typing import Optional
-from fastapi import UploadFile, HTTPException
-import httpx
+from fastapi import HTTPException
+from .http_client import ML_SERVICE
+from .resilience import breaker_states, get_breaker
+from .admission import admission_states
+from . import db
+from .jobs import get_job_queue
+from .results import store_result, full_result
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,43 +28,71 @@ SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 # ML Service configuration
 ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8000")
 
-# Initialize optional dependencies
+# Optional clients, created on first use (or warmed in the background by the app lifespan)
+# so importing this module stays cheap. Clients assigned before first use are kept.
 supabase = None
 s3_client = None
+_clients_ready = False
+_clients_lock = threading.Lock()
 
-# Initialize Supabase client (optional)
-if SUPABASE_URL and SUPABASE_KEY:
+def _create_supabase():
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        logger.warning("⚠️  Supabase credentials not found - running without Supabase integration")
+        return None
     try:
-        from supabase import create_client, Client
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        from supabase import create_client
+        client = create_client(SUPABASE_URL, SUPABASE_KEY)
         logger.info("✅ Supabase client initialized successfully")
+        return client
     except Exception as e:
         logger.error(f"❌ Failed to initialize Supabase client: {e}")
-        supabase = None
-else:
-    logger.warning("⚠️  Supabase credentials not found - running without Supabase integration")
+        return None
 
-# Initialize S3 client (optional)
-if AWS_ACCESS_KEY and AWS_SECRET_KEY:
+def _create_s3():
+    if not (AWS_ACCESS_KEY and AWS_SECRET_KEY):
+        logger.warning("⚠️  AWS credentials not found - running without S3 integration")
+        return None
     try:
         import boto3
-        from botocore.exceptions import ClientError
-        s3_client = boto3.client(
+        client = boto3.client(
             's3',
             aws_access_key_id=AWS_ACCESS_KEY,
             aws_secret_access_key=AWS_SECRET_KEY,
             region_name=AWS_REGION
         )
         logger.info("✅ AWS S3 client initialized successfully")
+        return client
     except Exception as e:
         logger.error(f"❌ Failed to initialize S3 client: {e}")
-        s3_client = None
-else:
-    logger.warning("⚠️  AWS credentials not found - running without S3 integration")
+        return None
+
+def init_clients():
+    """Create the Supabase and S3 clients once. Safe to call from any thread."""
+    global supabase, s3_client, _clients_ready
+    if _clients_ready:
+        return
+    with _clients_lock:
+        if _clients_ready:
+            return
+        if supabase is None:
+            supabase = _create_supabase()
+        if s3_client is None:
+            s3_client = _create_s3()
+        _clients_ready = True
+
+def get_supabase_client():
+    """The Supabase client (None when not configured)."""
+    init_clients()
+    return supabase
+
+def get_s3_client():
+    """The S3 client (None when not configured)."""
+    init_clients()
+    return s3_client
 
 def _check_supabase():
     """Check if Supabase is available and raise error if not."""
-    if not supabase:
+    if not get_supabase_client():
         raise HTTPException(
             status_code=503, 
             detail="Database service unavailable - Supabase not configured"
@@ -67,129 +100,88 @@ def _check_supabase():
 
 def _check_s3():
     """Check if S3 is available and raise error if not."""
-    if not s3_client:
+    if not get_s3_client():
         raise HTTPException(
             status_code=503, 
             detail="File storage service unavailable - S3 not configured"
         )
 
-async def handle_file_upload(file: UploadFile):
-    """Handle file upload to S3 and metadata storage in Supabase."""
-    _check_s3()
-    _check_supabase()
-    
-    try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        contents = await file.read()
-        
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET,
-            Key=f"uploads/{filename}",
-            Body=contents
-        )
-        s3_url = f"s3://{S3_BUCKET}/uploads/{filename}"
-        
-        # Store metadata in Supabase
-        file_metadata = {
-            "filename": filename,
-            "s3_path": s3_url,
-            "upload_time": timestamp,
-            "file_size": len(contents),
-            "file_type": file.content_type,
-            "status": "uploaded"
-        }
-        result = supabase.table("file_upload_tracker").insert(file_metadata).execute()
-        
-        if not result.data:
-            raise HTTPException(status_code=500, detail="Failed to store file metadata")
-            
-        return filename, s3_url, timestamp, result.data[0]["id"], contents
-        
-    except Exception as e:
-        if "ClientError" in str(type(e)):
-            logger.error(f"AWS S3 error: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to upload file to S3")
-        else:
-            logger.error(f"Error uploading file: {str(e)}")
-            raise HTTPException(status_code=500, detail="Internal server error")
-
-async def call_ml_service(s3_url, filename, timestamp, file_id):
-    """Call the external ML service with file info and update Supabase status."""
-    try:
-        async with httpx.AsyncClient() as client:
-            ml_response = await client.post(
-                f"{ML_SERVICE_URL}/process-file",
-                json={
-                    "file_path": s3_url,
-                    "filename": filename,
-                    "upload_time": timestamp,
-                    "file_id": file_id
-                }
-            )
-            
-            if ml_response.status_code != 200:
-                if supabase:
-                    supabase.table("file_upload_tracker").update({
-                        "status": "processing_failed"
-                    }).eq("id", file_id).execute()
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to process file with ML service"
-                )
-            
-            ml_result = ml_response.json()
-            
-            # Update status in Supabase if available
-            if supabase:
-                supabase.table("file_upload_tracker").update({
-                    "status": "processed",
-                    "ml_result": ml_result
-                }).eq("id", file_id).execute()
-            
-            return ml_result
-            
-    except httpx.HTTPError as e:
-        logger.error(f"ML service error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to communicate with ML service")
-    except Exception as e:
-        logger.error(f"Error calling ML service: {str(e)}")
-        raise HTTPException(status_code=500, detail="Internal server error")
-
-def list_uploaded_files():
-    """List all uploaded files from Supabase."""
+async def list_uploaded_files(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    location_id: Optional[str] = None,
+    status: Optional[str] = None,
+    include_results: bool = False
+):
+    """List one page of uploaded files from Supabase, newest first."""
     _check_supabase()
     
     try:
-        result = supabase.table("file_upload_tracker").select("*").order("upload_time", desc=True).execute()
-        return result.data
+        return await db.list_files(limit, cursor, location_id, status, include_results)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing files: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to list files")
 
-def get_job_status(job_id: str):
-    """Retrieve the status of a forecast job by job_id from Supabase."""
-    _check_supabase()
-    
+async def store_job_result(job_id: str, file_id, ml_result, timestamp):
+    """Record a finished job's ML output in forecast_results, keyed by our job id.
+
+    The full output goes to object storage once (see results.store_result); the returned
+    summary is what the forecast_results row holds.
+    """
+    return await store_result(job_id, file_id, ml_result, {
+        "processing_time": timestamp,
+        "status": "completed"
+    })
+
+async def get_job_status(job_id: str):
+    """Retrieve the status and progress of a forecast job by job_id."""
     try:
-        result = supabase.table("forecast_jobs").select("status").eq("id", job_id).single().execute()
-        if not result.data:
+        job = await get_job_queue().store.get(job_id)
+        if not job:
             raise HTTPException(status_code=404, detail="Job not found")
-        return {"job_id": job_id, "status": result.data["status"]}
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "attempts": job.get("attempts"),
+            "error": job.get("error"),
+            "created_at": job.get("created_at"),
+            "updated_at": job.get("updated_at"),
+            "completed_at": job.get("completed_at")
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting job status for {job_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get job status")
 
-def get_results(job_id: str):
-    """Retrieve the results of a forecast job by job_id from Supabase."""
+async def get_results(job_id: str, full: bool = False):
+    """Retrieve the results of a forecast job by job_id from Supabase.
+
+    The row holds the stored summary; full=True fetches the complete ML output from
+    object storage. While the job is still queued or running, returns its status with
+    results set to None.
+    """
     _check_supabase()
     
     try:
-        result = supabase.table("forecast_results").select("*").eq("job_id", job_id).single().execute()
-        if not result.data:
+        try:
+            result = await db.get_result_by_job(job_id)
+        except Exception:
+            result = None  # .single() raises when no row exists yet
+        if result:
+            if full:
+                result = {**result, "results": await full_result(job_id, result.get("results"))}
+            return {"job_id": job_id, "status": "completed", "results": result}
+        job = await get_job_queue().store.get(job_id)
+        if not job:
             raise HTTPException(status_code=404, detail="Results not found")
-        return {"job_id": job_id, "results": result.data}
+        if job["status"] == "failed":
+            raise HTTPException(status_code=502, detail=f"Job failed: {job.get('error')}")
+        return {"job_id": job_id, "status": job["status"], "results": None}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting results for {job_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get results")
@@ -197,8 +189,12 @@ def get_results(job_id: str):
 # Health check functions
 def get_service_status():
     """Get the status of all external services."""
+    # Register the ML breaker so it is reported before the first call
+    get_breaker(ML_SERVICE)
     return {
-        "supabase": "available" if supabase else "unavailable",
-        "s3": "available" if s3_client else "unavailable",
-        "ml_service_url": ML_SERVICE_URL
+        "supabase": "available" if get_supabase_client() else "unavailable",
+        "s3": "available" if get_s3_client() else "unavailable",
+        "ml_service_url": ML_SERVICE_URL,
+        "circuit_breakers": breaker_states(),
+        "admission": admission_states()
     }
\ No newline at end of file
@@ -0,0 +1,205 @@
+# State shared by every worker process of a multi-worker deployment.
+# A tier is a namespaced key -> bytes store with per-entry expiry, backed by process
+# memory (single worker), a local SQLite file in WAL mode (several workers on one host)
+# or a Redis-compatible server (several hosts). Tier methods are blocking, like
+# cache.DiskTier, and are called through run_blocking.
+import os
+import time
+import sqlite3
+import threading
+import logging
+from typing import Dict, Iterator, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SHARED_STATE = os.getenv("SHARED_STATE", "memory").lower()  # memory | sqlite | redis
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "/tmp/kivo-shared-state.sqlite3")
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "redis://localhost:6379/0")
+# How long a worker may serve a shared cache entry from its own memory before re-reading it
+SHARED_STATE_LOCAL_TTL = float(os.getenv("SHARED_STATE_LOCAL_TTL", "1"))
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+def is_shared() -> bool:
+    """True when state is kept outside the process (safe with several workers)."""
+    return SHARED_STATE != "memory"
+
+class MemoryTier:
+    """Process-local tier; the default for a single worker."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._entries: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key: str, data: bytes, expires_at: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (data, expires_at)
+
+    def add(self, key: str, data: bytes, expires_at: Optional[float] = None) -> bool:
+        """Store only if key is absent (or expired); True if this call stored it."""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._entries[key] = (data, expires_at)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        with self._lock:
+            keys = list(self._entries)
+            entries = [(key, self._live(key)) for key in keys]
+        return ((key, entry[0]) for key, entry in entries if entry is not None)
+
+class SQLiteTier:
+    """Tier in a SQLite file in WAL mode, shared by the worker processes on one host."""
+
+    def __init__(self, namespace: str, path: str = SHARED_STATE_PATH):
+        self.namespace = namespace
+        self.path = path
+        # sqlite3 connections belong to the thread that opened them
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM shared_state WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (self.namespace, key, time.time())
+        ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, key: str, data: bytes, expires_at: Optional[float] = None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, data, expires_at)
+        )
+
+    def add(self, key: str, data: bytes, expires_at: Optional[float] = None) -> bool:
+        """Store only if key is absent (or expired); True if this call stored it."""
+        cursor = self._conn().execute(
+            "INSERT INTO shared_state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE shared_state.expires_at IS NOT NULL AND shared_state.expires_at <= ?",
+            (self.namespace, key, data, expires_at, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM shared_state WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM shared_state WHERE namespace = ?", (self.namespace,))
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM shared_state WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, time.time())
+        )
+        rows = conn.execute("SELECT key, value FROM shared_state WHERE namespace = ?", (self.namespace,)).fetchall()
+        return ((key, bytes(value)) for key, value in rows)
+
+class RedisTier:
+    """Tier on a Redis-compatible server; `client` may be any object with the redis-py API."""
+
+    def __init__(self, namespace: str, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SHARED_STATE=redis requires the 'redis' package")
+            client = redis.Redis.from_url(SHARED_STATE_URL)
+        self.namespace = namespace
+        self.client = client
+        self.prefix = f"kivo:{namespace}:"
+
+    @staticmethod
+    def _px(expires_at: Optional[float]) -> Optional[int]:
+        return None if expires_at is None else max(int((expires_at - time.time()) * 1000), 1)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        data = self.client.get(self.prefix + key)
+        if data is None:
+            return None
+        ttl_ms = self.client.pttl(self.prefix + key)
+        return data, (time.time() + ttl_ms / 1000 if ttl_ms and ttl_ms > 0 else None)
+
+    def set(self, key: str, data: bytes, expires_at: Optional[float] = None):
+        if expires_at is not None and expires_at <= time.time():
+            self.client.delete(self.prefix + key)
+            return
+        self.client.set(self.prefix + key, data, px=self._px(expires_at))
+
+    def add(self, key: str, data: bytes, expires_at: Optional[float] = None) -> bool:
+        """Store only if key is absent (or expired); True if this call stored it."""
+        return bool(self.client.set(self.prefix + key, data, px=self._px(expires_at), nx=True))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        for full_key in self.client.scan_iter(match=self.prefix + "*"):
+            data = self.client.get(full_key)
+            if data is not None:
+                name = full_key.decode() if isinstance(full_key, bytes) else full_key
+                yield name[len(self.prefix):], data
+
+_tiers: Dict[str, object] = {}
+_tiers_lock = threading.Lock()
+
+def get_tier(namespace: str):
+    """The tier for a namespace on the configured SHARED_STATE backend, created on first use."""
+    with _tiers_lock:
+        if namespace not in _tiers:
+            if SHARED_STATE == "sqlite":
+                _tiers[namespace] = SQLiteTier(namespace)
+            elif SHARED_STATE == "redis":
+                _tiers[namespace] = RedisTier(namespace)
+            elif SHARED_STATE == "memory":
+                _tiers[namespace] = MemoryTier(namespace)
+            else:
+                raise ValueError(f"Unknown shared state backend: {SHARED_STATE}")
+        return _tiers[namespace]
+
+def shared_tier(namespace: str):
+    """The tier for a namespace when state is shared between workers, else None."""
+    return get_tier(namespace) if is_shared() else None
@@ -0,0 +1,211 @@
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from fastapi import UploadFile
+from .concurrency import run_blocking
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Streaming upload configuration (S3 requires every part but the last to be >= 5 MiB)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PARTS = 10_000
+S3_UPLOAD_CHUNK_SIZE = max(int(os.getenv("S3_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))), S3_MIN_PART_SIZE)
+S3_UPLOAD_MAX_CONCURRENCY = max(int(os.getenv("S3_UPLOAD_MAX_CONCURRENCY", "4")), 1)
+
+@dataclass
+class StoredObject:
+    """Location, size and checksum of an object written to S3."""
+    bucket: str
+    key: str
+    size: int
+    sha256: str
+
+    @property
+    def url(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+def sha256_file(file, chunk_size: int = 1024 * 1024) -> str:
+    """Streaming SHA-256 of a local file object, leaving it rewound. Blocking."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+async def _read_chunk(file: UploadFile, chunk_size: int) -> bytes:
+    """Read exactly chunk_size bytes unless the file ends first."""
+    buffer = bytearray()
+    while len(buffer) < chunk_size:
+        data = await file.read(chunk_size - len(buffer))
+        if not data:
+            break
+        buffer += data
+    return bytes(buffer)
+
+async def stream_upload(
+    s3_client,
+    file: UploadFile,
+    bucket: str,
+    key: str,
+    chunk_size: int = S3_UPLOAD_CHUNK_SIZE,
+    max_concurrency: int = S3_UPLOAD_MAX_CONCURRENCY
+) -> StoredObject:
+    """Stream an UploadFile to S3 in fixed-size chunks.
+
+    Files smaller than one chunk are sent with a single put_object; larger
+    files use a multipart upload with at most max_concurrency parts in flight,
+    so peak memory stays at roughly (max_concurrency + 1) * chunk_size.
+    """
+    digest = hashlib.sha256()
+    size = 0
+
+    first = await _read_chunk(file, chunk_size)
+    digest.update(first)
+    size += len(first)
+    if len(first) < chunk_size:
+        await run_blocking(s3_client.put_object, Bucket=bucket, Key=key, Body=first)
+        return StoredObject(bucket=bucket, key=key, size=size, sha256=digest.hexdigest())
+
+    upload = await run_blocking(s3_client.create_multipart_upload, Bucket=bucket, Key=key)
+    upload_id = upload["UploadId"]
+    slots = asyncio.Semaphore(max_concurrency)
+    parts = []
+    tasks = []
+
+    async def upload_part(part_number: int, body: bytes):
+        try:
+            response = await run_blocking(
+                s3_client.upload_part,
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+        finally:
+            slots.release()
+
+    try:
+        part_number = 1
+        chunk = first
+        while chunk:
+            await slots.acquire()
+            task = asyncio.create_task(upload_part(part_number, chunk))
+            tasks.append(task)
+            # Surface a failed part before reading any further
+            for done in [t for t in tasks if t.done()]:
+                done.result()
+            chunk = await _read_chunk(file, chunk_size)
+            digest.update(chunk)
+            size += len(chunk)
+            part_number += 1
+        await asyncio.gather(*tasks)
+
+        parts.sort(key=lambda part: part["PartNumber"])
+        await run_blocking(
+            s3_client.complete_multipart_upload,
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts}
+        )
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await run_blocking(s3_client.abort_multipart_upload, Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to abort multipart upload {upload_id}: {e}")
+        raise
+
+    logger.info(f"✅ Streamed {size} bytes to s3://{bucket}/{key} in {len(parts)} parts")
+    return StoredObject(bucket=bucket, key=key, size=size, sha256=digest.hexdigest())
+
+# Direct-to-S3 uploads: the browser PUTs the parts to presigned URLs; these run on worker threads
+def direct_part_size(size: int, preferred: int) -> int:
+    """Part size for an object of `size` bytes: at least the S3 minimum, at most 10,000 parts."""
+    return max(preferred, S3_MIN_PART_SIZE, -(-size // S3_MAX_PARTS))
+
+def presign_parts(s3_client, bucket: str, key: str, upload_id: str, part_numbers, expires_in: int):
+    """Presigned PUT URLs for the given part numbers of a multipart upload. Blocking."""
+    return [
+        {
+            "part_number": number,
+            "url": s3_client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": number},
+                ExpiresIn=expires_in
+            )
+        }
+        for number in part_numbers
+    ]
+
+def list_uploaded_parts(s3_client, bucket: str, key: str, upload_id: str):
+    """Parts S3 already holds for a multipart upload, in order. Blocking."""
+    parts = []
+    marker = 0
+    while True:
+        response = s3_client.list_parts(Bucket=bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+        parts.extend({"PartNumber": p["PartNumber"], "ETag": p["ETag"], "Size": p["Size"]} for p in response.get("Parts", []))
+        if not response.get("IsTruncated"):
+            return parts
+        marker = response["NextPartNumberMarker"]
+
+def complete_direct_upload(s3_client, bucket: str, key: str, upload_id: str, expected_parts: int) -> StoredObject:
+    """Finish a browser multipart upload from the parts S3 holds. Blocking.
+
+    Raises ValueError when parts are missing. The checksum is left empty: the bytes
+    never passed through the backend.
+    """
+    parts = list_uploaded_parts(s3_client, bucket, key, upload_id)
+    missing = sorted(set(range(1, expected_parts + 1)) - {part["PartNumber"] for part in parts})
+    if missing:
+        raise ValueError(f"Missing parts: {missing[:20]}")
+    s3_client.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in parts]}
+    )
+    return StoredObject(bucket=bucket, key=key, size=sum(part["Size"] for part in parts), sha256="")
+
+def download_object(s3_client, bucket: str, key: str, spool_bytes: int = 16 * 1024 * 1024):
+    """Copy an object into a rewound temporary file; returns (file, sha256). Blocking."""
+    target = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    digest = hashlib.sha256()
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    for chunk in iter(lambda: body.read(1024 * 1024), b""):
+        digest.update(chunk)
+        target.write(chunk)
+    target.seek(0)
+    return target, digest.hexdigest()
+
+def part_writer(s3_client, bucket: str, prefix: str):
+    """Return a callable that stores numbered Parquet parts under prefix and returns their keys.
+
+    Called from worker threads, so it uses the client synchronously.
+    """
+    def write(index: int, body: bytes) -> str:
+        key = f"{prefix}part-{index:05d}.parquet"
+        s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+        return key
+    return write
+
+def delete_keys(s3_client, bucket: str, keys):
+    """Best-effort removal of objects written by a failed upload."""
+    keys = list(keys)
+    for start in range(0, len(keys), 1000):
+        try:
+            s3_client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]]}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to delete {len(keys)} objects from {bucket}: {e}")
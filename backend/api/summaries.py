@@ -0,0 +1,124 @@
+# Precomputed per-location dashboard summaries: forecast totals per menu item, the latest
+# run's status and the accuracy metrics of the latest completed run. Updated as each upload
+# job finishes, so the overview page reads one small row instead of listing every file
+# and result. Locations without a row yet are built once from their latest completed upload.
+#
+# Stored in the location_summaries table: location_id (unique), latest_job_id,
+# latest_file_id, latest_status, latest_run_at, error, job_id (of the completed run the
+# totals come from), model_type, metrics, menu_totals, forecast_total, forecast_start,
+# forecast_end, row_count, updated_at.
+import os
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from . import db
+from .cache import ResultCache
+from .concurrency import run_blocking
+from .results import MENU_KEYS, find_series, full_result
+from .shared_state import shared_tier
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LOCATION_SUMMARY_CACHE_TTL = float(os.getenv("LOCATION_SUMMARY_CACHE_TTL", "30"))
+# Menu items kept in a summary, largest forecast totals first
+SUMMARY_MAX_MENUS = int(os.getenv("SUMMARY_MAX_MENUS", "500"))
+# Series columns holding the forecast value, in order of preference
+VALUE_KEYS = ("predicted", "forecast", "prediction", "yhat", "value")
+
+summary_cache = ResultCache(
+    "location_summary", ttl=LOCATION_SUMMARY_CACHE_TTL, max_bytes=8 * 1024 * 1024, shared=shared_tier("location_summary")
+)
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def summarize_result(ml_result: Any) -> Dict[str, Any]:
+    """Totals per menu item, forecast date range and metrics of one ML result. Blocking."""
+    ml_result = ml_result if isinstance(ml_result, dict) else {}
+    key = find_series(ml_result)
+    rows = ml_result[key] if key else []
+    columns = list(dict.fromkeys(name for row in rows[:100] for name in row))
+    menu_col = next((name for name in MENU_KEYS if name in columns), None)
+    value_col = next((name for name in VALUE_KEYS if name in columns), None)
+    totals: Dict[str, float] = defaultdict(float)
+    dates = set()
+    for row in rows:
+        if value_col is not None:
+            try:
+                totals[str(row.get(menu_col))] += float(row.get(value_col) or 0)
+            except (TypeError, ValueError):
+                pass
+        if row.get("date") is not None:
+            dates.add(str(row["date"]))
+    top = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:SUMMARY_MAX_MENUS]
+    return {
+        "model_type": ml_result.get("model_type"),
+        "metrics": ml_result.get("metrics") or {},
+        "menu_totals": {menu: round(total, 3) for menu, total in top},
+        "forecast_total": round(sum(totals.values()), 3),
+        "forecast_start": min(dates) if dates else None,
+        "forecast_end": max(dates) if dates else None,
+        "row_count": len(rows)
+    }
+
+async def record_run(
+    location_id: str,
+    job_id: str,
+    file_id: Optional[str],
+    status: str,
+    ml_result: Any = None,
+    error: Optional[str] = None
+):
+    """Fold a finished upload job into its location's summary.
+
+    Failed runs update the latest status and keep the totals of the last completed run;
+    when the location has no summary yet, it is built first so those totals exist.
+    """
+    if status != "completed" and await db.get_location_summary(location_id) is None:
+        await rebuild_summary(location_id)
+    run_at = _now()
+    fields = {
+        "latest_job_id": job_id,
+        "latest_file_id": file_id,
+        "latest_status": status,
+        "latest_run_at": run_at,
+        "error": error,
+        "updated_at": run_at
+    }
+    if status == "completed":
+        fields.update({"job_id": job_id, **await run_blocking(summarize_result, ml_result)})
+    # An upsert, so concurrent jobs of one location cannot both insert
+    await db.upsert_location_summary(location_id, fields)
+    await summary_cache.invalidate(str(location_id))
+    logger.info(f"✅ Summary of location {location_id} updated: job {job_id} {status}")
+
+async def rebuild_summary(location_id: str) -> Optional[Dict[str, Any]]:
+    """Build a missing summary from the location's latest completed upload, once."""
+    found = await db.latest_completed_file(location_id)
+    if not found or not found[1]:
+        return None
+    file_data, results = found
+    latest = max(results, key=lambda row: row.get("processing_time") or "")
+    ml_result = await full_result(latest.get("job_id"), latest.get("results"))
+    fields = {
+        "latest_job_id": latest.get("job_id"),
+        "latest_file_id": file_data.get("id"),
+        "latest_status": "completed",
+        "latest_run_at": latest.get("processing_time") or file_data.get("upload_time"),
+        "error": None,
+        "job_id": latest.get("job_id"),
+        "updated_at": _now(),
+        **await run_blocking(summarize_result, ml_result)
+    }
+    await db.upsert_location_summary(location_id, fields)
+    logger.info(f"🔄 Built summary of location {location_id} from file {file_data.get('id')}")
+    return {"location_id": location_id, **fields}
+
+async def _load_summary(location_id: str) -> Optional[Dict[str, Any]]:
+    return await db.get_location_summary(location_id) or await rebuild_summary(location_id)
+
+async def get_summary(location_id: str) -> Optional[Dict[str, Any]]:
+    """The location's dashboard summary via the TTL cache; None when it has no runs yet."""
+    return await summary_cache.get_or_compute(str(location_id), lambda: _load_summary(location_id))
@@ -0,0 +1,208 @@
+# Streaming validation and normalization of uploads before they reach the ML service.
+# The file is read in chunks (pandas for CSV, openpyxl read-only for xlsx); each chunk has its
+# mapped columns checked and typed and is written out as one Parquet part, so memory is bounded
+# by the chunk size rather than the file size.
+import os
+import io
+import logging
+import warnings
+import zipfile
+from dataclasses import dataclass, field, asdict
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+import pandas as pd
+
+try:
+    from openpyxl.utils.exceptions import InvalidFileException
+except ImportError:  # openpyxl is only needed for .xlsx uploads
+    InvalidFileException = zipfile.BadZipFile
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+VALIDATION_CHUNK_ROWS = int(os.getenv("VALIDATION_CHUNK_ROWS", "50000"))
+# Reject the whole file when more than this fraction of rows is unusable
+VALIDATION_MAX_BAD_RATIO = float(os.getenv("VALIDATION_MAX_BAD_RATIO", "0.5"))
+MAX_SAMPLE_ERRORS = 10
+
+class FileValidationError(Exception):
+    """The upload cannot be used for forecasting (missing columns, mostly bad rows, unreadable)."""
+
+    def __init__(self, message: str, report: Optional["ValidationReport"] = None):
+        super().__init__(message)
+        self.report = report
+
+@dataclass
+class ValidationReport:
+    total_rows: int = 0
+    valid_rows: int = 0
+    dropped_rows: int = 0
+    # Valid rows on dates the `covered` ranges already hold for their menu item, and rows kept
+    existing_rows: int = 0
+    new_rows: int = 0
+    issues: Dict[str, int] = field(default_factory=dict)
+    sample_errors: List[Dict[str, Any]] = field(default_factory=list)
+    min_date: Optional[str] = None
+    max_date: Optional[str] = None
+    # First and last date of the kept rows, per menu item
+    menu_ranges: Dict[str, List[str]] = field(default_factory=dict)
+    parts: List[str] = field(default_factory=list)
+
+    def dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def iter_chunks(file: BinaryIO, filename: str, chunk_rows: int = VALIDATION_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield the file as DataFrames of at most chunk_rows rows, every cell read as text."""
+    lowered = filename.lower()
+    if lowered.endswith(".csv"):
+        yield from pd.read_csv(file, dtype=str, chunksize=chunk_rows, keep_default_na=False, na_values=[""])
+    elif lowered.endswith(".xlsx"):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(next(rows, None) or ())]
+            batch = []
+            for row in rows:
+                batch.append([None if value is None else str(value) for value in row[:len(header)]])
+                if len(batch) >= chunk_rows:
+                    yield pd.DataFrame(batch, columns=header)
+                    batch = []
+            if batch or not header:
+                yield pd.DataFrame(batch, columns=header)
+        finally:
+            workbook.close()
+    elif lowered.endswith(".xls"):
+        # Legacy .xls has no streaming reader
+        df = pd.read_excel(file, dtype=str)
+        for start in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        raise FileValidationError("Unsupported file format")
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    with warnings.catch_warnings():
+        # Format inference falls back to dateutil when the first value is bad; that is expected here
+        warnings.simplefilter("ignore", UserWarning)
+        parsed = pd.to_datetime(values, errors="coerce")
+    if parsed.isna().mean() > 0.1:
+        # Exports sometimes mix formats; fall back to per-value parsing
+        parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+    return parsed
+
+def _parse_numbers(values: pd.Series) -> pd.Series:
+    cleaned = values.str.replace(r"[,\s$€£₩]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+def normalize_chunk(df: pd.DataFrame, date_col: str, menu_col: str, target_col: str):
+    """Type the mapped columns of one chunk; returns (clean rows, bad-row mask by reason)."""
+    dates = _parse_dates(df[date_col])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    menus = df[menu_col].str.strip()
+    # Always float, so a chunk of whole numbers does not get an int64 column
+    targets = _parse_numbers(df[target_col]).astype("float64")
+    problems = {
+        "missing_date": df[date_col].isna(),
+        "unparseable_date": df[date_col].notna() & dates.isna(),
+        "missing_menu": menus.isna() | (menus == ""),
+        "missing_target": df[target_col].isna(),
+        "non_numeric_target": df[target_col].notna() & targets.isna()
+    }
+    clean = df.assign(**{date_col: dates, menu_col: menus, target_col: targets})
+    return clean, problems
+
+def part_schema(columns, date_col: str, menu_col: str, target_col: str):
+    """One Arrow schema for every Parquet part of an upload, so the parts read back as one dataset.
+
+    Unmapped columns stay text, as they were read.
+    """
+    import pyarrow as pa
+    types = {date_col: pa.timestamp("ns"), menu_col: pa.string(), target_col: pa.float64()}
+    return pa.schema([(str(name), types.get(name, pa.string())) for name in columns])
+
+def validate_and_normalize(
+    file: BinaryIO,
+    filename: str,
+    date_col: str,
+    menu_col: str,
+    target_col: str,
+    write_part: Optional[Callable[[int, bytes], str]] = None,
+    chunk_rows: int = VALIDATION_CHUNK_ROWS,
+    covered: Optional[Dict[str, List[List[str]]]] = None
+) -> ValidationReport:
+    """Validate an upload chunk by chunk, dropping bad rows and writing clean Parquet parts.
+
+    write_part(index, parquet_bytes) stores one part and returns its key. covered maps menu
+    items to the [first, last] ISO date ranges already ingested; rows inside them are not
+    written, and menu items it does not name are kept whole. min_date/max_date and
+    menu_ranges describe the rows that are written. Blocking: run it off the event loop.
+    """
+    report = ValidationReport()
+    # The i-th covered range of every menu item, as timestamp maps for Series.map
+    bounds = [
+        tuple({menu: pd.Timestamp(spans[i][end]) for menu, spans in covered.items() if len(spans) > i} for end in (0, 1))
+        for i in range(max(map(len, covered.values()), default=0))
+    ] if covered else []
+    required = [date_col, menu_col, target_col]
+    offset = 0
+    try:
+        for index, chunk in enumerate(iter_chunks(file, filename, chunk_rows)):
+            missing = [col for col in required if col not in chunk.columns]
+            if missing:
+                raise FileValidationError(f"Missing columns: {', '.join(missing)}", report)
+
+            clean, problems = normalize_chunk(chunk, date_col, menu_col, target_col)
+            bad = pd.Series(False, index=chunk.index)
+            for reason, mask in problems.items():
+                count = int(mask.sum())
+                if count:
+                    report.issues[reason] = report.issues.get(reason, 0) + count
+                    bad |= mask
+                    for row in mask[mask].index[:MAX_SAMPLE_ERRORS - len(report.sample_errors)]:
+                        # +2: 1-based row numbers plus the header line
+                        report.sample_errors.append({"row": int(row) - chunk.index[0] + offset + 2, "reason": reason})
+
+            clean = clean[~bad]
+            report.total_rows += len(chunk)
+            report.valid_rows += len(clean)
+            report.dropped_rows += int(bad.sum())
+            offset += len(chunk)
+            if bounds:
+                days = clean[date_col].dt.normalize()
+                existing = pd.Series(False, index=clean.index)
+                for lows, highs in bounds:
+                    # Menu items without an i-th range map to NaT, which compares False
+                    existing |= (days >= clean[menu_col].map(lows)) & (days <= clean[menu_col].map(highs))
+                report.existing_rows += int(existing.sum())
+                clean = clean[~existing]
+            report.new_rows += len(clean)
+            if clean.empty:
+                continue
+
+            low, high = clean[date_col].min().date().isoformat(), clean[date_col].max().date().isoformat()
+            report.min_date = min(report.min_date or low, low)
+            report.max_date = max(report.max_date or high, high)
+            for menu, first, last in clean.groupby(menu_col)[date_col].agg(["min", "max"]).itertuples():
+                first, last = first.date().isoformat(), last.date().isoformat()
+                seen = report.menu_ranges.get(menu)
+                report.menu_ranges[menu] = [min(seen[0], first), max(seen[1], last)] if seen else [first, last]
+            if write_part is not None:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                schema = part_schema(clean.columns, date_col, menu_col, target_col)
+                buffer = io.BytesIO()
+                pq.write_table(pa.Table.from_pandas(clean, schema=schema, preserve_index=False), buffer)
+                report.parts.append(write_part(len(report.parts), buffer.getvalue()))
+    except FileValidationError:
+        raise
+    except (ValueError, KeyError, UnicodeDecodeError, zipfile.BadZipFile, InvalidFileException) as e:
+        raise FileValidationError(f"Could not read file: {e}", report)
+
+    if report.total_rows == 0:
+        raise FileValidationError("File contains no data rows", report)
+    if report.dropped_rows / report.total_rows > VALIDATION_MAX_BAD_RATIO:
+        raise FileValidationError(
+            f"{report.dropped_rows} of {report.total_rows} rows are invalid",
+            report
+        )
+    return report
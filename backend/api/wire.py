@@ -0,0 +1,160 @@
+# Request encodings accepted by /api/forecast.
+#
+#   application/json                       ForecastRequest with row records in "data"
+#   application/vnd.kivo.columnar+json     options plus "columns": {name: [values]}; columns listed in
+#                                          "dictionaries" hold integer codes into that value list
+#   application/vnd.apache.arrow.stream    Arrow IPC stream, options in the query string
+#   application/vnd.apache.parquet         Parquet file, options in the query string
+#
+# Columnar and binary bodies are only checked (column names, lengths, dictionary codes) and are
+# forwarded to the ML service byte-for-byte, never rebuilt row by row.
+import io
+import json
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Union
+from fastapi import HTTPException
+from pydantic import ValidationError
+from .models import ForecastOptions, ForecastRequest
+
+JSON_RECORDS = "application/json"
+COLUMNAR_JSON = "application/vnd.kivo.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+BINARY_FORMATS = (ARROW_STREAM, PARQUET)
+SUPPORTED_FORMATS = (JSON_RECORDS, COLUMNAR_JSON) + BINARY_FORMATS
+
+@dataclass
+class EncodedForecast:
+    """A forecast request whose data stays in its columnar wire encoding."""
+    options: ForecastOptions
+    content_type: str
+    body: bytes
+    rows: int
+
+    def cache_key_payload(self) -> Dict[str, Any]:
+        return {
+            "content_type": self.content_type,
+            "options": self.options.dict(),
+            "body_sha256": hashlib.sha256(self.body).hexdigest()
+        }
+
+    def query_params(self) -> Dict[str, str]:
+        """Options as query parameters, for binary bodies that cannot carry them inline."""
+        params = self.options.dict()
+        params["feature_groups"] = ",".join(params["feature_groups"])
+        return {key: str(value) for key, value in params.items()}
+
+ForecastInput = Union[ForecastRequest, EncodedForecast]
+
+def _media_type(content_type: str) -> str:
+    return (content_type or JSON_RECORDS).split(";")[0].strip().lower()
+
+def _options(values: Mapping[str, Any]) -> ForecastOptions:
+    try:
+        return ForecastOptions(**values)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+def _options_from_query(query: Mapping[str, str]) -> ForecastOptions:
+    values = dict(query)
+    groups = values.get("feature_groups", "")
+    values["feature_groups"] = [group for group in groups.split(",") if group]
+    return _options(values)
+
+def _require_columns(names: List[str], options: ForecastOptions):
+    missing = [col for col in (options.date_col, options.menu_col, options.target_col) if col not in names]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing columns: {', '.join(missing)}")
+
+def _parse_columnar_json(body: bytes) -> EncodedForecast:
+    try:
+        doc = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(doc, dict) or not isinstance(doc.get("columns"), dict):
+        raise HTTPException(status_code=422, detail="Columnar body must contain a 'columns' object")
+    options = _options({key: value for key, value in doc.items() if key in ForecastOptions.__fields__})
+
+    columns = doc["columns"]
+    if not all(isinstance(values, list) for values in columns.values()):
+        raise HTTPException(status_code=422, detail="Every column must be an array")
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=422, detail="Columns must all have the same length")
+    _require_columns(list(columns), options)
+
+    for name, dictionary in (doc.get("dictionaries") or {}).items():
+        codes = columns.get(name)
+        if codes is None or not isinstance(dictionary, list):
+            raise HTTPException(status_code=422, detail=f"Invalid dictionary for column '{name}'")
+        try:
+            if codes and (min(codes) < 0 or max(codes) >= len(dictionary)):
+                raise HTTPException(status_code=422, detail=f"Dictionary codes out of range for column '{name}'")
+        except TypeError:
+            raise HTTPException(status_code=422, detail=f"Dictionary-encoded column '{name}' must hold integer codes")
+
+    return EncodedForecast(options=options, content_type=COLUMNAR_JSON, body=body, rows=lengths.pop() if lengths else 0)
+
+def _parse_binary(media_type: str, body: bytes, query: Mapping[str, str]) -> EncodedForecast:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(status_code=415, detail=f"{media_type} requires pyarrow on the server")
+    options = _options_from_query(query)
+    try:
+        # Only the schema and row counts are read; the data pages are left untouched
+        if media_type == PARQUET:
+            metadata = pq.ParquetFile(io.BytesIO(body)).metadata
+            names, rows = metadata.schema.to_arrow_schema().names, metadata.num_rows
+        else:
+            reader = pa.ipc.open_stream(body)
+            names, rows = reader.schema.names, sum(batch.num_rows for batch in reader)
+    except (pa.ArrowInvalid, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {media_type} body: {e}")
+    _require_columns(names, options)
+    return EncodedForecast(options=options, content_type=media_type, body=body, rows=rows)
+
+def parse_forecast_body(content_type: str, body: bytes, query: Mapping[str, str]) -> ForecastInput:
+    """Decode a /forecast request body according to its Content-Type."""
+    media_type = _media_type(content_type)
+    if media_type == JSON_RECORDS:
+        try:
+            return ForecastRequest.parse_raw(body)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
+    if media_type == COLUMNAR_JSON:
+        return _parse_columnar_json(body)
+    if media_type in BINARY_FORMATS:
+        return _parse_binary(media_type, body, query)
+    raise HTTPException(
+        status_code=415,
+        detail=f"Unsupported content type {media_type}; expected one of {', '.join(SUPPORTED_FORMATS)}"
+    )
+
+def encode_columnar(records: List[Dict[str, Any]], dictionary_columns: List[str] = ()) -> Dict[str, Any]:
+    """Turn row records into the columnar JSON layout, dictionary-encoding the given columns."""
+    names = list(records[0]) if records else []
+    columns = {name: [record.get(name) for record in records] for name in names}
+    dictionaries = {}
+    for name in dictionary_columns:
+        if name not in columns:
+            continue
+        index: Dict[Any, int] = {}
+        columns[name] = [index.setdefault(value, len(index)) for value in columns[name]]
+        dictionaries[name] = list(index)
+    return {"columns": columns, "dictionaries": dictionaries}
+
+# Request body documentation for the OpenAPI schema
+OPENAPI_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            JSON_RECORDS: {"schema": ForecastRequest.schema()},
+            COLUMNAR_JSON: {"schema": {"type": "object", "required": ["columns"]}},
+            ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}},
+            PARQUET: {"schema": {"type": "string", "format": "binary"}}
+        }
+    }
+}
@@ -0,0 +1,66 @@
+"""Per-request cost of authenticating the same bearer token repeatedly.
+
+"baseline" is what get_current_user did before the verification cache: a full
+python-jose decode with the secret passed as a string. "cold" is one
+verify_token call with an empty cache (precomputed key, then cached);
+"cached" is every later call for the same token, as in dashboard polling.
+
+Usage (from backend/):
+    python -m benchmarks.bench_auth --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+SECRET = "bench-secret"
+os.environ.setdefault("SUPABASE_JWT_SECRET", SECRET)
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "mean_us": round(statistics.fmean(samples) * 1e6, 2),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 2),
+        "p99_us": round(samples[int(len(samples) * 0.99)] * 1e6, 2),
+    }
+
+async def run(requests: int):
+    from jose import jwt
+    from api import auth
+    token = jwt.encode({"sub": "user-1", "exp": int(time.time()) + 3600}, auth.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+    baseline = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        jwt.decode(token, auth.SUPABASE_JWT_SECRET, algorithms=["HS256"])
+        baseline.append(time.perf_counter() - start)
+
+    await auth.token_cache.invalidate()
+    start = time.perf_counter()
+    await auth.verify_token(token)
+    cold = time.perf_counter() - start
+
+    cached = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await auth.verify_token(token)
+        cached.append(time.perf_counter() - start)
+
+    return {
+        "requests": requests,
+        "baseline": _summary(baseline),
+        "cold_us": round(cold * 1e6, 2),
+        "cached": _summary(cached),
+        "cache": auth.token_cache.snapshot(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+
+if __name__ == "__main__":
+    main()
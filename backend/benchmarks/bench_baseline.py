@@ -0,0 +1,73 @@
+"""Time the local baseline engine on items x days of daily sales.
+
+Each model is run end to end from an Arrow IPC body (decode, pivot, forecast,
+backtest, output rows), once directly and once through the process pool as
+/api/forecast does. The first pool call includes worker start-up and is
+reported separately.
+
+Usage (from backend/):
+    python -m benchmarks.bench_baseline --items 1000 --days 1095 --horizon 14
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+
+def arrow_body(items: int, days: int) -> bytes:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    dates = np.tile(pd.date_range("2022-01-01", periods=days).strftime("%Y-%m-%d").to_numpy(), items)
+    menus = np.repeat([f"item_{i}" for i in range(items)], days)
+    sales = np.random.default_rng(0).poisson(5, items * days)
+    table = pa.table({"date": dates, "menu": menus, "sales": sales})
+    table = table.set_column(0, "date", table.column("date").dictionary_encode())
+    table = table.set_column(1, "menu", table.column("menu").dictionary_encode())
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+async def run(items: int, days: int, horizon: int):
+    from api.baseline import baseline_forecast
+    from api.forecasting import run_baseline
+    from api.models import BASELINE_MODELS, ForecastOptions
+    from api.wire import EncodedForecast, ARROW_STREAM
+    from api.concurrency import shutdown_executor
+
+    body = arrow_body(items, days)
+    results = []
+    for model in BASELINE_MODELS:
+        options = ForecastOptions(model_type=model, forecast_horizon=horizon, feature_groups=[], target_col="sales", date_col="date", menu_col="menu")
+        start = time.perf_counter()
+        output = baseline_forecast(options.dict(), content_type=ARROW_STREAM, body=body)
+        direct = time.perf_counter() - start
+
+        request = EncodedForecast(options=options, content_type=ARROW_STREAM, body=body, rows=items * days)
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            await run_baseline(request)
+            timings.append(time.perf_counter() - start)
+        results.append({
+            "model": model,
+            "rows_in": items * days,
+            "rows_out": len(output["forecast_data"]),
+            "direct_ms": round(direct * 1000, 1),
+            "pool_first_ms": round(timings[0] * 1000, 1),
+            "pool_warm_ms": round(min(timings[1:]) * 1000, 1),
+        })
+    shutdown_executor()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=1095)
+    parser.add_argument("--horizon", type=int, default=14)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.items, args.days, args.horizon)), indent=2))
+
+if __name__ == "__main__":
+    main()
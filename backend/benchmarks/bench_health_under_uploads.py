@@ -0,0 +1,89 @@
+"""Measure /api/health latency while uploads are in flight.
+
+Supabase and S3 are replaced with fakes whose calls block for a fixed time,
+so any blocking call left on the event loop shows up as health-check latency.
+
+Usage (from backend/):
+    python -m benchmarks.bench_health_under_uploads --uploads 50 --db-latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+
+from api import services, http_client
+from benchmarks.fakes import FakeSupabase, FakeS3, stub_ml_transport
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2)
+    }
+
+async def _probe_health(client, stop: asyncio.Event, interval: float):
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/api/health")
+        response.raise_for_status()
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return samples
+
+async def _upload(client, index: int):
+    response = await client.post(
+        "/api/upload",
+        files={"file": (f"sales_{index}.csv", b"date,menu,sales\n" + f"2024-01-01,item_{index},3\n".encode() * 100, "text/csv")},
+        data={"date_col": "date", "menu_col": "menu", "target_col": "sales", "location_id": "1"}
+    )
+    return response.status_code
+
+async def run(uploads: int, db_latency: float, s3_latency: float, ml_latency: float, probe_interval: float):
+    from main import app
+
+    services.supabase = FakeSupabase(latency=db_latency, tables={"locations": [{"id": "1", "name": "store"}]})
+    services.s3_client = FakeS3(latency=s3_latency)
+    http_client._client = httpx.AsyncClient(transport=stub_ml_transport(latency=ml_latency))
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(_probe_health(client, stop, probe_interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        idle = await idle_probe
+
+        stop = asyncio.Event()
+        loaded_probe = asyncio.create_task(_probe_health(client, stop, probe_interval))
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(_upload(client, i) for i in range(uploads)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        loaded = await loaded_probe
+
+    await http_client.close_ml_client()
+    return {
+        "uploads": uploads,
+        "upload_statuses": {str(code): statuses.count(code) for code in set(statuses)},
+        "uploads_wall_time_s": round(elapsed, 3),
+        "health_idle": _summary(idle),
+        "health_under_load": _summary(loaded)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--db-latency", type=float, default=0.05, help="seconds each Supabase execute() blocks")
+    parser.add_argument("--s3-latency", type=float, default=0.1, help="seconds each S3 call blocks")
+    parser.add_argument("--ml-latency", type=float, default=0.5, help="seconds the stub ML service waits")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.uploads, args.db_latency, args.s3_latency, args.ml_latency, args.probe_interval))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
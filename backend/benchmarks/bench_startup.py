@@ -0,0 +1,81 @@
+"""Cold-start cost of the backend: import time, time to first response, heavy modules.
+
+Every measurement runs in a fresh interpreter:
+  - import_ms: `import main` (builds the app)
+  - first_response_ms: import + lifespan startup + first GET /api/health in-process
+  - server_ready_ms: `uvicorn main:app` launched as a process until /api/health answers
+heavy_modules lists large libraries already loaded after the import.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "boto3", "botocore", "supabase", "openpyxl")
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+heavy = [name for name in %r if name in sys.modules]
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    assert client.get("/api/health").status_code == 200
+first = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_response_ms": (first - start) * 1000, "heavy_modules": heavy}))
+""" % (HEAVY_MODULES,)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_in_process() -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def measure_server(timeout: float = 30.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env={**os.environ, "PYTHONUNBUFFERED": "1"}
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("server did not become ready")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    runs = [measure_in_process() for _ in range(args.runs)]
+    servers = [measure_server() for _ in range(args.runs)]
+    print(json.dumps({
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "first_response_ms_median": round(statistics.median(r["first_response_ms"] for r in runs), 1),
+        "server_ready_ms_median": round(statistics.median(servers), 1),
+        "heavy_modules": runs[-1]["heavy_modules"],
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compare /api/forecast request decoding across wire formats.
+
+For each format and row count the encoded body is written to a temp file and
+decoded in a fresh subprocess, so peak RSS reflects only that decode. The
+JSON-records path includes the re-serialization done before forwarding to
+the ML service; columnar and binary bodies are forwarded untouched.
+
+Usage (from backend/):
+    python -m benchmarks.bench_wire_format --rows 10000 100000 1000000
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+OPTIONS = {"model_type": "xgboost", "forecast_horizon": 14, "feature_groups": ["calendar"], "target_col": "sales", "date_col": "date", "menu_col": "menu"}
+QUERY = {**OPTIONS, "forecast_horizon": "14", "feature_groups": "calendar"}
+FORMATS = {
+    "json_records": "application/json",
+    "columnar_json": "application/vnd.kivo.columnar+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def _records(rows: int):
+    menus = [f"item_{i}" for i in range(300)]
+    start = date(2023, 1, 1)
+    return [
+        {"date": (start + timedelta(days=i // len(menus))).isoformat(), "menu": menus[i % len(menus)], "sales": (i * 7) % 50}
+        for i in range(rows)
+    ]
+
+def encode(fmt: str, rows: int) -> bytes:
+    from api.wire import encode_columnar
+    records = _records(rows)
+    if fmt == "json_records":
+        return json.dumps({**OPTIONS, "data": records}).encode()
+    if fmt == "columnar_json":
+        return json.dumps({**OPTIONS, **encode_columnar(records, ["date", "menu"])}).encode()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pylist(records)
+    table = table.set_column(0, "date", table.column("date").dictionary_encode())
+    table = table.set_column(1, "menu", table.column("menu").dictionary_encode())
+    sink = io.BytesIO()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+    return sink.getvalue()
+
+def decode_in_child(fmt: str, path: str):
+    from api.wire import parse_forecast_body, EncodedForecast
+    if fmt in ("arrow", "parquet"):
+        # Keep the one-off pyarrow import out of the measurement
+        import pyarrow.parquet  # noqa: F401
+    with open(path, "rb") as f:
+        body = f.read()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    forecast = parse_forecast_body(FORMATS[fmt], body, QUERY if fmt in ("arrow", "parquet") else {})
+    if not isinstance(forecast, EncodedForecast):
+        # What the records path costs before it can be forwarded
+        json.dumps(forecast.dict()).encode()
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"parse_ms": round(elapsed * 1000, 2), "peak_rss_delta_mb": round((rss_after - rss_before) / 1024, 1)}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument("--child", nargs=2, metavar=("FORMAT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        decode_in_child(*args.child)
+        return
+
+    results = []
+    for rows in args.rows:
+        for fmt in args.formats:
+            body = encode(fmt, rows)
+            with tempfile.NamedTemporaryFile(delete=False) as f:
+                f.write(body)
+            try:
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_wire_format", "--child", fmt, f.name],
+                    check=True, capture_output=True, text=True
+                ).stdout
+            finally:
+                os.remove(f.name)
+            results.append({"rows": rows, "format": fmt, "body_mb": round(len(body) / 1e6, 2), **json.loads(out.strip().splitlines()[-1])})
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
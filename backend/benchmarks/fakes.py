@@ -0,0 +1,279 @@
+# In-process stand-ins for Supabase, S3 and the ML service used by the benchmarks.
+# Each one adds a configurable synchronous/asynchronous delay to mimic network round-trips.
+import io
+import asyncio
+import itertools
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+import httpx
+
+class _FakeParams:
+    """Records raw PostgREST params added with query.params.add()."""
+
+    def __init__(self):
+        self.items = []
+
+    def add(self, key, value):
+        self.items.append((key, value))
+        return self
+
+class _FakeQuery:
+    """Minimal PostgREST-style query builder backed by an in-memory table."""
+
+    def __init__(self, store: "FakeSupabase", table: str):
+        self.store = store
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+        self.is_single = False
+        self.negate_next = False
+        self.params = _FakeParams()
+
+    def select(self, *columns, **kwargs):
+        self.op = "select"
+        self.columns = ",".join(columns) or "*"
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload, on_conflict="id", **kwargs):
+        self.op, self.payload = "upsert", payload
+        self.conflict = [column.strip() for column in on_conflict.split(",")]
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    @property
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value, self.negate_next))
+        self.negate_next = False
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", [str(value) for value in values])
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.row_limit = size
+        return self
+
+    def single(self):
+        self.is_single = True
+        return self
+
+    @staticmethod
+    def _test(row, column, op, value):
+        actual = row.get(column)
+        if op == "in":
+            return str(actual) in value
+        if actual is None:
+            return False
+        if op == "eq":
+            return str(actual) == str(value)
+        if op == "lt":
+            return str(actual) < str(value)
+        return str(actual) > str(value)
+
+    def _matches(self, row):
+        return all(self._test(row, column, op, value) != negate for column, op, value, negate in self.filters)
+
+    def _apply_params(self, rows):
+        for key, value in self.params.items:
+            if key == "order":
+                self.orders = [(part.split(".")[0], part.endswith(".desc")) for part in value.split(",")]
+            elif key == "or":
+                # Only the keyset form used by api.db: (a.lt."x",and(a.eq."x",b.lt."y"))
+                match = re.match(r'\((\w+)\.lt\."([^"]*)",and\(\w+\.eq\."[^"]*",(\w+)\.lt\."([^"]*)"\)\)', value)
+                first, first_value, second, second_value = match.groups()
+                rows = [
+                    row for row in rows
+                    if str(row.get(first)) < first_value or (str(row.get(first)) == first_value and str(row.get(second)) < second_value)
+                ]
+        return rows
+
+    def _project(self, row):
+        columns = [column.strip() for column in self.columns.split(",")]
+        projected = dict(row) if "*" in columns else {}
+        for column in columns:
+            if column.endswith("(*)"):
+                # Embedded one-to-many resource joined on the store's foreign key
+                table = column[:-len("(*)")]
+                key = self.store.foreign_keys.get(table, "file_id")
+                projected[table] = [dict(child) for child in self.store.tables.get(table, []) if child.get(key) == row.get("id")]
+            elif column != "*":
+                projected[column] = row.get(column)
+        return projected
+
+    def execute(self):
+        time.sleep(self.store.latency)
+        rows: List[Dict[str, Any]] = self.store.tables.setdefault(self.table, [])
+        if self.op == "insert":
+            items = self.payload if isinstance(self.payload, list) else [self.payload]
+            created = []
+            for item in items:
+                row = {"id": f"{next(self.store.ids):08d}", **item}
+                rows.append(row)
+                created.append(dict(row))
+            return SimpleNamespace(data=created)
+        if self.op == "upsert":
+            items = self.payload if isinstance(self.payload, list) else [self.payload]
+            saved = []
+            for item in items:
+                row = next((row for row in rows if all(str(row.get(column)) == str(item.get(column)) for column in self.conflict)), None)
+                if row is None:
+                    row = {"id": f"{next(self.store.ids):08d}"}
+                    rows.append(row)
+                # Like merge-duplicates: only the columns given are written
+                row.update(item)
+                saved.append(dict(row))
+            return SimpleNamespace(data=saved)
+        matched = [row for row in rows if self._matches(row)]
+        if self.op == "update":
+            for row in matched:
+                row.update(self.payload)
+            return SimpleNamespace(data=[dict(row) for row in matched])
+        if self.op == "delete":
+            self.store.tables[self.table] = [row for row in rows if row not in matched]
+            return SimpleNamespace(data=matched)
+        matched = self._apply_params(matched)
+        for column, desc in reversed(self.orders):
+            matched.sort(key=lambda row: (row.get(column) is not None, row.get(column) if row.get(column) is not None else 0), reverse=desc)
+        if self.row_limit is not None:
+            matched = matched[:self.row_limit]
+        data = [self._project(row) for row in matched]
+        if self.is_single:
+            return SimpleNamespace(data=data[0] if data else None)
+        return SimpleNamespace(data=data)
+
+class FakeSupabase:
+    """Synchronous Supabase stand-in whose every execute() blocks for `latency` seconds."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tables: Dict[str, List[Dict[str, Any]]] = None,
+        foreign_keys: Dict[str, str] = None
+    ):
+        self.latency = latency
+        self.tables = tables or {}
+        # Embedded table -> column referencing the parent row's id
+        self.foreign_keys = foreign_keys or {"forecast_results": "file_id"}
+        self.queries = 0
+        self.ids = itertools.count(1)
+
+    def table(self, name: str) -> _FakeQuery:
+        self.queries += 1
+        return _FakeQuery(self, name)
+
+def seed_files(count: int, location_id: str = "1") -> List[Dict[str, Any]]:
+    """file_upload_tracker rows for `count` completed uploads, newest last."""
+    return [
+        {
+            "id": f"file-{i:06d}",
+            "filename": f"sales_{i}.csv",
+            "s3_path": f"s3://bench/raw/store/sales_{i}.csv",
+            "upload_time": f"20240101_{i:06d}",
+            "file_size": 1024,
+            "status": "completed",
+            "location_id": location_id
+        }
+        for i in range(count)
+    ]
+
+class FakeS3:
+    """Synchronous S3 stand-in that blocks for `latency` seconds per call."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.objects: Dict[str, int] = {}
+        self.bodies: Dict[str, bytes] = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(self.latency)
+        self.objects[f"{Bucket}/{Key}"] = len(Body)
+        self.bodies[f"{Bucket}/{Key}"] = bytes(Body)
+        return {"ETag": '"fake"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        time.sleep(self.latency)
+        return {"Body": io.BytesIO(self.bodies[f"{Bucket}/{Key}"])}
+
+def stub_ml_transport(latency: float = 0.0, status_code: int = 200, payload: Dict[str, Any] = None) -> httpx.MockTransport:
+    """httpx transport that answers every ML-service call after an async delay."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(status_code, json=payload or {"job_id": "stub", "forecast": [], "metrics": {}})
+
+    return httpx.MockTransport(handler)
+
+class FakeRedis:
+    """The subset of the redis-py client used by shared_state.RedisTier, kept in memory."""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+
+    @staticmethod
+    def _name(name) -> str:
+        return name.decode() if isinstance(name, bytes) else name
+
+    def _live(self, name):
+        name = self._name(name)
+        entry = self.data.get(name)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self.data[name]
+            return None
+        return entry
+
+    def get(self, name):
+        entry = self._live(name)
+        return entry[0] if entry else None
+
+    def set(self, name, value, px=None, nx=False):
+        if nx and self._live(name) is not None:
+            return None
+        self.data[self._name(name)] = (value, time.time() + px / 1000 if px else None)
+        return True
+
+    def pttl(self, name):
+        entry = self._live(name)
+        if entry is None:
+            return -2
+        return -1 if entry[1] is None else int((entry[1] - time.time()) * 1000)
+
+    def delete(self, *names):
+        return sum(self.data.pop(self._name(name), None) is not None for name in names)
+
+    def scan_iter(self, match="*"):
+        pattern = re.compile(re.escape(match).replace(r"\*", ".*") + "$")
+        return [name.encode() for name in list(self.data) if pattern.match(name) and self._live(name)]
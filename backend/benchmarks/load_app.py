@@ -0,0 +1,27 @@
+"""The real app with in-memory fakes behind it, for load tests against server workers.
+
+Every worker process imports this module and gets its own FakeSupabase (seeded with
+LOAD_FILES uploads), FakeS3 and stub ML transport, so throughput reflects the API
+processes rather than a remote backend.
+
+    uvicorn benchmarks.load_app:app --workers 4
+"""
+import os
+import httpx
+
+from api import services, http_client
+from benchmarks.fakes import FakeSupabase, FakeS3, seed_files, stub_ml_transport
+
+DB_LATENCY = float(os.getenv("LOAD_DB_LATENCY", "0.002"))
+S3_LATENCY = float(os.getenv("LOAD_S3_LATENCY", "0.005"))
+ML_LATENCY = float(os.getenv("LOAD_ML_LATENCY", "0.01"))
+FILES = int(os.getenv("LOAD_FILES", "200"))
+
+services.supabase = FakeSupabase(
+    latency=DB_LATENCY,
+    tables={"locations": [{"id": "1", "name": "store"}], "file_upload_tracker": seed_files(FILES)}
+)
+services.s3_client = FakeS3(latency=S3_LATENCY)
+http_client._client = httpx.AsyncClient(transport=stub_ml_transport(latency=ML_LATENCY))
+
+from main import app  # noqa: E402,F401  (re-exported: uvicorn serves "benchmarks.load_app:app")
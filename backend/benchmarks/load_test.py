@@ -0,0 +1,148 @@
+"""Throughput of /api/forecast and /api/files as the number of server workers grows.
+
+For each worker count, `uvicorn benchmarks.load_app:app --workers N` is started (real
+app, in-memory fakes for Supabase/S3/ML) and driven by several load-generator
+processes, each keeping --connections/--clients requests in flight for --duration
+seconds. Result caches are off by default so every request does the full work.
+
+The generator shares the machine with the server; on small hosts pass --url to aim
+at a server started elsewhere (the worker sweep is then skipped).
+
+Usage (from backend/):
+    python -m benchmarks.load_test --workers 1,2,4 --duration 10
+    python -m benchmarks.load_test --model exp_smoothing   # CPU-bound local forecasts
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import httpx
+
+def forecast_body(model: str, menus: int = 5, days: int = 60):
+    data = [
+        {"date": f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}", "menu": f"item_{m}", "sales": (day * 7 + m) % 23}
+        for m in range(menus) for day in range(days)
+    ]
+    return {
+        "data": data, "model_type": model, "forecast_horizon": 7, "feature_groups": [],
+        "target_col": "sales", "date_col": "date", "menu_col": "menu"
+    }
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+async def _drive(url: str, endpoint: str, body, connections: int, duration: float):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def loop():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if endpoint == "forecast":
+                        response = await client.post("/api/forecast", json=body)
+                    else:
+                        response = await client.get("/api/files", params={"limit": 50})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+        await asyncio.gather(*(loop() for _ in range(connections)))
+    return latencies, errors
+
+def _client_process(args):
+    return asyncio.run(_drive(*args))
+
+def run_load(url: str, endpoint: str, body, clients: int, connections: int, duration: float):
+    per_client = max(connections // clients, 1)
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(_client_process, [(url, endpoint, body, per_client, duration)] * clients)
+    latencies = [sample for samples, _ in results for sample in samples]
+    errors = sum(count for _, count in results)
+    return {"requests": len(latencies), "errors": errors, "rps": round(len(latencies) / duration, 1), **_percentiles(latencies)}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workers: int, env: dict) -> tuple:
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.load_app:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/api/health", timeout=1):
+                return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise TimeoutError("server did not start")
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8, 16) if n <= cores) or "1")
+    parser.add_argument("--endpoints", default="forecast,files")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--connections", type=int, default=64, help="requests in flight across all clients")
+    parser.add_argument("--clients", type=int, default=max(cores // 2, 1), help="load-generator processes")
+    parser.add_argument("--model", default="xgboost", help="model_type; baseline models run locally on the CPU")
+    parser.add_argument("--cache", action="store_true", help="keep the forecast and file-list caches on")
+    parser.add_argument("--admission", action="store_true", help="keep admission control (limits, queues, quotas) on")
+    parser.add_argument("--shared-state", default="sqlite", choices=("memory", "sqlite", "redis"))
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    args = parser.parse_args()
+
+    env = {"SHARED_STATE": args.shared_state, "JOB_STORE": "shared" if args.shared_state != "memory" else "memory"}
+    if args.shared_state == "sqlite":
+        env["SHARED_STATE_PATH"] = os.path.join(os.getenv("TMPDIR", "/tmp"), f"kivo-load-{os.getpid()}.sqlite3")
+    if not args.cache:
+        env.update({"FORECAST_CACHE_ENABLED": "false", "FILE_LIST_CACHE_TTL": "0"})
+    if not args.admission:
+        env["ADMISSION_ENABLED"] = "false"
+    body = forecast_body(args.model)
+    endpoints = args.endpoints.split(",")
+
+    runs = []
+    for workers in ([None] if args.url else [int(n) for n in args.workers.split(",")]):
+        proc, url = (None, args.url) if args.url else start_server(workers, {**env, "WEB_CONCURRENCY": str(workers)})
+        try:
+            row = {"workers": workers}
+            for endpoint in endpoints:
+                run_load(url, endpoint, body, 1, 4, 1.0)  # warm-up
+                row[endpoint] = run_load(url, endpoint, body, args.clients, args.connections, args.duration)
+            runs.append(row)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+    for endpoint in endpoints:
+        base = runs[0][endpoint]["rps"] or 1
+        for row in runs:
+            row[endpoint]["speedup"] = round(row[endpoint]["rps"] / base, 2)
+    print(json.dumps({"cores": cores, "model": args.model, "shared_state": args.shared_state, "runs": runs}, indent=2))
+
+if __name__ == "__main__":
+    main()
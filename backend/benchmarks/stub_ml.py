@@ -0,0 +1,73 @@
+"""Stand-in for the ML service with injectable latency and errors.
+
+Used in-process by tests (through httpx.ASGITransport) and as a real server for
+load tests:
+
+    python -m benchmarks.stub_ml --port 8001 --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import random
+from typing import Any, Dict, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+class StubML:
+    """ML-service stub. Calls are counted; the first `fail_first` calls and a random
+    `error_rate` fraction answer `error_status`, and the first `slow_first` calls take
+    `slow_latency` instead of `latency` seconds."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        fail_first: int = 0,
+        error_status: int = 503,
+        slow_first: int = 0,
+        slow_latency: float = 1.0,
+        payload: Optional[Dict[str, Any]] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_first = fail_first
+        self.error_status = error_status
+        self.slow_first = slow_first
+        self.slow_latency = slow_latency
+        self.payload = payload or {"job_id": "stub", "forecast_data": [], "metrics": {}}
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.app = self._build_app()
+
+    async def _answer(self, request: Request):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(self.slow_latency if call <= self.slow_first else self.latency)
+        if call <= self.fail_first or self.random.random() < self.error_rate:
+            return JSONResponse(status_code=self.error_status, content={"detail": "injected failure"})
+        return JSONResponse(content=self.payload)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Stub ML service")
+        for path in ("/forecast", "/api/v1/upload", "/process-file"):
+            app.add_api_route(path, self._answer, methods=["POST"])
+
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy", "calls": self.calls}
+        return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    import uvicorn
+    stub = StubML(latency=args.latency, error_rate=args.error_rate, error_status=args.error_status)
+    uvicorn.run(stub.app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
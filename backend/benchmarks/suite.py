@@ -0,0 +1,211 @@
+"""Benchmark suite: upload, preview, listing and forecast proxying at fixed concurrency.
+
+Everything runs locally: S3 is moto, Supabase is benchmarks.fakes.FakeSupabase
+(PostgREST query semantics plus a per-query delay) and the ML service is
+benchmarks.stub_ml.StubML with a configurable delay. Each scenario runs in its
+own interpreter, so its peak RSS is its own, and reports p50/p95/p99 latency,
+throughput and peak RSS as JSON. Result caches are off so every request does
+the full work.
+
+--baseline compares the run against a stored one and exits 1 when a metric is
+worse by more than --tolerance; --save-baseline stores the run. Use --repeat on
+noisy machines: each metric is then the median of that many runs.
+
+Usage (from backend/):
+    python -m benchmarks.suite
+    python -m benchmarks.suite --scenarios listing,forecast --concurrency 32
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --repeat 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+SCENARIOS = ("upload", "preview", "listing", "forecast")
+# Metric -> True when higher is better
+METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "rps": True, "peak_rss_mb": False}
+
+CSV_HEADER = b"date,menu,sales\n"
+
+def _csv(rows: int, salt: int = 0) -> bytes:
+    lines = (f"2024-{1 + day // 28 % 12:02d}-{1 + day % 28:02d},item_{day % 7},{(day * 13 + salt) % 41}\n" for day in range(rows))
+    return CSV_HEADER + "".join(lines).encode()
+
+def _forecast_body() -> Dict[str, Any]:
+    data = [{"date": f"2024-01-{1 + d % 28:02d}", "menu": f"item_{m}", "sales": (d + m) % 17} for m in range(5) for d in range(60)]
+    return {"data": data, "model_type": "xgboost", "forecast_horizon": 7, "feature_groups": [], "target_col": "sales", "date_col": "date", "menu_col": "menu"}
+
+def _percentile(samples: List[float], q: float) -> float:
+    return round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)
+
+async def drive(send: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Issue `requests` calls of send(i), `concurrency` at a time; latency and throughput."""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await send(i)
+            if response.status_code < 400:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {"requests": requests, "errors": errors, "concurrency": concurrency, "rps": round(len(latencies) / elapsed, 1)}
+    if latencies:
+        result.update({"p50_ms": _percentile(latencies, 0.50), "p95_ms": _percentile(latencies, 0.95), "p99_ms": _percentile(latencies, 0.99)})
+    return result
+
+async def run_scenario(name: str, requests: int, concurrency: int, db_latency: float, ml_latency: float, files: int) -> Dict[str, Any]:
+    """Run one scenario in this process against moto, the fake Supabase and the stub ML service."""
+    # One client sends everything, so per-caller quotas would shed most of the load
+    os.environ.update({"FORECAST_CACHE_ENABLED": "false", "FILE_LIST_CACHE_TTL": "0", "ADMISSION_ENABLED": "false", "AWS_DEFAULT_REGION": "us-east-1"})
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    import boto3
+    import httpx
+    from moto import mock_s3
+    from api import services, http_client
+    from api.jobs import get_job_queue
+    from benchmarks.fakes import FakeSupabase, seed_files
+    from benchmarks.stub_ml import StubML
+
+    with mock_s3():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=services.S3_BUCKET)
+        services.s3_client = s3
+        services.supabase = FakeSupabase(
+            latency=db_latency,
+            tables={"locations": [{"id": "1", "name": "store"}], "file_upload_tracker": seed_files(files)}
+        )
+        stub = StubML(latency=ml_latency)
+        http_client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub.app))
+        from api import app
+
+        form = {"date_col": "date", "menu_col": "menu", "target_col": "sales", "location_id": "1"}
+        preview_csv = _csv(2000)
+        body = _forecast_body()
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=60) as client:
+            send = {
+                # Distinct content per request so deduplication does not short-circuit
+                "upload": lambda i: client.post("/api/upload", files={"file": (f"sales_{i}.csv", _csv(500, salt=i), "text/csv")}, data=form),
+                "preview": lambda i: client.post("/api/preview", files={"file": ("sales.csv", preview_csv, "text/csv")}),
+                "listing": lambda i: client.get("/api/files", params={"limit": 50}),
+                "forecast": lambda i: client.post("/api/forecast", json=body),
+            }[name]
+            await drive(send, min(requests, concurrency), concurrency)  # warm-up
+            result = await drive(send, requests, concurrency)
+        await get_job_queue().stop()
+        await http_client.close_ml_client()
+    result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+def run_isolated(name: str, args) -> Dict[str, Any]:
+    command = [
+        sys.executable, "-m", "benchmarks.suite", "--run-scenario", name,
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        "--db-latency", str(args.db_latency), "--ml-latency", str(args.ml_latency), "--files", str(args.files)
+    ]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def median_run(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-metric median of repeated runs of one scenario."""
+    merged = dict(runs[0])
+    for metric in METRICS:
+        values = sorted(run[metric] for run in runs if metric in run)
+        if values:
+            merged[metric] = values[len(values) // 2]
+    merged["errors"] = sum(run["errors"] for run in runs)
+    merged["runs"] = len(runs)
+    return merged
+
+def environment() -> Dict[str, Any]:
+    return {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Per scenario and metric: baseline, current, relative change and whether it regressed."""
+    report = {}
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        report[name] = {}
+        for metric, higher_is_better in METRICS.items():
+            if metric not in result or not before.get(metric):
+                continue
+            change = (result[metric] - before[metric]) / before[metric]
+            worse = -change if higher_is_better else change
+            report[name][metric] = {
+                "baseline": before[metric],
+                "current": result[metric],
+                "change_pct": round(change * 100, 1),
+                "regression": worse > tolerance
+            }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per fake Supabase query")
+    parser.add_argument("--ml-latency", type=float, default=0.02, help="seconds per stub ML call")
+    parser.add_argument("--files", type=int, default=500, help="uploads seeded for the listing scenario")
+    parser.add_argument("--output", help="write the results here as well as to stdout")
+    parser.add_argument("--baseline", help="stored results to compare against")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario; metrics are the median")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--save-baseline", help="store this run as the baseline")
+    parser.add_argument("--run-scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        import logging
+        logging.disable(logging.WARNING)
+        result = asyncio.run(run_scenario(args.run_scenario, args.requests, args.concurrency, args.db_latency, args.ml_latency, args.files))
+        print(json.dumps(result))
+        return
+
+    results = {
+        "environment": environment(),
+        "settings": {key: getattr(args, key) for key in ("requests", "concurrency", "db_latency", "ml_latency", "files")},
+        "scenarios": {
+            name: median_run([run_isolated(name, args) for _ in range(max(args.repeat, 1))])
+            for name in args.scenarios.split(",")
+        }
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != results["environment"] or baseline.get("settings") != results["settings"]:
+            print("⚠️  Baseline was recorded with a different environment or settings", file=sys.stderr)
+        results["comparison"] = compare(results, baseline, args.tolerance)
+        regressions = [f"{name}.{metric}" for name, metrics in results["comparison"].items() for metric, row in metrics.items() if row["regression"]]
+        results["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+-- Background job queue (api/jobs.py, SupabaseJobStore).
+-- Jobs are created as 'queued', claimed with a conditional update on attempts
+-- (status in queued/running/retrying and attempts = attempt - 1), and end as
+-- 'completed' or 'failed' with the last error.
+alter table forecast_jobs add column if not exists upload_id text;
+alter table forecast_jobs add column if not exists user_id text;
+alter table forecast_jobs add column if not exists config jsonb;
+alter table forecast_jobs add column if not exists attempts integer not null default 0;
+alter table forecast_jobs add column if not exists error text;
+alter table forecast_jobs add column if not exists created_at timestamptz not null default now();
+alter table forecast_jobs add column if not exists updated_at timestamptz;
+alter table forecast_jobs add column if not exists completed_at timestamptz;
+
+-- Pending jobs are listed at startup for recovery
+create index if not exists forecast_jobs_status_idx on forecast_jobs (status);
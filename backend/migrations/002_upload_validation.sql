@@ -0,0 +1,4 @@
+-- Upload validation (api/validation.py): each upload records its typed Parquet copy
+-- and the number of rows that passed validation.
+alter table file_upload_tracker add column if not exists clean_path text;
+alter table file_upload_tracker add column if not exists row_count integer;
@@ -0,0 +1,6 @@
+-- Upload deduplication (db.find_file_by_hash): sha256 of the uploaded bytes, looked up
+-- per location, newest upload first.
+alter table file_upload_tracker add column if not exists content_hash text;
+
+create index if not exists file_upload_tracker_location_hash_idx
+    on file_upload_tracker (location_id, content_hash, upload_time desc);
@@ -0,0 +1,14 @@
+-- Chunked forecast series (api/results.py): a job's series is stored as columnar
+-- chunks of RESULT_CHUNK_ROWS rows so /api/results/{job_id}/rows can stream a range
+-- or a few menu items without loading the whole result. Rows are deleted again by
+-- python -m api.migrate_results once a result moves to object storage.
+create table if not exists forecast_result_chunks (
+    id bigint generated by default as identity primary key,
+    job_id text not null,
+    chunk_index integer not null,
+    row_offset integer not null,
+    row_count integer not null,
+    menus jsonb not null default '[]'::jsonb,
+    data jsonb not null,
+    unique (job_id, chunk_index)
+);
@@ -0,0 +1,11 @@
+-- Incremental ingestion (api/history.py): one row per location listing the clean Parquet
+-- segments of its uploads. Each segment records, per menu item, the first and last date
+-- it added; uploads only keep rows outside those ranges. watermark is the latest date of
+-- any segment and is passed on to the ML service.
+create table if not exists location_history (
+    location_id text primary key,
+    watermark date,
+    row_count bigint not null default 0,
+    segments jsonb not null default '[]'::jsonb,
+    updated_at timestamptz not null default now()
+);
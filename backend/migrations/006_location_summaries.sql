@@ -0,0 +1,20 @@
+-- Dashboard summaries (api/summaries.py): one row per location, written with an upsert on
+-- location_id as upload jobs finish. job_id and the totals come from the latest completed
+-- run; the latest_* columns describe the latest run of any outcome.
+create table if not exists location_summaries (
+    location_id text primary key,
+    latest_job_id text,
+    latest_file_id text,
+    latest_status text,
+    latest_run_at text,
+    error text,
+    job_id text,
+    model_type text,
+    metrics jsonb not null default '{}'::jsonb,
+    menu_totals jsonb not null default '{}'::jsonb,
+    forecast_total double precision,
+    forecast_start text,
+    forecast_end text,
+    row_count integer,
+    updated_at timestamptz not null default now()
+);
@@ -1,13 +1,19 @@
 import pytest
 from unittest.mock import patch
+from fastapi.testclient import TestClient
+from api import services, shared_state
+from api.auth import get_current_user
+from benchmarks.fakes import FakeSupabase, FakeS3
+
+TEST_USER = {"user_id": "testuser", "token": "testtoken"}
 
 @pytest.fixture(autouse=True)
 def mock_supabase():
     with patch("api.services.supabase") as mock:
-        # For handle_file_upload
+        # For file metadata inserts
         mock.table.return_value.insert.return_value.execute.return_value.data = [{"id": "123"}]
         # For list_uploaded_files
-        mock.table.return_value.select.return_value.order.return_value.execute.return_value.data = [{"id": "123", "filename": "test.csv"}]
+        mock.table.return_value.select.return_value.limit.return_value.execute.return_value.data = [{"id": "123", "filename": "test.csv"}]
         # For get_job_status
         mock.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {"status": "PENDING"}
         # For get_results
@@ -18,4 +24,37 @@ def mock_supabase():
 def mock_s3():
     with patch("api.services.s3_client") as mock:
         mock.put_object.return_value = None
-        yield mock 
\ No newline at end of file
+        yield mock
+
+@pytest.fixture(autouse=True)
+def fresh_shared_state(monkeypatch):
+    """Locks and claims left by one test's background jobs must not leak into the next."""
+    monkeypatch.setattr(shared_state, "_tiers", {})
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """In-memory Supabase (benchmarks.fakes) as services.supabase, holding location 1 "store".
+
+    Modules seed more rows by overriding this fixture and requesting it.
+    """
+    fake = FakeSupabase(tables={"locations": [{"id": "1", "name": "store"}]})
+    monkeypatch.setattr(services, "supabase", fake)
+    return fake
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(services, "s3_client", fake)
+    return fake
+
+@pytest.fixture
+def client(fake_db):
+    """TestClient for the app backed by fake_db, signed in as TEST_USER."""
+    from main import app
+    previous = app.dependency_overrides.get(get_current_user)
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield TestClient(app)
+    if previous is None:
+        app.dependency_overrides.pop(get_current_user, None)
+    else:
+        app.dependency_overrides[get_current_user] = previous
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from api import admission
+
+def test_queue_full_is_shed_immediately():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+        await limiter.acquire()
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(admission.Rejected) as info:
+            await limiter.acquire()
+        assert info.value.status_code == 503 and info.value.reason == "queue_full" and info.value.retry_after >= 1
+        # Releasing hands the slot to the queued request
+        limiter.release(0.1)
+        await queued
+        assert limiter.in_flight == 1 and limiter.snapshot()["queued"] == 0
+    asyncio.run(scenario())
+
+def test_queue_timeout_is_shed():
+    async def scenario():
+        limiter = admission.ConcurrencyLimiter("test", max_concurrent=1, max_queue=4, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(admission.Rejected) as info:
+            await limiter.acquire()
+        assert info.value.reason == "queue_timeout"
+        limiter.release()
+        assert limiter.in_flight == 0
+    asyncio.run(scenario())
+
+def test_token_bucket_refills():
+    buckets = admission.TokenBuckets("test", per_minute=2)
+    assert buckets.take("a") == 0 and buckets.take("a") == 0
+    assert buckets.take("a") == pytest.approx(30, abs=0.5)
+    assert buckets.take("b") == 0
+
+@pytest.fixture
+def users(monkeypatch):
+    """Bearer tokens verify as the user named by the token; "forged" fails verification."""
+    from fastapi import HTTPException
+    from api import auth
+
+    async def verify(credentials):
+        if credentials.credentials == "forged":
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return {"user_id": credentials.credentials}
+    monkeypatch.setattr(auth, "get_current_user", verify)
+
+def _scope(headers=(), query=b"", client=("10.0.0.1", 5000)):
+    return {"headers": [(name.lower().encode(), value.encode()) for name, value in headers], "query_string": query, "client": client}
+
+def test_quota_key_trusts_only_verified_users(users):
+    assert asyncio.run(admission.quota_key(_scope([("Authorization", "Bearer alice")]))) == "user:alice"
+    # Claimed locations and unverifiable tokens fall back to the address
+    spoofed = _scope([("Authorization", "Bearer forged"), ("X-Location-Id", "7")], query=b"location_id=8")
+    assert asyncio.run(admission.quota_key(spoofed)) == "client:10.0.0.1"
+
+def test_shed_requests_get_their_token_back(monkeypatch):
+    monkeypatch.setattr(admission, "ENDPOINT_LIMITS", {**admission.ENDPOINT_LIMITS, "preview": (1, 0, 1)})
+    monkeypatch.setattr(admission, "_quotas", {})
+    monkeypatch.setattr(admission, "_limiters", {})
+
+    async def scenario():
+        holder = await admission.admit("preview", _scope(client=("10.0.0.2", 5000)))
+        with pytest.raises(admission.Rejected) as info:
+            await admission.admit("preview", _scope())
+        assert info.value.reason == "queue_full"
+        holder.release()
+        # The shed request did not use up 10.0.0.1's only token
+        (await admission.admit("preview", _scope())).release()
+    asyncio.run(scenario())
+
+def test_quota_rejection_carries_retry_after(client, users, monkeypatch):
+    monkeypatch.setattr(admission, "ENDPOINT_LIMITS", {**admission.ENDPOINT_LIMITS, "preview": (8, 32, 1)})
+    monkeypatch.setattr(admission, "_quotas", {})
+    monkeypatch.setattr(admission, "_limiters", {})
+    files = {"file": ("sales.csv", b"date,menu,sales\n2024-01-01,latte,3\n", "text/csv")}
+    assert client.post("/api/preview", files=files, headers={"Authorization": "Bearer alice"}).status_code == 200
+    rejected = client.post("/api/preview", files=files, headers={"Authorization": "Bearer alice", "X-Location-Id": "2"})
+    assert rejected.status_code == 429 and int(rejected.headers["retry-after"]) > 1
+    # Other callers and unlimited routes are unaffected
+    assert client.post("/api/preview", files=files, headers={"Authorization": "Bearer bob"}).status_code == 200
+    assert client.get("/api/health").status_code == 200
+    assert client.get("/api/services/health").json()["admission"]["preview"]["rejections"]["quota"] >= 1
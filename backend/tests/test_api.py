@@ -2,6 +2,8 @@ from fastapi.testclient import TestClient
 from api import app
 from api.auth import get_current_user
 from unittest.mock import patch, AsyncMock
+import httpx
+import json
 
 # Override authentication for all tests
 def override_get_current_user():
@@ -13,28 +15,32 @@ client = TestClient(app)
 
 def test_health_check():
     """Test the health check endpoint."""
-    response = client.get("/health")
+    response = client.get("/api/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "healthy"}
+    assert response.json()["status"] == "healthy"
 
-@patch("api.routes.call_ml_service", new_callable=AsyncMock)
-def test_upload_file(mock_call_ml_service, mock_s3, mock_supabase):
-    """Test file upload endpoint with mocked S3, Supabase, and ML service."""
-    mock_call_ml_service.return_value = {"result": "success"}
-    headers = {"Authorization": "Bearer testtoken"}
-    response = client.post("/upload", files={"file": ("test.csv", b"test data")}, headers=headers)
+def test_upload_file(mock_s3, mock_supabase):
+    """Test file upload endpoint with mocked S3 and Supabase; ML processing is queued."""
+    # Location lookup, then no earlier upload with the same content hash
+    mock_supabase.table.return_value.select.return_value.eq.return_value.limit.return_value.execute.return_value.data = [{"name": "store"}]
+    mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.not_.in_.return_value.order.return_value.limit.return_value.execute.return_value.data = []
+    response = client.post(
+        "/api/upload",
+        files={"file": ("test.csv", b"date,menu,sales\n2024-01-01,latte,3\n")},
+        data={"date_col": "date", "menu_col": "menu", "target_col": "sales", "location_id": "1"}
+    )
     assert response.status_code == 200
     assert "file_id" in response.json() or "id" in response.json()
 
 def test_list_files(mock_supabase):
     """Test listing uploaded files with mocked Supabase."""
     # Mock Supabase response
-    mock_supabase.table.return_value.select.return_value.order.return_value.execute.return_value.data = [{"id": "123", "filename": "test.csv"}]
+    mock_supabase.table.return_value.select.return_value.limit.return_value.execute.return_value.data = [{"id": "123", "filename": "test.csv"}]
     
     headers = {"Authorization": "Bearer testtoken"}
-    response = client.get("/files", headers=headers)
+    response = client.get("/api/files", headers=headers)
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["files"], list)
 
 def test_get_job_status(mock_supabase):
     """Test retrieving job status with mocked Supabase."""
@@ -42,7 +48,7 @@ def test_get_job_status(mock_supabase):
     mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {"status": "PENDING"}
     
     headers = {"Authorization": "Bearer testtoken"}
-    response = client.get("/jobs/123", headers=headers)
+    response = client.get("/api/jobs/123", headers=headers)
     assert response.status_code == 200
     assert response.json()["status"] == "PENDING"
 
@@ -52,21 +58,59 @@ def test_get_results(mock_supabase):
     mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {"results": {"forecast": [], "metrics": {}}}
     
     headers = {"Authorization": "Bearer testtoken"}
-    response = client.get("/results/123", headers=headers)
+    response = client.get("/api/results/123", headers=headers)
     assert response.status_code == 200
     assert "results" in response.json()
 
 @patch("httpx.AsyncClient.post", new_callable=AsyncMock)
 def test_forecast_endpoint(mock_post, mock_supabase):
     """Test the forecast endpoint with mocked ML service response."""
-    mock_post.return_value.status_code = 200
-    mock_post.return_value.json = AsyncMock(return_value={"id": "123"})
-    mock_post.return_value.raise_for_status = AsyncMock()
+    mock_post.return_value = httpx.Response(200, json={"id": "123"}, request=httpx.Request("POST", "http://ml/forecast"))
     headers = {"Authorization": "Bearer testtoken"}
     response = client.post(
-        "/forecast",
+        "/api/forecast",
         json={"data": [], "model_type": "xgboost", "forecast_horizon": 7, "feature_groups": [], "target_col": "sales", "date_col": "date", "menu_col": "menu"},
         headers=headers
     )
     assert response.status_code == 200
-    assert "id" in response.json() 
\ No newline at end of file
+    assert "id" in response.json()
+
+
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+def test_forecast_results_are_cached(mock_post, mock_supabase):
+    """Identical forecast requests reach the ML service once until the cache is invalidated."""
+    mock_post.return_value = httpx.Response(200, json={"forecast": [1]}, request=httpx.Request("POST", "http://ml/forecast"))
+    headers = {"Authorization": "Bearer testtoken"}
+    body = {"data": [{"date": "2024-01-01", "menu": "latte", "sales": 3}], "model_type": "xgboost", "forecast_horizon": 7, "feature_groups": [], "target_col": "sales", "date_col": "date", "menu_col": "menu"}
+
+    assert client.delete("/api/forecast/cache", headers=headers).status_code == 200
+    assert client.post("/api/forecast", json=body, headers=headers).json() == {"forecast": [1]}
+    assert client.post("/api/forecast", json=body, headers=headers).json() == {"forecast": [1]}
+    assert mock_post.await_count == 1
+
+    client.delete("/api/forecast/cache", headers=headers)
+    client.post("/api/forecast", json=body, headers=headers)
+    assert mock_post.await_count == 2
+
+def test_cache_flush_requires_auth():
+    """Flushing the forecast cache needs a signed-in user."""
+    app.dependency_overrides.pop(get_current_user)
+    try:
+        assert client.delete("/api/forecast/cache").status_code == 403
+    finally:
+        app.dependency_overrides[get_current_user] = override_get_current_user
+
+@patch("httpx.AsyncClient.post", new_callable=AsyncMock)
+def test_forecast_forwards_columnar_body(mock_post, mock_supabase):
+    """Columnar requests are passed to the ML service byte-for-byte with their content type."""
+    mock_post.return_value = httpx.Response(200, json={"forecast": []}, request=httpx.Request("POST", "http://ml/forecast"))
+    body = json.dumps({
+        "model_type": "xgboost", "forecast_horizon": 7, "feature_groups": [], "target_col": "sales", "date_col": "date", "menu_col": "menu",
+        "columns": {"date": ["2024-01-01"], "menu": [0], "sales": [3]}, "dictionaries": {"menu": ["latte"]}
+    }).encode()
+    headers = {"Authorization": "Bearer testtoken", "Content-Type": "application/vnd.kivo.columnar+json"}
+    response = client.post("/api/forecast", content=body, headers=headers)
+    assert response.status_code == 200
+    _, kwargs = mock_post.call_args
+    assert kwargs["content"] == body
+    assert kwargs["headers"]["Content-Type"] == "application/vnd.kivo.columnar+json"
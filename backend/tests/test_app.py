@@ -0,0 +1,19 @@
+import subprocess
+import sys
+from api import app, services
+
+def test_every_route_is_served_once():
+    seen = [(method, route.path) for route in app.routes for method in getattr(route, "methods", ())]
+    assert len(seen) == len(set(seen))
+    assert ("GET", "/api/jobs/{job_id}") in seen and ("POST", "/api/upload") in seen
+
+def test_import_does_not_load_heavy_modules():
+    code = "import sys, main; print(','.join(m for m in ('pandas', 'numpy', 'boto3', 'supabase') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    assert output.strip() == ""
+
+def test_init_clients_keeps_assigned_clients(monkeypatch):
+    sentinel = object()
+    monkeypatch.setattr(services, "supabase", sentinel)
+    monkeypatch.setattr(services, "_clients_ready", False)
+    assert services.get_supabase_client() is sentinel
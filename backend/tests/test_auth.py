@@ -0,0 +1,83 @@
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import HTTPException
+from jose import jwk, jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from api import auth
+
+SECRET = "test-secret"
+
+def _rsa_pem():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+
+def _public_jwk(pem, kid):
+    return {**jwk.construct(pem, "RS256").public_key().to_dict(), "kid": kid, "use": "sig"}
+
+@pytest.fixture(autouse=True)
+def fresh_auth(monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "_hmac_key", None)
+    monkeypatch.setattr(auth, "_jwks", None)
+    asyncio.run(auth.token_cache.invalidate())
+
+def test_hs256_tokens_are_verified_once(monkeypatch):
+    token = jwt.encode({"sub": "u1", "exp": int(time.time()) + 60}, SECRET, algorithm="HS256")
+    calls = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **k: calls.append(1) or real_decode(*a, **k))
+
+    async def scenario():
+        for _ in range(3):
+            assert (await auth.verify_token(token))["sub"] == "u1"
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+def test_expired_and_forged_tokens_are_rejected():
+    expired = jwt.encode({"sub": "u1", "exp": int(time.time()) - 5}, SECRET, algorithm="HS256")
+    forged = jwt.encode({"sub": "u1"}, "other-secret", algorithm="HS256")
+    for token in (expired, forged):
+        with pytest.raises(HTTPException) as info:
+            asyncio.run(auth.verify_token(token))
+        assert info.value.status_code == 401
+
+def test_cached_entry_does_not_outlive_exp():
+    exp = int(time.time()) + 5
+    token = jwt.encode({"sub": "u1", "exp": exp}, SECRET, algorithm="HS256")
+    asyncio.run(auth.verify_token(token))
+    [(_, expires_at)] = auth.token_cache._entries.values()
+    assert expires_at <= exp + 0.05
+
+def test_jwks_keys_are_fetched_once_and_rotated(monkeypatch):
+    old_pem, new_pem = _rsa_pem(), _rsa_pem()
+    published = {"keys": [_public_jwk(old_pem, "old")]}
+    fetches = []
+
+    def handler(request):
+        fetches.append(request.url)
+        return httpx.Response(200, json=published)
+
+    monkeypatch.setattr(auth, "JWKS_MIN_REFRESH_INTERVAL", 0)
+    monkeypatch.setattr(auth, "_jwks", auth.JWKSCache("http://auth.local/jwks.json", transport=httpx.MockTransport(handler)))
+    claims = {"sub": "u2", "exp": int(time.time()) + 60}
+
+    async def scenario():
+        first = jwt.encode(claims, old_pem, algorithm="RS256", headers={"kid": "old"})
+        second = jwt.encode({**claims, "n": 1}, old_pem, algorithm="RS256", headers={"kid": "old"})
+        assert (await auth.verify_token(first))["sub"] == "u2"
+        assert (await auth.verify_token(second))["sub"] == "u2"
+        assert len(fetches) == 1
+
+        published["keys"].append(_public_jwk(new_pem, "new"))
+        rotated = jwt.encode(claims, new_pem, algorithm="RS256", headers={"kid": "new"})
+        assert (await auth.verify_token(rotated))["sub"] == "u2"
+        assert len(fetches) == 2
+
+        unknown = jwt.encode(claims, _rsa_pem(), algorithm="RS256", headers={"kid": "nope"})
+        with pytest.raises(HTTPException) as info:
+            await auth.verify_token(unknown)
+        assert info.value.status_code == 401
+    asyncio.run(scenario())
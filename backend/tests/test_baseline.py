@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+from fastapi import HTTPException
+from api import forecasting
+from api.baseline import baseline_forecast, forecast_matrix, series_matrix
+from api.models import ForecastRequest
+from api.resilience import CircuitBreaker, OPEN, HALF_OPEN, CLOSED
+
+OPTIONS = {"forecast_horizon": 3, "feature_groups": [], "target_col": "sales", "date_col": "date", "menu_col": "menu"}
+# Two weeks of a weekly pattern for latte, a flat series for tea
+DATA = [
+    {"date": f"2024-01-{day:02d}", "menu": "latte", "sales": day % 7} for day in range(1, 15)
+] + [{"date": f"2024-01-{day:02d}", "menu": "tea", "sales": 2} for day in range(1, 15)]
+
+def test_series_matrix_fills_missing_days():
+    items, start, matrix = series_matrix(["2024-01-01", "2024-01-03", "2024-01-01"], ["a", "a", "b"], [1, 3, 5])
+    assert list(items) == ["a", "b"] and str(start) == "2024-01-01"
+    assert matrix.tolist() == [[1, 0, 3], [5, 0, 0]]
+
+def test_series_matrix_skips_rows_without_date_or_menu():
+    items, start, matrix = series_matrix([None, "notadate", "2024-01-02", "2024-01-03"], ["a", "a", "a", None], [1, 5, 2, 9])
+    assert list(items) == ["a"] and str(start) == "2024-01-02"
+    assert matrix.tolist() == [[2]]
+
+def test_baseline_forecast_ignores_unusable_rows():
+    records = [{"date": None, "menu": "latte", "sales": 1}, {"date": "2024-01-02", "menu": "latte", "sales": 2}]
+    result = baseline_forecast({**OPTIONS, "model_type": "moving_average"}, records=records)
+    assert [row["predicted"] for row in result["forecast_data"]] == [2.0, 2.0, 2.0]
+
+def test_forecast_without_usable_rows_is_422(client):
+    body = {**OPTIONS, "model_type": "moving_average"}
+    for data in ([{"date": "notadate", "menu": "latte", "sales": 1}], [{"date": "2024-01-02", "menu": None, "sales": 1}]):
+        response = client.post("/api/forecast", json={**body, "data": data})
+        assert response.status_code == 422, response.text
+
+def test_methods():
+    matrix = np.array([[1.0, 2, 3, 4, 5, 6, 7, 1, 2, 3, 4, 5, 6, 7], [2.0] * 14])
+    assert forecast_matrix(matrix, "seasonal_naive", 3)[0].tolist() == [1, 2, 3]
+    assert forecast_matrix(matrix, "moving_average", 2)[1].tolist() == [2, 2]
+    assert np.allclose(forecast_matrix(matrix, "exp_smoothing", 2)[1], 2)
+
+def test_baseline_forecast_output():
+    result = baseline_forecast({**OPTIONS, "model_type": "seasonal_naive"}, records=DATA)
+    latte = [row for row in result["forecast_data"] if row["menu"] == "latte"]
+    assert [row["date"] for row in latte] == ["2024-01-15", "2024-01-16", "2024-01-17"]
+    assert [row["predicted"] for row in latte] == [1, 2, 3]
+    assert len(result["forecast_data"]) == 6
+
+def test_baseline_model_type_and_fallback(monkeypatch):
+    monkeypatch.setattr(forecasting, "FORECAST_CACHE_ENABLED", False)
+    monkeypatch.setattr(forecasting, "FORECAST_FALLBACK_ENABLED", True)
+
+    async def ml_down(ml_url, request):
+        raise HTTPException(status_code=503, detail="unavailable")
+    monkeypatch.setattr(forecasting, "call_forecast_service", ml_down)
+
+    local = asyncio.run(forecasting.run_forecast("http://ml", ForecastRequest(**OPTIONS, model_type="moving_average", data=DATA)))
+    assert local["engine"] == "baseline" and "fallback" not in local
+
+    fallback = asyncio.run(forecasting.run_forecast("http://ml", ForecastRequest(**OPTIONS, model_type="xgboost", data=DATA)))
+    assert fallback["fallback"]["model"] == forecasting.FORECAST_FALLBACK_MODEL
+    assert len(fallback["forecast_data"]) == 6
+
+def test_circuit_breaker_cycle(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert not breaker.allow()
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from api.cache import ResultCache, fingerprint
+
+def test_fingerprint_ignores_key_order():
+    """Requests that differ only in key order share a cache key."""
+    assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+def test_lru_evicts_by_byte_size():
+    """Least recently used entries are evicted once the byte cap is exceeded."""
+    cache = ResultCache("test", ttl=60, max_bytes=30)
+
+    async def scenario():
+        await cache.set("a", "x" * 10)
+        await cache.set("b", "y" * 10)
+        await cache.get("a")
+        await cache.set("c", "z" * 10)
+        return await cache.get("a"), await cache.get("b"), await cache.get("c")
+
+    a, b, c = asyncio.run(scenario())
+    assert a == "x" * 10 and b is None and c == "z" * 10
+    assert cache.snapshot()["evictions"] == 1
+
+def test_entries_expire_after_ttl():
+    """Entries older than their TTL are treated as misses."""
+    cache = ResultCache("test", ttl=0.01, max_bytes=1024)
+
+    async def scenario():
+        await cache.set("k", {"v": 1})
+        time.sleep(0.02)
+        return await cache.get("k")
+
+    assert asyncio.run(scenario()) is None
+    assert cache.snapshot()["expired"] == 1
+
+def test_concurrent_requests_are_coalesced():
+    """Concurrent callers for the same key share a single computation."""
+    cache = ResultCache("test", ttl=60, max_bytes=1024)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"forecast": [1, 2, 3]}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == {"forecast": [1, 2, 3]} for result in results)
+    assert cache.snapshot()["coalesced"] == 4
+
+def test_cancelled_owner_does_not_cancel_waiters():
+    """A caller cancelled mid-computation leaves the shared computation running for the others."""
+    cache = ResultCache("test", ttl=60, max_bytes=1024)
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return {"forecast": [1]}
+
+    async def scenario():
+        owner = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiter, owner.cancelled()
+
+    assert asyncio.run(scenario()) == ({"forecast": [1]}, True)
+    assert cache.snapshot()["entries"] == 1
+
+def test_disk_tier_survives_restart(tmp_path):
+    """A new cache instance pointed at the same directory sees earlier entries."""
+    asyncio.run(ResultCache("test", ttl=60, max_bytes=1024, disk_dir=str(tmp_path)).set("k", [1, 2]))
+    restarted = ResultCache("test", ttl=60, max_bytes=1024, disk_dir=str(tmp_path))
+
+    assert asyncio.run(restarted.get("k")) == [1, 2]
+    assert restarted.snapshot()["disk_hits"] == 1
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import pytest
+from api import services, direct_uploads
+from api.storage import S3_MIN_PART_SIZE
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+requests = pytest.importorskip("requests")
+
+ROW = b"2024-01-01,latte,3\n"
+# Just over one minimum-size part, so the file needs two parts
+CSV = b"date,menu,sales\n" + ROW * (S3_MIN_PART_SIZE // len(ROW) + 100)
+BODY = {"filename": "sales.csv", "size": len(CSV), "content_type": "text/csv", "location_id": "1", "date_col": "date", "menu_col": "menu", "target_col": "sales"}
+
+@pytest.fixture
+def backend(client, fake_db, monkeypatch):
+    """Client, fake_db and a moto S3 bucket. Jobs are recorded, not run; tests run them directly."""
+    from api.jobs import get_job_queue
+
+    async def record(kind, payload, upload_id=None, user_id=None):
+        return f"job-{upload_id}"
+    monkeypatch.setattr(get_job_queue(), "submit", record)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    with moto.mock_s3():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=services.S3_BUCKET)
+        monkeypatch.setattr(services, "s3_client", s3)
+        monkeypatch.setattr(direct_uploads, "DIRECT_UPLOAD_PART_SIZE", S3_MIN_PART_SIZE)
+        yield client, fake_db, s3
+
+def _put_parts(parts, numbers=None):
+    for part in parts:
+        if numbers is None or part["part_number"] in numbers:
+            start = (part["part_number"] - 1) * S3_MIN_PART_SIZE
+            assert requests.put(part["url"], data=CSV[start:start + S3_MIN_PART_SIZE]).status_code == 200
+
+def test_direct_upload_resume_and_complete(backend):
+    client, fake_db, s3 = backend
+    started = client.post("/api/uploads", json=BODY).json()
+    assert started["part_count"] == 2 and started["key"].startswith("raw/store/")
+    _put_parts(started["parts"], numbers={1})
+
+    resumed = client.get(f"/api/uploads/{started['upload_id']}").json()
+    assert [part["part_number"] for part in resumed["uploaded_parts"]] == [1]
+    assert [part["part_number"] for part in resumed["parts"]] == [2]
+    _put_parts(resumed["parts"])
+
+    done = client.post(f"/api/uploads/{started['upload_id']}/complete").json()
+    assert done["status"] == "queued" and done["job_id"]
+    assert s3.head_object(Bucket=services.S3_BUCKET, Key=started["key"])["ContentLength"] == len(CSV)
+    # Completing again returns the same file and job
+    assert client.post(f"/api/uploads/{started['upload_id']}/complete").json() == done
+
+def test_complete_with_missing_parts_is_rejected(backend):
+    client, fake_db, _ = backend
+    started = client.post("/api/uploads", json=BODY).json()
+    _put_parts(started["parts"], numbers={2})
+    response = client.post(f"/api/uploads/{started['upload_id']}/complete")
+    assert response.status_code == 409
+    assert fake_db.tables.get("file_upload_tracker", []) == []
+
+def test_direct_upload_job_validates_from_s3(backend, monkeypatch):
+    client, fake_db, s3 = backend
+    started = client.post("/api/uploads", json=BODY).json()
+    _put_parts(started["parts"])
+    done = client.post(f"/api/uploads/{started['upload_id']}/complete").json()
+    forwarded = []
+
+    async def fake_ml_job(job_id, payload):
+        forwarded.append(payload)
+    monkeypatch.setattr(direct_uploads, "process_upload_job", fake_ml_job)
+    payload = {"file_path": done["s3_url"], "key": started["key"], "filename": started["key"].split("/")[-1], "date_col": "date", "menu_col": "menu", "target_col": "sales", "file_id": done["file_id"], "location_id": "1", "timestamp": "20240101_000000"}
+    asyncio.run(direct_uploads.process_direct_upload_job("job-1", payload))
+
+    row = fake_db.tables["file_upload_tracker"][0]
+    assert row["row_count"] == CSV.count(b"\n") - 1 and len(row["content_hash"]) == 64
+    assert forwarded[0]["clean_path"].startswith(f"s3://{services.S3_BUCKET}/clean/store/")
+
+def test_concurrent_completes_share_one_response(backend):
+    client, fake_db, _ = backend
+    started = client.post("/api/uploads", json=BODY).json()
+    _put_parts(started["parts"])
+
+    async def both():
+        return await asyncio.gather(*(direct_uploads.complete_upload(started["upload_id"]) for _ in range(2)))
+    first, second = asyncio.run(both())
+    assert first == second and first["status"] == "queued"
+    assert len(fake_db.tables["file_upload_tracker"]) == 1
+
+def test_complete_held_by_another_request_is_409(backend, monkeypatch):
+    client, _, _ = backend
+    started = client.post("/api/uploads", json=BODY).json()
+    _put_parts(started["parts"])
+    monkeypatch.setattr(direct_uploads, "DIRECT_UPLOAD_COMPLETE_WAIT", 0.3)
+    assert direct_uploads._claim_completion(started["upload_id"])
+    assert client.post(f"/api/uploads/{started['upload_id']}/complete").status_code == 409
+    direct_uploads._release_completion(started["upload_id"])
+    assert client.post(f"/api/uploads/{started['upload_id']}/complete").json()["status"] == "queued"
+
+def test_direct_upload_job_skips_content_already_uploaded(backend, monkeypatch):
+    client, fake_db, _ = backend
+    started = client.post("/api/uploads", json=BODY).json()
+    _put_parts(started["parts"])
+    done = client.post(f"/api/uploads/{started['upload_id']}/complete").json()
+    original = {"location_id": "1", "content_hash": hashlib.sha256(CSV).hexdigest(), "status": "completed", "upload_time": "20230101_000000", "ml_result": {"job_id": "job-0"}}
+    fake_db.tables["file_upload_tracker"].append({"id": "original", **original})
+
+    async def fake_ml_job(job_id, payload):
+        raise AssertionError("duplicate content must not reach the ML service")
+    monkeypatch.setattr(direct_uploads, "process_upload_job", fake_ml_job)
+    payload = {"key": started["key"], "filename": started["key"].split("/")[-1], "date_col": "date", "menu_col": "menu", "target_col": "sales", "file_id": done["file_id"], "location_id": "1", "timestamp": "20240101_000000"}
+    asyncio.run(direct_uploads.process_direct_upload_job("job-1", payload))
+
+    row = next(row for row in fake_db.tables["file_upload_tracker"] if row["id"] == done["file_id"])
+    assert row["status"] == "duplicate" and row["ml_result"] == {"job_id": "job-0"}
+    assert "content_hash" not in row
+
+def test_direct_upload_job_waits_for_the_ingest_lock(backend, monkeypatch):
+    from api import db
+    monkeypatch.setattr(db, "INGEST_LOCK_POLL_INTERVAL", 0.05)
+    assert db.claim_location_ingest("1")
+
+    async def scenario():
+        waiter = asyncio.create_task(db.wait_location_ingest("1", timeout=5))
+        await asyncio.sleep(0.2)
+        assert not waiter.done()
+        db.release_location_ingest("1")
+        return await waiter
+    assert asyncio.run(scenario())
+    assert not asyncio.run(db.wait_location_ingest("1", timeout=0.1))
+    db.release_location_ingest("1")
+
+def test_failed_job_marks_the_upload_failed(backend):
+    from api.endpoints import fail_upload_job
+    _, fake_db, _ = backend
+    fake_db.tables["file_upload_tracker"] = [
+        {"id": "queued-file", "status": "queued"},
+        {"id": "invalid-file", "status": "upload_failed", "error": "Missing column"}
+    ]
+    asyncio.run(fail_upload_job("job-1", {"file_id": "queued-file"}, RuntimeError("boom")))
+    asyncio.run(fail_upload_job("job-2", {"file_id": "invalid-file"}, RuntimeError("boom")))
+    rows = {row["id"]: row for row in fake_db.tables["file_upload_tracker"]}
+    assert rows["queued-file"] == {"id": "queued-file", "status": "processing_failed", "error": "boom"}
+    assert rows["invalid-file"]["error"] == "Missing column"
+
+def test_forced_direct_upload_without_new_rows_is_processed(backend, monkeypatch):
+    client, fake_db, s3 = backend
+    from api import db
+    fake_db.tables["locations"][0]["name"] = "north/store"
+    asyncio.run(db.invalidate_location("1"))
+    started = client.post("/api/uploads", json={**BODY, "force_reprocess": True}).json()
+    assert started["key"].startswith("raw/north/store/")
+    _put_parts(started["parts"])
+    done = client.post(f"/api/uploads/{started['upload_id']}/complete").json()
+    forwarded = []
+
+    async def fake_ml_job(job_id, payload):
+        forwarded.append(payload)
+    monkeypatch.setattr(direct_uploads, "process_upload_job", fake_ml_job)
+    payload = {"key": started["key"], "filename": started["key"].split("/")[-1], "date_col": "date", "menu_col": "menu", "target_col": "sales", "file_id": done["file_id"], "location_id": "1", "location_name": "north/store", "timestamp": "20240101_000000", "force_reprocess": True}
+    asyncio.run(direct_uploads.process_direct_upload_job("job-1", payload))
+    assert forwarded[0]["clean_path"].startswith(f"s3://{services.S3_BUCKET}/clean/north/store/")
+
+    # Same rows again: nothing new, but forced, so the ML job still runs (as with /api/upload)
+    asyncio.run(direct_uploads.process_direct_upload_job("job-2", {**payload, "file_id": "again"}))
+    assert len(forwarded) == 2 and forwarded[1]["clean_path"] is None
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from api import db
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.tables.update({
+        "file_upload_tracker": [{"id": "a", "filename": "a.csv"}, {"id": "b", "filename": "b.csv"}],
+        "forecast_results": [{"id": "r1", "file_id": "a", "job_id": "j1"}, {"id": "r2", "file_id": "a", "job_id": "j2"}]
+    })
+    yield fake_db
+    db.location_cache._entries.clear()
+
+def test_file_details_use_one_query(client, fake_db):
+    response = client.get("/api/files/a")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["file"]["filename"] == "a.csv"
+    assert [r["job_id"] for r in body["results"]] == ["j1", "j2"]
+    assert fake_db.queries == 1
+    assert client.get("/api/files/zzz").status_code == 404
+
+def test_bulk_details(client, fake_db):
+    response = client.post("/api/files/details", json={"file_ids": ["b", "a", "zzz"]})
+    body = response.json()
+    assert [entry["file"]["id"] for entry in body["files"]] == ["b", "a"]
+    assert body["files"][0]["results"] == []
+    assert body["missing"] == ["zzz"]
+    assert fake_db.queries == 1
+
+def test_location_names_are_cached_until_invalidated(fake_db):
+    async def scenario():
+        assert await db.get_location_name("1") == "store"
+        assert await db.get_location_name("1") == "store"
+        assert fake_db.queries == 1
+        await db.update_location("1", {"name": "flagship"})
+        assert await db.get_location_name("1") == "flagship"
+        assert await db.get_location_name("missing") is None
+    asyncio.run(scenario())
+
+def test_location_cache_flush_requires_auth(client):
+    from api.auth import get_current_user
+    override = client.app.dependency_overrides.pop(get_current_user)
+    try:
+        assert client.delete("/api/locations/cache").status_code == 403
+    finally:
+        client.app.dependency_overrides[get_current_user] = override
@@ -0,0 +1,52 @@
+import pytest
+from api import db
+
+def _rows(count):
+    return [
+        {"id": f"{i:08d}", "filename": f"f{i}.csv", "upload_time": f"2024-01-{i % 3 + 1:02d}T00:00:00",
+         "status": "completed", "location_id": "1", "ml_result": {"big": True}}
+        for i in range(count)
+    ]
+
+@pytest.fixture
+def fake_db(fake_db):
+    fake_db.tables["file_upload_tracker"] = _rows(7)
+    yield fake_db
+    db.file_list_cache._entries.clear()
+
+def test_cursor_round_trip():
+    file_id = "0b6f7d8e-2a44-4c43-9a53-3f0f2c1d5e6a"
+    cursor = db.encode_cursor({"upload_time": "2024-01-01T00:00:00", "id": file_id})
+    assert db.decode_cursor(cursor) == ("2024-01-01T00:00:00", file_id)
+    with pytest.raises(ValueError):
+        db.decode_cursor("not-a-cursor")
+
+def test_cursor_rejects_filter_syntax(client):
+    """Cursor values end up in a raw PostgREST filter, so only timestamps and ids get through."""
+    for row in ({"upload_time": '2024-01-01",id.gt."0', "id": "1"}, {"upload_time": "2024-01-01T00:00:00", "id": "1),or(id.gt.0"}):
+        with pytest.raises(ValueError):
+            db.decode_cursor(db.encode_cursor(row))
+        assert client.get("/api/files", params={"cursor": db.encode_cursor(row)}).status_code == 400
+
+def test_pages_cover_every_file_once(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/files", params=params).json()
+        seen += [row["id"] for row in body["files"]]
+        assert body["count"] == len(body["files"]) and "total" not in body
+        assert all("ml_result" not in row for row in body["files"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(row["id"] for row in _rows(7))
+    assert len(seen) == len(set(seen))
+
+def test_unchanged_listing_returns_304(client):
+    first = client.get("/api/files")
+    etag = first.headers["etag"]
+    again = client.get("/api/files", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get("/api/files", params={"cursor": "???"}).status_code == 400
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from api import forecasting
+from api.models import BatchForecastItem
+
+OPTIONS = {"model_type": "xgboost", "forecast_horizon": 7, "feature_groups": [], "target_col": "sales", "date_col": "date", "menu_col": "menu"}
+
+def _item(location_id, sales=1):
+    return {**OPTIONS, "location_id": location_id, "data": [{"date": "2024-01-01", "menu": "latte", "sales": sales}]}
+
+@pytest.fixture
+def fake_ml(monkeypatch):
+    state = {"running": 0, "peak": 0}
+
+    async def call(ml_url, request):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            sales = request.data[0]["sales"]
+            await asyncio.sleep(0.01 * sales)
+            if sales < 0:
+                raise HTTPException(status_code=502, detail="ML service down")
+            return {"forecast": [sales]}
+        finally:
+            state["running"] -= 1
+
+    monkeypatch.setattr(forecasting, "call_forecast_service", call)
+    monkeypatch.setattr(forecasting, "FORECAST_CACHE_ENABLED", False)
+    monkeypatch.setattr(forecasting, "FORECAST_FALLBACK_ENABLED", False)
+    return state
+
+def test_batch_is_concurrent_bounded_and_isolates_failures(fake_ml):
+    items = [BatchForecastItem(**_item(str(i), sales)) for i, sales in enumerate([5, 1, -1, 2, 3, 4])]
+
+    async def collect():
+        return [event async for event in forecasting.run_forecast_batch("http://ml", items, concurrency=3)]
+    events = asyncio.run(collect())
+
+    assert fake_ml["peak"] == 3
+    assert sorted(event["location_id"] for event in events) == [str(i) for i in range(6)]
+    failed = [event for event in events if event["status"] == "error"]
+    assert len(failed) == 1 and failed[0]["status_code"] == 502 and failed[0]["location_id"] == "2"
+    # Results arrive as they finish, not in request order
+    assert events[0]["location_id"] != "0"
+
+def test_batch_endpoint_streams_ndjson_and_sse(client, fake_ml):
+    body = {"items": [_item("a", 2), _item("b", -1)]}
+
+    lines = [json.loads(line) for line in client.post("/api/forecast/batch", json=body).text.splitlines()]
+    assert {line.get("location_id"): line["status"] for line in lines[:-1]} == {"a": "ok", "b": "error"}
+    assert lines[-1] == {"status": "done", "ok": 1, "error": 1}
+
+    response = client.post("/api/forecast/batch", json=body, headers={"Accept": "text/event-stream"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.count("event: result") == 2 and "event: done" in response.text
@@ -0,0 +1,12 @@
+import asyncio
+from api import http_client
+
+def test_ml_client_is_shared():
+    """The same pooled client is reused until it is closed."""
+    first = http_client.get_ml_client()
+    assert http_client.get_ml_client() is first
+
+    asyncio.run(http_client.close_ml_client())
+    assert first.is_closed
+    assert http_client.get_ml_client() is not first
+    asyncio.run(http_client.close_ml_client())
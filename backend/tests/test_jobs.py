@@ -0,0 +1,97 @@
+import asyncio
+import httpx
+import pytest
+from api import jobs
+from api.jobs import JobQueue, MemoryJobStore, PermanentJobError
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RETRY_BASE_DELAY", 0.0)
+
+def _run(queue: JobQueue, kind: str, payload: dict) -> dict:
+    async def scenario():
+        job_id = await queue.submit(kind, payload, upload_id="file-1")
+        for _ in range(100):
+            job = await queue.store.get(job_id)
+            if job["status"] in (jobs.COMPLETED, jobs.FAILED):
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return job
+    return asyncio.run(scenario())
+
+def test_job_completes():
+    """A successful handler moves the job to completed."""
+    queue = JobQueue(MemoryJobStore(), workers=2)
+    seen = []
+
+    async def handler(job_id, payload):
+        seen.append(payload["value"])
+
+    queue.register("echo", handler)
+    job = _run(queue, "echo", {"value": 42})
+    assert job["status"] == jobs.COMPLETED
+    assert job["attempts"] == 1
+    assert job["upload_id"] == "file-1"
+    assert seen == [42]
+
+def test_job_retries_transient_errors():
+    """Transport errors are retried until the handler succeeds."""
+    queue = JobQueue(MemoryJobStore(), max_attempts=3)
+    calls = []
+
+    async def handler(job_id, payload):
+        calls.append(job_id)
+        if len(calls) < 3:
+            raise httpx.ConnectError("ML service down")
+
+    queue.register("flaky", handler)
+    job = _run(queue, "flaky", {})
+    assert job["status"] == jobs.COMPLETED
+    assert job["attempts"] == 3
+
+def test_job_does_not_retry_permanent_errors():
+    """Permanent errors fail the job on the first attempt."""
+    queue = JobQueue(MemoryJobStore(), max_attempts=3)
+
+    async def handler(job_id, payload):
+        raise PermanentJobError("bad columns")
+
+    queue.register("broken", handler)
+    job = _run(queue, "broken", {})
+    assert job["status"] == jobs.FAILED
+    assert job["attempts"] == 1
+    assert job["error"] == "bad columns"
+
+def test_failure_handler_runs_once_jobs_fail_for_good():
+    """on_failure sees the payload and last error after the final attempt, never on retries."""
+    queue = JobQueue(MemoryJobStore(), max_attempts=2)
+    failures = []
+
+    async def handler(job_id, payload):
+        raise httpx.ConnectError("ML service down")
+
+    async def on_failure(job_id, payload, error):
+        failures.append((payload["file_id"], str(error)))
+
+    queue.register("doomed", handler, on_failure=on_failure)
+
+    async def scenario():
+        job_id = await queue.submit("doomed", {"file_id": "file-1"})
+        for _ in range(100):
+            if failures:
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return await queue.store.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == jobs.FAILED
+    assert job["attempts"] == 2
+    assert failures == [("file-1", "ML service down")]
+
+def test_submit_unknown_kind():
+    """Submitting a job without a registered handler is rejected."""
+    queue = JobQueue(MemoryJobStore())
+    with pytest.raises(ValueError):
+        asyncio.run(queue.submit("missing", {}))
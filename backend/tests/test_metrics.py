@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+from api import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "test", ("op",), buckets=(0.1, 1.0))
+    try:
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, op="x")
+        text = "\n".join(histogram.render())
+    finally:
+        metrics.REGISTRY.remove(histogram)
+    assert 'test_latency_seconds_bucket{op="x",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{op="x",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{op="x",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{op="x"} 3' in text
+
+def test_upload_stages_and_routes_are_exported(client, fake_s3):
+    before = metrics.span_duration.count(span="upload.s3_put")
+    response = client.post(
+        "/api/upload",
+        files={"file": ("sales.csv", b"date,menu,sales\n2024-01-01,latte,3\n", "text/csv")},
+        data={"date_col": "date", "menu_col": "menu", "target_col": "sales", "location_id": "1"}
+    )
+    assert response.status_code == 200
+    assert metrics.span_duration.count(span="upload.s3_put") == before + 1
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'kivo_http_requests_total{method="POST",route="/api/upload",status="200"}' in response.text
+    assert 'kivo_span_duration_seconds_count{span="upload.location_lookup"}' in response.text
+    assert "kivo_upload_bytes_total" in response.text
+
+def test_server_timing_header():
+    from main import app
+    wrapped = metrics.MetricsMiddleware(app, server_timing_header=True)
+    response = TestClient(wrapped).get("/api/health")
+    assert "app;dur=" in response.headers["server-timing"]
+
+def test_malformed_content_length_does_not_replace_the_response():
+    import asyncio
+    from fastapi.responses import PlainTextResponse
+    wrapped = metrics.MetricsMiddleware(PlainTextResponse("ok"))
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"content-length", b"abc")]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+    asyncio.run(wrapped(scope, receive, send))
+    assert sent[0]["status"] == 200
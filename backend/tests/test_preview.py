@@ -0,0 +1,81 @@
+import io
+import pytest
+from api import preview
+from api.preview import preview_file, PreviewError
+
+def _csv(rows: int) -> bytes:
+    lines = ["Date,Menu Item,Store ID,Qty Sold"]
+    lines += [f"2024-01-{i % 28 + 1:02d},item_{i % 7},{100 + i % 3},{i % 40}" for i in range(rows)]
+    return ("\n".join(lines) + "\n").encode()
+
+def test_small_csv_preview_is_exact():
+    """A file that fits in the sample reports its exact row count."""
+    result = preview_file(io.BytesIO(_csv(4)), "sales.csv")
+    assert result["columns"] == ["Date", "Menu Item", "Store ID", "Qty Sold"]
+    assert len(result["preview"]) == 3
+    assert result["total_rows"] == 4
+    assert result["total_rows_estimated"] is False
+
+def test_large_csv_row_count_is_estimated(monkeypatch):
+    """Only the leading sample is read; the row count is extrapolated from byte offsets."""
+    monkeypatch.setattr(preview, "PREVIEW_SAMPLE_BYTES", 4096)
+    result = preview_file(io.BytesIO(_csv(50_000)), "sales.csv")
+    assert result["total_rows_estimated"] is True
+    assert abs(result["total_rows"] - 50_000) / 50_000 < 0.05
+
+def test_header_longer_than_sample_is_read_to_its_end(monkeypatch):
+    """A first line wider than the sample window extends the sample instead of parsing nothing."""
+    monkeypatch.setattr(preview, "PREVIEW_SAMPLE_BYTES", 64)
+    header = ",".join(f"column_{i}" for i in range(30))
+    data = (header + "\n" + "\n".join(",".join(str(i) for i in range(30)) for _ in range(20)) + "\n").encode()
+    result = preview_file(io.BytesIO(data), "wide.csv")
+    assert len(result["columns"]) == 30
+
+def test_unreadable_csv_raises_preview_error(monkeypatch):
+    with pytest.raises(PreviewError):
+        preview_file(io.BytesIO(b""), "empty.csv")
+    monkeypatch.setattr(preview, "PREVIEW_MAX_LINE_BYTES", 128)
+    monkeypatch.setattr(preview, "PREVIEW_SAMPLE_BYTES", 64)
+    with pytest.raises(PreviewError):
+        preview_file(io.BytesIO(b"x" * 1000 + b"\n1\n"), "no_lines.csv")
+
+def test_column_types_and_suggestions():
+    result = preview_file(io.BytesIO(_csv(100)), "sales.csv")
+    assert result["column_types"] == {"Date": "date", "Menu Item": "string", "Store ID": "integer", "Qty Sold": "integer"}
+    assert result["suggestions"]["date_col"][0] == "Date"
+    assert result["suggestions"]["menu_col"][0] == "Menu Item"
+    # ID-like numeric columns are not offered as the target
+    assert result["suggestions"]["target_col"] == ["Qty Sold"]
+
+def test_xlsx_preview_streams_rows():
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["date", "menu", "sales"])
+    for i in range(500):
+        sheet.append([f"2024-02-{i % 28 + 1:02d}", f"item_{i % 5}", i])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    result = preview_file(buffer, "sales.xlsx")
+    assert result["columns"] == ["date", "menu", "sales"]
+    assert result["total_rows"] == 500
+    assert result["suggestions"]["target_col"] == ["sales"]
+
+def test_xlsx_duplicate_headers_are_renamed():
+    from openpyxl import Workbook
+    workbook = Workbook()
+    workbook.active.append(["date", "sales", "sales"])
+    workbook.active.append(["2024-02-01", 3, 4])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    result = preview_file(buffer, "sales.xlsx")
+    assert result["columns"] == ["date", "sales", "sales.1"]
+    assert result["column_types"]["sales.1"] == "integer"
+
+def test_corrupt_xlsx_is_422(client):
+    response = client.post("/api/preview", files={"file": ("sales.xlsx", b"not a workbook", "application/octet-stream")})
+    assert response.status_code == 422
+    assert "Could not read workbook" in response.json()["detail"]
@@ -0,0 +1,74 @@
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import HTTPException
+from api import forecasting, http_client, resilience
+from api.models import ForecastRequest
+from benchmarks.stub_ml import StubML
+
+REQUEST = ForecastRequest(
+    model_type="xgboost", forecast_horizon=7, feature_groups=[], target_col="sales", date_col="date", menu_col="menu",
+    data=[{"date": "2024-01-01", "menu": "latte", "sales": 3}]
+)
+
+@pytest.fixture
+def use_stub(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(forecasting, "FORECAST_CACHE_ENABLED", False)
+    monkeypatch.setattr(forecasting, "FORECAST_FALLBACK_ENABLED", False)
+
+    def install(stub: StubML) -> StubML:
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.ASGITransport(app=stub.app)))
+        return stub
+    return install
+
+def _forecast():
+    return asyncio.run(forecasting.call_forecast_service("http://ml", REQUEST))
+
+def test_idempotent_calls_are_retried(use_stub):
+    stub = use_stub(StubML(fail_first=2))
+    assert _forecast()["job_id"] == "stub"
+    assert stub.calls == 3
+
+def test_non_idempotent_calls_are_not_retried(use_stub):
+    stub = use_stub(StubML(fail_first=1))
+    client = http_client.get_ml_client()
+    with pytest.raises(HTTPException) as info:
+        asyncio.run(resilience.resilient_call(
+            "ml_service", lambda timeout: client.post("http://ml/api/v1/upload", json={}, timeout=timeout), timeout=5
+        ))
+    assert info.value.status_code == 503 and stub.calls == 1
+
+def test_breaker_fails_fast_and_is_reported(client, use_stub, monkeypatch):
+    monkeypatch.setattr(resilience, "BREAKER_FAILURE_THRESHOLD", 3)
+    stub = use_stub(StubML(error_rate=1.0))
+    with pytest.raises(HTTPException):
+        _forecast()
+    assert stub.calls == 3
+    with pytest.raises(HTTPException) as info:
+        _forecast()
+    assert info.value.status_code == 503 and "Retry-After" in info.value.headers
+    assert stub.calls == 3
+
+    health = client.get("/api/services/health").json()
+    assert health["circuit_breakers"]["ml_service"]["state"] == "open"
+
+def test_inbound_budget_caps_ml_deadline(client, use_stub):
+    use_stub(StubML(latency=2.0))
+    start = time.monotonic()
+    response = client.post("/api/forecast", json=REQUEST.dict(), headers={"X-Request-Timeout-Ms": "300"})
+    assert response.status_code == 504
+    assert time.monotonic() - start < 1.5
+
+def test_hedged_request_beats_slow_first_attempt(use_stub):
+    stub = use_stub(StubML(slow_first=1, slow_latency=2.0))
+    client = http_client.get_ml_client()
+    start = time.monotonic()
+    response = asyncio.run(resilience.resilient_call(
+        "ml_service", lambda timeout: client.post("http://ml/forecast", json={}, timeout=timeout),
+        timeout=5, idempotent=True, hedge_delay=0.05
+    ))
+    assert response.status_code == 200
+    assert time.monotonic() - start < 1.0 and stub.calls == 2
@@ -0,0 +1,100 @@
+import asyncio
+import gzip
+import json
+import pytest
+from api import results, services
+
+SERIES = [{"date": f"2024-01-{day:02d}", "menu": menu, "predicted": day} for menu in ("latte", "mocha", "tea") for day in range(1, 11)]
+ML_RESULT = {"forecast_data": SERIES, "metrics": {"mae": 1.0}}
+
+@pytest.fixture
+def fake_db(fake_db, monkeypatch):
+    monkeypatch.setattr(results, "RESULT_CHUNK_ROWS", 10)
+    monkeypatch.setattr(results, "RESULT_STORE", "supabase")
+    return fake_db
+
+@pytest.fixture
+def blob_store(fake_db, fake_s3, monkeypatch):
+    monkeypatch.setattr(results, "RESULT_STORE", "s3")
+    monkeypatch.setattr(results, "blob_cache", results.ResultCache("test_blobs", ttl=60, max_bytes=1024 * 1024))
+    return fake_db, fake_s3
+
+def _rows(job_id, summary, **kwargs):
+    async def collect():
+        return [row async for batch in results.iter_rows(job_id, summary, **kwargs) for row in batch]
+    return asyncio.run(collect())
+
+def test_split_result_keeps_summary_small():
+    summary, chunks = results.split_result(ML_RESULT, chunk_rows=12)
+    assert "forecast_data" not in summary and summary["metrics"] == {"mae": 1.0}
+    assert summary["series"]["row_count"] == 30 and summary["series"]["chunks"] == 3
+    assert [c["row_count"] for c in chunks] == [12, 12, 6]
+    assert chunks[0]["menus"] == ["latte", "mocha"]
+
+def test_stored_rows_support_ranges_and_menu_pruning(fake_db):
+    summary = asyncio.run(results.store_result("job-1", "file-1", ML_RESULT, {"status": "completed"}))
+    assert len(fake_db.tables["forecast_result_chunks"]) == 3
+    assert _rows("job-1", summary) == SERIES
+    assert _rows("job-1", summary, start=8, stop=12) == SERIES[8:12]
+
+    queries = fake_db.queries
+    mocha = _rows("job-1", summary, menus=["mocha"])
+    assert mocha == [row for row in SERIES if row["menu"] == "mocha"]
+    # Metadata lookup plus the single chunk holding mocha
+    assert fake_db.queries - queries == 2
+
+def test_legacy_inline_results_still_stream(fake_db):
+    assert _rows("old", ML_RESULT, start=25) == SERIES[25:]
+
+def test_result_is_stored_once_as_a_blob(blob_store):
+    fake_db, fake_s3 = blob_store
+    big = {"feature_importance": {f"f{i}": i for i in range(500)}}
+    summary = asyncio.run(results.store_result("job-1", "file-1", {**ML_RESULT, **big}, {"status": "completed"}))
+    assert "forecast_result_chunks" not in fake_db.tables
+    assert list(fake_s3.bodies) == [f"{services.S3_BUCKET}/{summary['storage']['key']}"]
+    row = fake_db.tables["forecast_results"][0]["results"]
+    assert row["metrics"] == {"mae": 1.0} and row["omitted"] == ["feature_importance"] and row["series"]["row_count"] == 30
+    assert row["storage"]["size"] < row["storage"]["raw_size"]
+
+    assert _rows("job-1", summary, start=8, stop=12) == SERIES[8:12]
+    assert _rows("job-1", summary, menus=["tea"]) == SERIES[20:]
+    full = asyncio.run(results.full_result("job-1", summary))
+    assert full == {**ML_RESULT, **big}
+    # Fetched and decompressed once, then served from the cache
+    assert results.blob_cache.stats["misses"] == 1
+
+def test_rows_endpoint_streams_compressed_ndjson(blob_store, client):
+    asyncio.run(results.store_result("job-1", "file-1", ML_RESULT, {"status": "completed"}))
+    response = client.get(
+        "/api/results/job-1/rows", params={"menu": ["tea"], "stop": 25}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["summary"]["metrics"] == {"mae": 1.0}
+    assert lines[1:] == SERIES[20:25]
+
+def test_compress_stream_gzip_round_trip():
+    async def pieces():
+        for piece in (b"a\n", b"b\n"):
+            yield piece
+
+    async def collect():
+        return b"".join([chunk async for chunk in results.compress_stream(pieces(), "gzip")])
+    assert gzip.decompress(asyncio.run(collect())) == b"a\nb\n"
+
+def test_migration_moves_chunked_results_to_blobs(blob_store, monkeypatch):
+    fake_db, fake_s3 = blob_store
+    from api import migrate_results
+    monkeypatch.setattr(results, "RESULT_STORE", "supabase")
+    old = asyncio.run(results.store_result("job-1", "file-1", ML_RESULT, {"status": "completed"}))
+    fake_db.tables["file_upload_tracker"] = [{"id": "file-1", "ml_result": old}]
+    monkeypatch.setattr(results, "RESULT_STORE", "s3")
+
+    report = asyncio.run(migrate_results.migrate(batch=1))
+    assert (report["migrated"], report["failed"]) == (1, 0)
+    assert fake_db.tables["forecast_result_chunks"] == []
+    summary = fake_db.tables["forecast_results"][0]["results"]
+    assert asyncio.run(results.full_result("job-1", summary)) == ML_RESULT
+    assert fake_db.tables["file_upload_tracker"][0]["ml_result"] == {"job_id": "job-1", "metrics": {"mae": 1.0}, "row_count": 30}
+    # Re-running finds nothing left to move
+    assert asyncio.run(migrate_results.migrate())["skipped"] == 1
@@ -0,0 +1,79 @@
+import asyncio
+import time
+import pytest
+from api import cache, db, jobs, shared_state
+from api.cache import ResultCache
+from api.jobs import JobQueue, SharedJobStore
+from api.shared_state import MemoryTier, RedisTier, SQLiteTier
+from benchmarks.fakes import FakeRedis
+
+@pytest.fixture(params=["sqlite", "redis"])
+def tiers(request, tmp_path):
+    """A factory of tiers that all see the same state, as separate workers would."""
+    if request.param == "sqlite":
+        path = str(tmp_path / "state.sqlite3")
+        return lambda namespace: SQLiteTier(namespace, path)
+    client = FakeRedis()
+    return lambda namespace: RedisTier(namespace, client)
+
+def test_tier_set_get_add_and_expiry(tiers):
+    first, second = tiers("ns"), tiers("ns")
+    first.set("a", b"1", time.time() + 60)
+    assert second.get("a")[0] == b"1"
+    assert not second.add("a", b"2", time.time() + 60)
+    first.set("gone", b"x", time.time() - 1)
+    assert second.get("gone") is None and second.add("gone", b"y", None)
+    assert dict(second.items()) == {"a": b"1", "gone": b"y"}
+    assert tiers("other").get("a") is None
+    first.clear()
+    assert second.get("a") is None
+
+def test_result_cache_is_shared_between_workers(tiers, monkeypatch):
+    monkeypatch.setattr(cache, "SHARED_STATE_LOCAL_TTL", 0.0)
+    one = ResultCache("forecast", ttl=60, max_bytes=1024, shared=tiers("forecast"))
+    two = ResultCache("forecast", ttl=60, max_bytes=1024, shared=tiers("forecast"))
+
+    async def scenario():
+        await one.set("k", {"v": 1})
+        assert await two.get("k") == {"v": 1}
+        await one.invalidate("k")
+        return await two.get("k")
+
+    assert asyncio.run(scenario()) is None
+    assert two.snapshot()["shared_hits"] == 1
+
+def test_recovered_job_runs_once_across_workers(tiers):
+    """Two workers recovering the same pending job run it exactly once."""
+    runs = []
+
+    async def handler(job_id, payload):
+        runs.append(job_id)
+
+    async def scenario():
+        queues = [JobQueue(SharedJobStore(tiers("jobs"), tiers("job_claims")), workers=2) for _ in range(2)]
+        job = await queues[0].store.create({"config": {"kind": "echo", "payload": {}}, "status": jobs.QUEUED, "attempts": 0})
+        for queue in queues:
+            queue.register("echo", handler)
+            await queue.start()
+        for queue in queues:
+            await queue.join()
+            await queue.stop()
+        return await queues[1].store.get(job["id"])
+
+    job = asyncio.run(scenario())
+    assert runs == [job["id"]]
+    assert job["status"] == jobs.COMPLETED and job["attempts"] == 1
+
+def test_concurrent_identical_upload_is_rejected(client, fake_s3, monkeypatch):
+    monkeypatch.setitem(shared_state._tiers, "upload_claims", MemoryTier("upload_claims"))
+    data = b"date,menu,sales\n2024-01-01,latte,3\n"
+    form = {"date_col": "date", "menu_col": "menu", "target_col": "sales", "location_id": "1"}
+    upload = lambda: client.post("/api/upload", files={"file": ("s.csv", data, "text/csv")}, data=form)
+
+    import hashlib
+    assert db.claim_upload("1", hashlib.sha256(data).hexdigest())
+    assert upload().status_code == 409
+    db.release_upload("1", hashlib.sha256(data).hexdigest())
+    assert upload().status_code == 200
+    # The claim is released once the upload is recorded
+    assert db.claim_upload("1", hashlib.sha256(data).hexdigest())
@@ -0,0 +1,60 @@
+import asyncio
+import hashlib
+import io
+import pytest
+from fastapi import UploadFile
+from api.storage import stream_upload, S3_MIN_PART_SIZE
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+BUCKET = "test-bucket"
+
+@pytest.fixture
+def s3():
+    with moto.mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+def _upload_file(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="sales.csv")
+
+def test_stream_upload_small_file_uses_single_put(s3):
+    """Files smaller than one chunk are written with a single put_object."""
+    data = b"date,menu,sales\n2024-01-01,latte,3\n"
+    stored = asyncio.run(stream_upload(s3, _upload_file(data), BUCKET, "raw/store/small.csv"))
+
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert stored.url == f"s3://{BUCKET}/raw/store/small.csv"
+    assert s3.get_object(Bucket=BUCKET, Key="raw/store/small.csv")["Body"].read() == data
+
+def test_stream_upload_large_file_uses_multipart(s3):
+    """Larger files are split into parts and reassembled in order."""
+    data = bytes(range(256)) * (S3_MIN_PART_SIZE * 2 // 256 + 1000)
+    stored = asyncio.run(stream_upload(
+        s3, _upload_file(data), BUCKET, "raw/store/large.csv",
+        chunk_size=S3_MIN_PART_SIZE, max_concurrency=2
+    ))
+
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    obj = s3.get_object(Bucket=BUCKET, Key="raw/store/large.csv")
+    assert obj["Body"].read() == data
+    assert obj["ETag"].endswith('-3"')
+
+def test_stream_upload_aborts_on_part_failure(s3):
+    """A failing part aborts the multipart upload instead of leaving it open."""
+    data = b"x" * (S3_MIN_PART_SIZE * 2)
+    original = s3.upload_part
+
+    def flaky_upload_part(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise RuntimeError("network down")
+        return original(**kwargs)
+
+    s3.upload_part = flaky_upload_part
+    with pytest.raises(RuntimeError):
+        asyncio.run(stream_upload(s3, _upload_file(data), BUCKET, "raw/store/broken.csv", chunk_size=S3_MIN_PART_SIZE))
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
@@ -0,0 +1,76 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from api import endpoints, http_client, results, resilience, summaries
+from benchmarks.fakes import stub_ml_transport
+
+SERIES = [{"date": f"2024-02-0{day}", "menu": menu, "predicted": day} for menu in ("latte", "tea") for day in range(1, 4)]
+ML_RESULT = {"forecast_data": SERIES, "metrics": {"mape": 0.12}, "model_type": "xgboost"}
+PAYLOAD = {"file_id": "f1", "location_id": "1", "timestamp": "20240201_000000", "filename": "sales.csv"}
+
+@pytest.fixture
+def fake_db(fake_db, monkeypatch):
+    fake_db.tables["file_upload_tracker"] = [{"id": "f1", "location_id": "1", "status": "queued"}]
+    monkeypatch.setattr(results, "RESULT_STORE", "supabase")
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(summaries, "summary_cache", summaries.ResultCache("test_summary", ttl=60, max_bytes=1024 * 1024))
+    return fake_db
+
+def _run_job(monkeypatch, job_id, **transport):
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=stub_ml_transport(**transport)))
+    asyncio.run(endpoints.process_upload_job(job_id, PAYLOAD))
+
+def test_summary_is_updated_when_jobs_finish(client, fake_db, monkeypatch):
+    _run_job(monkeypatch, "job-1", payload=ML_RESULT)
+    response = client.get("/api/locations/1/summary")
+    summary = response.json()
+    assert summary["latest_status"] == "completed" and summary["job_id"] == "job-1"
+    assert summary["menu_totals"] == {"latte": 6.0, "tea": 6.0} and summary["forecast_total"] == 12.0
+    assert (summary["forecast_start"], summary["forecast_end"]) == ("2024-02-01", "2024-02-03")
+    assert summary["metrics"] == {"mape": 0.12}
+    assert client.get("/api/locations/1/summary", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    # A failed run shows up as the latest status; totals stay those of the last completed run
+    with pytest.raises(HTTPException) as failure:
+        _run_job(monkeypatch, "job-2", status_code=400)
+    # A failed attempt alone changes nothing: the queue may still retry it
+    assert client.get("/api/locations/1/summary").json()["latest_status"] == "completed"
+    assert fake_db.tables["file_upload_tracker"][0]["status"] == "processing"
+    asyncio.run(endpoints.fail_upload_job("job-2", PAYLOAD, failure.value))
+    summary = client.get("/api/locations/1/summary").json()
+    assert summary["latest_status"] == "processing_failed" and summary["latest_job_id"] == "job-2"
+    assert summary["job_id"] == "job-1" and summary["forecast_total"] == 12.0
+    assert len(fake_db.tables["location_summaries"]) == 1
+
+def test_missing_summary_is_built_from_latest_upload(client, fake_db):
+    asyncio.run(results.store_result("job-1", "f1", ML_RESULT, {"processing_time": "20240201_000000", "status": "completed"}))
+    fake_db.tables["file_upload_tracker"][0].update({"status": "completed", "upload_time": "20240201_000000"})
+    assert client.get("/api/locations/1/summary").json()["menu_totals"] == {"latte": 6.0, "tea": 6.0}
+    assert len(fake_db.tables["location_summaries"]) == 1
+    assert client.get("/api/locations/2/summary").status_code == 404
+
+def test_failed_first_run_keeps_the_totals_of_the_latest_upload(client, fake_db, monkeypatch):
+    asyncio.run(results.store_result("job-1", "f1", ML_RESULT, {"processing_time": "20240201_000000", "status": "completed"}))
+    fake_db.tables["file_upload_tracker"][0].update({"status": "completed", "upload_time": "20240201_000000"})
+    # No summary row yet (first run after deploy), and this run fails
+    asyncio.run(summaries.record_run("1", "job-2", "f2", "processing_failed", error="ML service down"))
+    summary = client.get("/api/locations/1/summary").json()
+    assert summary["latest_status"] == "processing_failed" and summary["latest_job_id"] == "job-2"
+    assert summary["job_id"] == "job-1" and summary["menu_totals"] == {"latte": 6.0, "tea": 6.0}
+    assert len(fake_db.tables["location_summaries"]) == 1
+
+def test_concurrent_runs_share_one_summary_row(fake_db):
+    async def both():
+        await asyncio.gather(*(summaries.record_run("1", f"job-{i}", "f1", "completed", ml_result=ML_RESULT) for i in range(4)))
+    asyncio.run(both())
+    assert len(fake_db.tables["location_summaries"]) == 1
+
+def test_summary_requires_auth(client):
+    from main import app
+    from api.auth import get_current_user
+    override = app.dependency_overrides.pop(get_current_user)
+    try:
+        assert client.get("/api/locations/1/summary").status_code == 403
+    finally:
+        app.dependency_overrides[get_current_user] = override
@@ -0,0 +1,104 @@
+CSV = b"date,menu,sales\n2024-01-01,latte,3\n2024-01-02,latte,4\n"
+FORM = {"date_col": "date", "menu_col": "menu", "target_col": "sales", "location_id": "1"}
+
+def _upload(client, data=CSV, **form):
+    return client.post("/api/upload", files={"file": ("sales.csv", data, "text/csv")}, data={**FORM, **form})
+
+def test_upload_queues_processing(client, fake_s3):
+    response = _upload(client)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "queued" and body["job_id"] and body["duplicate"] is False
+    assert body["validation"]["valid_rows"] == 2
+    assert any("/raw/store/" in key for key in fake_s3.objects)
+    assert any("/clean/store/" in key for key in fake_s3.objects)
+
+def test_duplicate_upload_skips_storage_and_ml(client, fake_db, fake_s3):
+    first = _upload(client).json()
+    fake_db.tables.setdefault("forecast_results", []).append({"file_id": first["file_id"], "job_id": first["job_id"], "results": {"forecast": []}})
+    writes = len(fake_s3.objects)
+
+    second = _upload(client).json()
+    assert second["duplicate"] is True
+    assert second["file_id"] == first["file_id"]
+    assert second["results"][0]["job_id"] == first["job_id"]
+    assert len(fake_s3.objects) == writes
+    assert len(fake_db.tables["file_upload_tracker"]) == 1
+
+def test_force_reprocess_bypasses_dedup(client, fake_s3):
+    first = _upload(client).json()
+    second = _upload(client, force_reprocess="true").json()
+    assert second["duplicate"] is False
+    assert second["file_id"] != first["file_id"]
+
+def test_invalid_file_is_rejected_before_storage(client, fake_s3):
+    response = _upload(client, data=b"date,menu,qty\n2024-01-01,latte,3\n")
+    assert response.status_code == 422
+    assert "Missing columns" in response.json()["detail"]["message"]
+    assert fake_s3.objects == {}
+
+def _capture_jobs(monkeypatch):
+    from api.jobs import get_job_queue
+    submitted = []
+
+    async def capture(kind, payload, upload_id=None, user_id=None):
+        submitted.append(payload)
+        return f"job-{len(submitted)}"
+    monkeypatch.setattr(get_job_queue(), "submit", capture)
+    return submitted
+
+def test_corrupt_workbook_is_rejected_before_storage(client, fake_s3):
+    response = client.post("/api/upload", files={"file": ("sales.xlsx", b"not a workbook", "application/vnd.ms-excel")}, data=FORM)
+    assert response.status_code == 422
+    assert "Could not read file" in response.json()["detail"]["message"]
+    assert fake_s3.objects == {}
+
+def test_later_upload_only_ingests_new_rows(client, fake_db, fake_s3, monkeypatch):
+    submitted = _capture_jobs(monkeypatch)
+    first = _upload(client).json()
+    second = _upload(client, data=CSV + b"2024-01-03,latte,5\n").json()
+    assert second["validation"]["new_rows"] == 1 and second["validation"]["existing_rows"] == 2
+    assert submitted[0]["mode"] == "full"
+    assert submitted[1]["mode"] == "incremental" and submitted[1]["watermark"] == "2024-01-02"
+    assert submitted[1]["history_segments"] == [submitted[0]["clean_path"]]
+    history = fake_db.tables["location_history"][0]
+    assert history["watermark"] == "2024-01-03" and history["row_count"] == 3
+    assert [segment["file_id"] for segment in history["segments"]] == [first["file_id"], second["file_id"]]
+
+    # Nothing new: stored, but not sent to the ML service
+    third = _upload(client, data=b"date,menu,sales\n2024-01-02,latte,1\n").json()
+    assert third["status"] == "up_to_date" and third["job_id"] is None
+    assert len(submitted) == 2
+
+def test_new_menu_items_are_ingested_before_the_watermark(client, fake_db, fake_s3, monkeypatch):
+    submitted = _capture_jobs(monkeypatch)
+    _upload(client)
+    second = _upload(client, data=b"date,menu,sales\n2024-01-01,mocha,1\n2024-01-02,latte,4\n").json()
+    assert second["status"] == "queued"
+    assert (second["validation"]["new_rows"], second["validation"]["existing_rows"]) == (1, 1)
+    assert second["validation"]["menu_ranges"] == {"mocha": ["2024-01-01", "2024-01-01"]}
+    assert len(submitted) == 2
+
+def test_failed_processing_rolls_back_the_history(client, fake_db, fake_s3, monkeypatch):
+    import asyncio
+    from api.endpoints import fail_upload_job
+    submitted = _capture_jobs(monkeypatch)
+    first = _upload(client).json()
+    asyncio.run(fail_upload_job(first["job_id"], submitted[0], RuntimeError("ML service down")))
+    assert fake_db.tables["location_history"][0]["segments"] == []
+    assert fake_db.tables["file_upload_tracker"][0]["status"] == "processing_failed"
+
+    # The failed upload is neither a duplicate nor up to date: it is processed again
+    retry = _upload(client).json()
+    assert retry["status"] == "queued" and retry["validation"]["new_rows"] == 2
+    assert len(submitted) == 2
+
+def test_upload_that_cannot_be_queued_rolls_back_the_history(client, fake_db, fake_s3, monkeypatch):
+    from api.jobs import get_job_queue
+
+    async def unavailable(*args, **kwargs):
+        raise RuntimeError("job store unavailable")
+    monkeypatch.setattr(get_job_queue(), "submit", unavailable)
+    assert _upload(client).status_code == 500
+    assert fake_db.tables["location_history"][0]["segments"] == []
+    assert fake_db.tables["file_upload_tracker"][0]["status"] == "upload_failed"
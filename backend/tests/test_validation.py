@@ -0,0 +1,81 @@
+import io
+import pandas as pd
+import pytest
+from api.validation import validate_and_normalize, FileValidationError
+
+CSV = b"""date,menu,sales,promo
+2024-01-01,latte,3,no
+2024-01-01,mocha,"1,200",yes
+not-a-date,latte,4,no
+2024-01-02,,5,no
+2024-01-02,latte,abc,no
+2024-01-03,mocha,$7,no
+"""
+
+def _run(data: bytes, chunk_rows: int = 2, **kwargs):
+    parts = {}
+
+    def write_part(index, body):
+        key = f"clean/store/sales/part-{index:05d}.parquet"
+        parts[key] = body
+        return key
+
+    report = validate_and_normalize(io.BytesIO(data), "sales.csv", "date", "menu", "sales", write_part, chunk_rows=chunk_rows, **kwargs)
+    return report, parts
+
+def test_bad_rows_are_dropped_and_counted():
+    report, parts = _run(CSV)
+    assert report.total_rows == 6
+    assert report.valid_rows == 3
+    assert report.issues == {"unparseable_date": 1, "missing_menu": 1, "non_numeric_target": 1}
+    assert [error["row"] for error in report.sample_errors] == [4, 5, 6]
+    assert (report.min_date, report.max_date) == ("2024-01-01", "2024-01-03")
+    assert report.parts == list(parts)
+
+def test_clean_parts_are_typed_parquet():
+    report, parts = _run(CSV)
+    df = pd.concat(pd.read_parquet(io.BytesIO(body)) for body in parts.values())
+    assert list(df["sales"]) == [3.0, 1200.0, 7.0]
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+    # Unmapped columns are kept as text
+    assert list(df["promo"]) == ["no", "yes", "no"]
+
+def test_parts_share_one_schema():
+    # The first chunk holds only whole numbers, the second a fraction and a blank promo
+    data = b"date,menu,sales,promo\n" + b"2024-01-01,latte,3,no\n" * 10 + b"2024-01-02,latte,1.5,\n" * 10
+    report, parts = _run(data, chunk_rows=10)
+    assert len(parts) == 2
+    import pyarrow.parquet as pq
+    tables = [pq.read_table(io.BytesIO(body)) for body in parts.values()]
+    assert tables[0].schema == tables[1].schema
+    assert str(tables[0].schema.field("sales").type) == "double"
+    df = pd.concat(table.to_pandas() for table in tables)
+    assert list(df["sales"]) == [3.0] * 10 + [1.5] * 10
+
+def test_corrupt_xlsx_is_rejected():
+    with pytest.raises(FileValidationError, match="Could not read file"):
+        validate_and_normalize(io.BytesIO(b"not a workbook"), "sales.xlsx", "date", "menu", "sales")
+
+def test_missing_columns_are_rejected():
+    with pytest.raises(FileValidationError, match="Missing columns: sales"):
+        validate_and_normalize(io.BytesIO(b"date,menu,qty\n2024-01-01,latte,3\n"), "sales.csv", "date", "menu", "sales")
+
+def test_mostly_bad_files_are_rejected():
+    data = b"date,menu,sales\n" + b"bad,latte,x\n" * 5 + b"2024-01-01,latte,1\n"
+    with pytest.raises(FileValidationError) as exc:
+        _run(data)
+    assert exc.value.report.dropped_rows == 5
+
+def test_covered_ranges_keep_only_new_rows():
+    report, parts = _run(CSV, covered={"latte": [["2023-12-01", "2023-12-31"], ["2024-01-01", "2024-01-01"]], "mocha": [["2024-01-01", "2024-01-02"]]})
+    assert report.valid_rows == 3
+    assert (report.existing_rows, report.new_rows) == (2, 1)
+    assert (report.min_date, report.max_date) == ("2024-01-03", "2024-01-03")
+    assert report.menu_ranges == {"mocha": ["2024-01-03", "2024-01-03"]}
+    df = pd.concat(pd.read_parquet(io.BytesIO(body)) for body in parts.values())
+    assert list(df["menu"]) == ["mocha"]
+
+def test_menu_items_not_covered_are_kept_whole():
+    report, _ = _run(CSV, covered={"latte": [["2024-01-01", "2024-01-31"]]})
+    assert (report.existing_rows, report.new_rows) == (1, 2)
+    assert report.menu_ranges == {"mocha": ["2024-01-01", "2024-01-03"]}
@@ -0,0 +1,77 @@
+import io
+import json
+import pytest
+from fastapi import HTTPException
+from api.models import ForecastRequest
+from api.wire import (
+    parse_forecast_body, encode_columnar, EncodedForecast,
+    COLUMNAR_JSON, ARROW_STREAM, PARQUET
+)
+
+OPTIONS = {"model_type": "xgboost", "forecast_horizon": 7, "feature_groups": ["calendar"], "target_col": "sales", "date_col": "date", "menu_col": "menu"}
+RECORDS = [
+    {"date": "2024-01-01", "menu": "latte", "sales": 3},
+    {"date": "2024-01-01", "menu": "mocha", "sales": 5},
+    {"date": "2024-01-02", "menu": "latte", "sales": 4},
+]
+
+def test_json_records_still_parse_to_forecast_request():
+    """Plain JSON keeps producing the existing ForecastRequest model."""
+    body = json.dumps({**OPTIONS, "data": RECORDS}).encode()
+    assert isinstance(parse_forecast_body("application/json", body, {}), ForecastRequest)
+
+def test_columnar_json_is_kept_as_bytes():
+    """Columnar JSON is validated but forwarded untouched."""
+    body = json.dumps({**OPTIONS, **encode_columnar(RECORDS, ["date", "menu"])}).encode()
+    forecast = parse_forecast_body(f"{COLUMNAR_JSON}; charset=utf-8", body, {})
+    assert isinstance(forecast, EncodedForecast)
+    assert forecast.body == body
+    assert forecast.rows == 3
+    assert forecast.options.model_type == "xgboost"
+
+def test_encode_columnar_dictionary_encodes():
+    encoded = encode_columnar(RECORDS, ["menu"])
+    assert encoded["dictionaries"]["menu"] == ["latte", "mocha"]
+    assert encoded["columns"]["menu"] == [0, 1, 0]
+
+@pytest.mark.parametrize("doc, message", [
+    ({"columns": {"date": ["2024-01-01"], "menu": ["latte"], "sales": []}}, "same length"),
+    ({"columns": {"date": ["2024-01-01"], "menu": ["latte"]}}, "Missing columns"),
+    ({"columns": {"date": ["2024-01-01"], "menu": [3], "sales": [1]}, "dictionaries": {"menu": ["latte"]}}, "out of range"),
+])
+def test_invalid_columnar_bodies_are_rejected(doc, message):
+    with pytest.raises(HTTPException) as exc:
+        parse_forecast_body(COLUMNAR_JSON, json.dumps({**OPTIONS, **doc}).encode(), {})
+    assert exc.value.status_code == 422
+    assert message in str(exc.value.detail)
+
+def test_unsupported_content_type():
+    with pytest.raises(HTTPException) as exc:
+        parse_forecast_body("text/csv", b"date,menu,sales", {})
+    assert exc.value.status_code == 415
+
+def _query():
+    return {**OPTIONS, "forecast_horizon": "7", "feature_groups": "calendar"}
+
+def test_arrow_and_parquet_bodies():
+    """Binary bodies take options from the query string and are checked by schema only."""
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pylist(RECORDS).cast(pa.schema([
+        ("date", pa.dictionary(pa.int32(), pa.string())),
+        ("menu", pa.dictionary(pa.int32(), pa.string())),
+        ("sales", pa.int64()),
+    ]))
+
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    arrow = parse_forecast_body(ARROW_STREAM, sink.getvalue(), _query())
+    assert arrow.rows == 3
+    assert arrow.query_params()["feature_groups"] == "calendar"
+
+    sink = io.BytesIO()
+    pq.write_table(table, sink)
+    parquet = parse_forecast_body(PARQUET, sink.getvalue(), _query())
+    assert parquet.rows == 3
+    assert parquet.options.forecast_horizon == 7
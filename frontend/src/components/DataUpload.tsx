@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { Upload, AlertCircle, CheckCircle, Info, Eye } from 'lucide-react';
 import { supabase } from '../supabaseClient';
+import { waitForResults } from '../services/api';
 import { Location } from '../types';
 
 interface DataUploadProps {
@@ -11,7 +12,13 @@ interface DataUploadProps {
 interface FilePreview {
   columns: string[];
   preview: any[];
-  total_rows: string;
+  total_rows: number | string;
+  total_rows_estimated?: boolean;
+  suggestions?: {
+    date_col: string[];
+    menu_col: string[];
+    target_col: string[];
+  };
 }
 
 const DataUpload: React.FC<DataUploadProps> = ({ onDataUpload }) => {
@@ -125,9 +132,11 @@ const DataUpload: React.FC<DataUploadProps> = ({ onDataUpload }) => {
         const targetPatterns = ['sales', 'Sales', 'SALES', 'quantity', 'Quantity', 'revenue', 'Revenue', 'amount', 'Amount'];
         
         // Find matching columns
-        const dateCol = columns.find((col: string) => datePatterns.some(pattern => col.toLowerCase().includes(pattern.toLowerCase()))) || '';
-        const menuCol = columns.find((col: string) => menuPatterns.some(pattern => col.toLowerCase().includes(pattern.toLowerCase()))) || '';
-        const targetCol = columns.find((col: string) => targetPatterns.some(pattern => col.toLowerCase().includes(pattern.toLowerCase()))) || '';
+        // Prefer the server's type-aware suggestions, fall back to name patterns
+        const suggestions = response.data.suggestions;
+        const dateCol = suggestions?.date_col?.[0] || columns.find((col: string) => datePatterns.some(pattern => col.toLowerCase().includes(pattern.toLowerCase()))) || '';
+        const menuCol = suggestions?.menu_col?.[0] || columns.find((col: string) => menuPatterns.some(pattern => col.toLowerCase().includes(pattern.toLowerCase()))) || '';
+        const targetCol = suggestions?.target_col?.[0] || columns.find((col: string) => targetPatterns.some(pattern => col.toLowerCase().includes(pattern.toLowerCase()))) || '';
         
         setDateCol(dateCol);
         setMenuCol(menuCol);
@@ -207,10 +216,24 @@ const DataUpload: React.FC<DataUploadProps> = ({ onDataUpload }) => {
         },
         timeout: 30000,
       });
-      setSuccess('File uploaded and processed successfully!');
-      onDataUpload(response.data);
+      const upload = response.data;
+      if (upload.status === 'queued' && upload.job_id) {
+        // Processing runs as a background job; wait for its results
+        setSuccess('File uploaded. Forecast queued, waiting for results...');
+        const { data: { session } } = await supabase.auth.getSession();
+        const results = await waitForResults(upload.job_id, session?.access_token);
+        setSuccess('File uploaded and processed successfully!');
+        onDataUpload({ ...upload, results: results.results });
+      } else if (upload.status === 'up_to_date') {
+        setSuccess('No new rows since the last upload; forecasts are already up to date.');
+        onDataUpload(upload);
+      } else {
+        setSuccess(upload.duplicate ? 'File was already uploaded; showing its existing results.' : 'File uploaded.');
+        onDataUpload(upload);
+      }
     } catch (err: any) {
       console.error('Full upload error:', err);
+      setSuccess(null);
       
       if (err.response) {
         const { status, data } = err.response;
@@ -242,6 +265,8 @@ const DataUpload: React.FC<DataUploadProps> = ({ onDataUpload }) => {
           } else {
             setError('Data validation failed. Please check your file format and column selections.');
           }
+        } else if (status === 502) {
+          setError(`Processing failed: ${data.detail || 'the forecast job did not complete'}`);
         } else if (status === 413) {
           setError('File too large. Please try a smaller file.');
         } else if (status === 415) {
@@ -252,7 +277,7 @@ const DataUpload: React.FC<DataUploadProps> = ({ onDataUpload }) => {
       } else if (err.request) {
         setError('Network error. Please check your connection and try again.');
       } else {
-        setError('An unexpected error occurred. Please try again.');
+        setError(err.message || 'An unexpected error occurred. Please try again.');
       }
     } finally {
       setUploading(false);
@@ -421,7 +446,7 @@ const DataUpload: React.FC<DataUploadProps> = ({ onDataUpload }) => {
             <Eye className="w-5 h-5 text-gray-600 mr-2" />
             <h2 className="text-lg font-semibold">File Preview</h2>
             <span className="ml-2 text-sm text-gray-500">
-              (First 3 rows of {filePreview.total_rows})
+              (First 3 rows of {filePreview.total_rows_estimated ? '~' : ''}{filePreview.total_rows})
             </span>
           </div>
           
@@ -37,6 +37,80 @@ export const uploadData = async (
   return response.data;
 };
 
+export interface DirectUploadOptions {
+  dateCol: string;
+  menuCol: string;
+  targetCol: string;
+  locationId: string;
+  concurrency?: number;
+  onProgress?: (uploadedBytes: number, totalBytes: number) => void;
+}
+
+interface UploadPart {
+  part_number: number;
+  url: string;
+}
+
+const uploadStorageKey = (file: File, locationId: string) =>
+  `kivo-upload:${locationId}:${file.name}:${file.size}:${file.lastModified}`;
+
+// Uploads a file straight to S3 in parts through presigned URLs, several parts at a
+// time. The upload id is kept in localStorage, so calling this again for the same file
+// (after a reload or a dropped connection) only sends the parts S3 does not have yet.
+export const directUpload = async (
+  file: File,
+  options: DirectUploadOptions
+): Promise<DataUpdateResponse> => {
+  const storageKey = uploadStorageKey(file, options.locationId);
+  let session: any = null;
+  const savedId = localStorage.getItem(storageKey);
+  if (savedId) {
+    try {
+      session = (await api.get(`/uploads/${savedId}`)).data;
+    } catch {
+      localStorage.removeItem(storageKey);
+    }
+  }
+  if (!session) {
+    session = (await api.post('/uploads', {
+      filename: file.name,
+      size: file.size,
+      content_type: file.type || undefined,
+      location_id: options.locationId,
+      date_col: options.dateCol,
+      menu_col: options.menuCol,
+      target_col: options.targetCol,
+    })).data;
+    if (session.duplicate) return session;
+    localStorage.setItem(storageKey, session.upload_id);
+  }
+  if (session.status === 'queued') {
+    localStorage.removeItem(storageKey);
+    return session;
+  }
+
+  let uploaded = (session.uploaded_parts || []).reduce((sum: number, part: any) => sum + part.size, 0);
+  options.onProgress?.(uploaded, file.size);
+  const queue: UploadPart[] = [...session.parts];
+  const sendParts = async () => {
+    for (let part = queue.shift(); part; part = queue.shift()) {
+      const start = (part.part_number - 1) * session.part_size;
+      const blob = file.slice(start, start + session.part_size);
+      const response = await fetch(part.url, { method: 'PUT', body: blob });
+      if (!response.ok) {
+        throw new Error(`Part ${part.part_number} failed (${response.status})`);
+      }
+      uploaded += blob.size;
+      options.onProgress?.(uploaded, file.size);
+    }
+  };
+  await Promise.all(Array.from({ length: options.concurrency || 4 }, sendParts));
+
+  const response = await api.post<DataUpdateResponse>(`/uploads/${session.upload_id}/complete`);
+  localStorage.removeItem(storageKey);
+  return response.data;
+};
+
 export const createForecast = async (
   forecastData: ForecastRequest
 ): Promise<ForecastResponse> => {
@@ -44,6 +118,102 @@ export const createForecast = async (
   return response.data;
 };
 
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Polls /results/{jobId} until the background job has stored its results.
+// 202 means the job is still queued or running; a failed job comes back as 502.
+export const waitForResults = async (
+  jobId: string,
+  token?: string,
+  { interval = 2000, timeout = 10 * 60 * 1000 } = {}
+): Promise<Record<string, any>> => {
+  const deadline = Date.now() + timeout;
+  for (;;) {
+    const response = await api.get(`/results/${jobId}`, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+    });
+    if (response.status !== 202) return response.data;
+    if (Date.now() > deadline) {
+      throw new Error('Timed out waiting for the forecast to finish');
+    }
+    await sleep(interval);
+  }
+};
+
+export interface ResultRowsOptions {
+  start?: number;
+  stop?: number;
+  menus?: string[];
+  token?: string;
+}
+
+// Streams /results/{jobId}/rows (NDJSON) and hands rows to onRows as they arrive,
+// so long forecasts can render before the whole payload has been received.
+export const streamResultRows = async (
+  jobId: string,
+  onRows: (rows: ForecastData[]) => void,
+  options: ResultRowsOptions = {}
+): Promise<Record<string, any>> => {
+  const params = new URLSearchParams();
+  if (options.start !== undefined) params.set('start', String(options.start));
+  if (options.stop !== undefined) params.set('stop', String(options.stop));
+  (options.menus || []).forEach(menu => params.append('menu', menu));
+
+  const response = await fetch(`${API_BASE_URL}/results/${jobId}/rows?${params}`, {
+    headers: options.token ? { Authorization: `Bearer ${options.token}` } : {},
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Failed to load results (${response.status})`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let header: Record<string, any> | null = null;
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value, { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = done ? '' : lines.pop() || '';
+    const rows: ForecastData[] = [];
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      if (header === null) {
+        header = JSON.parse(line);
+      } else {
+        rows.push(JSON.parse(line));
+      }
+    }
+    if (rows.length) onRows(rows);
+    if (done) break;
+  }
+  return header || {};
+};
+
+export interface LocationSummary {
+  location_id: string;
+  latest_job_id: string;
+  latest_status: string;
+  latest_run_at: string;
+  error?: string | null;
+  job_id?: string;
+  model_type?: string;
+  metrics?: Record<string, number>;
+  menu_totals?: Record<string, number>;
+  forecast_total?: number;
+  forecast_start?: string | null;
+  forecast_end?: string | null;
+  row_count?: number;
+}
+
+// Precomputed dashboard overview for one location; requires a signed-in user
+export const getLocationSummary = async (locationId: string, token: string): Promise<LocationSummary> => {
+  const response = await api.get<LocationSummary>(`/locations/${locationId}/summary`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  return response.data;
+};
+
 export const checkHealth = async (): Promise<{ status: string }> => {
   const response = await api.get<{ status: string }>('/health');
   return response.data;